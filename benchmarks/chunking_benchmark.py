@@ -0,0 +1,85 @@
+"""
+Benchmark : map-phase cost of the summarizer chunking (no LLM calls are made).
+
+Compares the legacy splitter (400 / 80 characters, page by page) with the token-budget
+splitter of BaseSummarizer on sample contracts, and reports for each one the number of
+map calls and the (estimated) prompt tokens sent during the MAP phase.
+
+Usage (from the repository root) :
+    python -m benchmarks.chunking_benchmark [extra .pdf / .txt / .docx files]
+"""
+
+import os
+import sys
+
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from prompt_templates.prompts import PromptManager
+from src.document_processor import DocumentProcessorFactory
+from src.summarizer import BaseSummarizer, DocumentAnalyser
+
+
+SAMPLE_CONTRACT = os.path.join(os.path.dirname(__file__) , ".." , "frontend" , "kome-text.pdf")
+
+'''Sample filing sizes : the sample contract repeated N times (x1 fits the stuff chain, the others go through map-reduce)'''
+SCALES = (1 , 20 , 100)
+
+
+def prompt_overhead_tokens(language : str = "English") -> int :
+    """Tokens of the map prompt around the chunk text (system prompt + instructions), repeated in every map call."""
+
+    messages = PromptManager.get_map_prompt().format_messages(text = "" , language = language)
+    return sum(DocumentAnalyser.estimate_tokens(message.content) for message in messages)
+
+
+def legacy_chunks(documents : list[Document]) -> list[Document] :
+    """Previous behaviour : 400 / 80 character chunks, split page by page."""
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size = 400 , chunk_overlap = 80)
+    return splitter.split_documents(documents)
+
+
+def token_budget_chunks(documents : list[Document]) -> list[Document] :
+    """Current behaviour : chunks packed to SUMMARY_CHUNK_TOKENS, split on section / clause breaks."""
+
+    class _Splitter(BaseSummarizer) :
+        def summarize(self , documents) :
+            pass
+
+    return list(_Splitter(llm = None).iter_chunks(documents))
+
+
+def map_cost(chunks : list[Document] , overhead : int) -> tuple[int , int] :
+    """(map calls , prompt tokens of the map phase)"""
+
+    tokens = sum(DocumentAnalyser.estimate_tokens(chunk.page_content) + overhead for chunk in chunks)
+    return len(chunks) , tokens
+
+
+def run(paths : list[str]) -> None :
+    overhead = prompt_overhead_tokens()
+
+    samples = []
+    base_docs = DocumentProcessorFactory.process(SAMPLE_CONTRACT)
+    for scale in SCALES :
+        samples.append((f"sample contract x{scale}" , base_docs * scale))
+    for path in paths :
+        samples.append((os.path.basename(path) , DocumentProcessorFactory.process(path)))
+
+    print(f"map prompt overhead : ~{overhead} tokens per call\n")
+    print(f"{'document':<26}{'doc tokens':>11}{'chain':>12}{'legacy calls':>14}{'legacy tokens':>15}{'new calls':>11}{'new tokens':>12}{'token drop':>12}")
+
+    for name , docs in samples :
+        legacy_calls , legacy_tokens = map_cost(legacy_chunks(docs) , overhead)
+        new_calls , new_tokens = map_cost(token_budget_chunks(docs) , overhead)
+        drop = 100 * (1 - new_tokens / legacy_tokens)
+
+        print(
+            f"{name:<26}{DocumentAnalyser.count_tokens(docs):>11}{DocumentAnalyser.suggest_chain_type(docs):>12}"
+            f"{legacy_calls:>14}{legacy_tokens:>15}{new_calls:>11}{new_tokens:>12}{drop:>11.1f}%"
+        )
+
+
+if __name__ == "__main__" :
+    run(sys.argv[1:])
@@ -0,0 +1,76 @@
+"""
+Benchmark : API cold start (import -> ready to serve).
+
+Every run starts a fresh interpreter and measures :
+- import : `import main` (settings, routes, pipelines modules)
+- ready : import + application startup (lifespan) + first GET /health answered
+- first LLM : time to build the LLM router and its first chat model on first use (provider registry), measured separately
+
+Provider warm-up is turned off during the runs, so "ready" is what a container / worker pays before serving.
+Keys are not needed : the provider clients are only built on first use.
+
+Usage (from the repository root) :
+    python -m benchmarks.startup_benchmark [runs]
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+
+PROBE = r"""
+import json , time
+started = time.perf_counter()
+
+import main
+imported = time.perf_counter()
+
+from fastapi.testclient import TestClient
+with TestClient(main.app) as client :
+    client.get("/health").raise_for_status()
+ready = time.perf_counter()
+
+llm_seconds = None
+try :
+    t = time.perf_counter()
+    main.get_llm()
+    from core.providers import get_chat_model
+    get_chat_model(f"groq:{main.settings.LLM_MODEL}")
+    llm_seconds = time.perf_counter() - t
+except Exception :
+    pass
+
+print(json.dumps({"import" : imported - started , "ready" : ready - started , "first_llm" : llm_seconds}))
+"""
+
+
+def run_once() -> dict :
+    """One cold start in a fresh interpreter."""
+
+    env = {**os.environ , "PROVIDERS_WARMUP" : "false" , "LANGCHAIN_TRACING_V2" : "false"}
+    root = os.path.join(os.path.dirname(__file__) , "..")
+
+    output = subprocess.run(
+        [sys.executable , "-c" , PROBE] , cwd = root , env = env , capture_output = True , text = True , check = True
+    ).stdout
+
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run(runs : int) -> None :
+    results = [run_once() for _ in range(runs)]
+
+    print(f"{'stage':<12}{'median (s)':>12}{'min (s)':>10}{'max (s)':>10}")
+
+    for stage in ("import" , "ready" , "first_llm") :
+        values = [result[stage] for result in results if result[stage] is not None]
+        if not values :
+            print(f"{stage:<12}{'n/a':>12}")
+            continue
+        print(f"{stage:<12}{statistics.median(values):>12.3f}{min(values):>10.3f}{max(values):>10.3f}")
+
+
+if __name__ == "__main__" :
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
@@ -0,0 +1,391 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Optional
+
+
+class LRUCache :
+    '''
+    Thread-safe, bounded in-memory cache.
+    - Evicts the least recently used entry once max_entries is reached.
+    - Entries older than ttl seconds are treated as misses (ttl=None -> never expire).
+    '''
+
+    def __init__(self , max_entries : int = 256 , ttl : Optional[float] = None) :
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data : OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+
+    def get(self , key : str , default : Any = None) -> Any :
+        with self._lock :
+            entry = self._data.get(key)
+
+            if entry is None :
+                return default
+
+            value , stored_at = entry
+
+            if self.ttl is not None and time.time() - stored_at > self.ttl :
+                del self._data[key]
+                return default
+
+            self._data.move_to_end(key)
+            return value
+
+
+    def set(self , key : str , value : Any) -> None :
+        with self._lock :
+            self._data[key] = (value , time.time())
+            self._data.move_to_end(key)
+
+            while len(self._data) > self.max_entries :
+                self._data.popitem(last = False)
+
+
+    def delete(self , key : str) -> None :
+        with self._lock :
+            self._data.pop(key , None)
+
+
+    def items(self) -> list[tuple[str , Any]] :
+        '''Snapshot of the live (non expired) entries, least recently used first. Does not update the recency.'''
+
+        with self._lock :
+            now = time.time()
+            return [
+                (key , value)
+                for key , (value , stored_at) in self._data.items()
+                if self.ttl is None or now - stored_at <= self.ttl
+            ]
+
+
+    def clear(self) -> None :
+        with self._lock :
+            self._data.clear()
+
+
+    def __len__(self) -> int :
+        return len(self._data)
+
+
+
+
+class SQLiteCache :
+    '''
+    Disk tier of the cache, stored in a single SQLite file.
+    - Values are pickled (optionally zlib compressed).
+    - Entries older than ttl seconds are treated as misses and purged.
+    - Evicts the least recently accessed entries once max_entries or max_bytes is exceeded.
+    '''
+
+    def __init__(self , path : str , max_entries : Optional[int] = None , max_bytes : Optional[int] = None ,
+                 ttl : Optional[float] = None , compress : bool = False) :
+
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.compress = compress
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)) , exist_ok = True)
+
+        with self._connect() as conn :
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS cache (
+                    key TEXT PRIMARY KEY ,
+                    value BLOB NOT NULL ,
+                    size INTEGER NOT NULL ,
+                    created_at REAL NOT NULL ,
+                    accessed_at REAL NOT NULL
+                )"""
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_accessed ON cache (accessed_at)")
+
+
+    @contextmanager
+    def _connect(self) :
+        '''Short lived connection per operation (commits on success, always closed) so the cache is safe to share across threads.'''
+        conn = sqlite3.connect(self.path , timeout = 30)
+        try :
+            with conn :
+                yield conn
+        finally :
+            conn.close()
+
+
+    def _dumps(self , value : Any) -> bytes :
+        blob = pickle.dumps(value , protocol = pickle.HIGHEST_PROTOCOL)
+        return zlib.compress(blob) if self.compress else blob
+
+
+    def _loads(self , blob : bytes) -> Any :
+        return pickle.loads(zlib.decompress(blob) if self.compress else blob)
+
+
+    def get(self , key : str , default : Any = None) -> Any :
+        now = time.time()
+
+        with self._lock , self._connect() as conn :
+            row = conn.execute("SELECT value , created_at FROM cache WHERE key = ?" , (key ,)).fetchone()
+
+            if row is None :
+                return default
+
+            blob , created_at = row
+
+            if self.ttl is not None and now - created_at > self.ttl :
+                conn.execute("DELETE FROM cache WHERE key = ?" , (key ,))
+                return default
+
+            conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?" , (now , key))
+
+        try :
+            return self._loads(blob)
+        except Exception :
+            '''Corrupted / incompatible entry -> drop it and behave like a miss'''
+            self.delete(key)
+            return default
+
+
+    '''Keys looked up per statement by get_many (below the SQLite host parameter limit)'''
+    BATCH_SIZE = 500
+
+    def get_many(self , keys : list[str]) -> dict[str , Any] :
+        '''Values of the keys found (expired / corrupted ones are left out) : one connection and one transaction for
+        the whole lookup , the access times of the hits are updated in bulk.'''
+
+        now = time.time()
+        keys = list(dict.fromkeys(keys))
+        rows , expired = [] , []
+
+        if not keys :
+            return {}
+
+        with self._lock , self._connect() as conn :
+            for i in range(0 , len(keys) , SQLiteCache.BATCH_SIZE) :
+                batch = keys[i : i + SQLiteCache.BATCH_SIZE]
+
+                for key , blob , created_at in conn.execute(
+                    f"SELECT key , value , created_at FROM cache WHERE key IN ({' , '.join('?' for _ in batch)})" , batch
+                ) :
+                    if self.ttl is not None and now - created_at > self.ttl :
+                        expired.append((key ,))
+                    else :
+                        rows.append((key , blob))
+
+            if expired :
+                conn.executemany("DELETE FROM cache WHERE key = ?" , expired)
+
+            if rows :
+                conn.executemany("UPDATE cache SET accessed_at = ? WHERE key = ?" , [(now , key) for key , _ in rows])
+
+        values , corrupted = {} , []
+
+        for key , blob in rows :
+            try :
+                values[key] = self._loads(blob)
+            except Exception :
+                corrupted.append(key)
+
+        for key in corrupted :
+            self.delete(key)
+
+        return values
+
+
+    def set(self , key : str , value : Any) -> None :
+        blob = self._dumps(value)
+        now = time.time()
+
+        with self._lock , self._connect() as conn :
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (key , value , size , created_at , accessed_at) VALUES (? , ? , ? , ? , ?)" ,
+                (key , blob , len(blob) , now , now)
+            )
+            self._evict(conn , now)
+
+
+    def set_many(self , items : dict[str , Any]) -> None :
+        '''Stores several entries in one transaction (and one eviction pass).'''
+
+        if not items :
+            return
+
+        now = time.time()
+        rows = []
+        for key , value in items.items() :
+            blob = self._dumps(value)
+            rows.append((key , blob , len(blob) , now , now))
+
+        with self._lock , self._connect() as conn :
+            conn.executemany(
+                "INSERT OR REPLACE INTO cache (key , value , size , created_at , accessed_at) VALUES (? , ? , ? , ? , ?)" ,
+                rows
+            )
+            self._evict(conn , now)
+
+
+    def _evict(self , conn : sqlite3.Connection , now : float) -> None :
+        '''Drops expired entries, then least recently accessed ones until the size bounds hold.'''
+
+        if self.ttl is not None :
+            conn.execute("DELETE FROM cache WHERE created_at < ?" , (now - self.ttl ,))
+
+        if self.max_entries is not None and conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0] > self.max_entries :
+            conn.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)" ,
+                (self.max_entries ,)
+            )
+
+        if self.max_bytes is not None :
+            total = conn.execute("SELECT COALESCE(SUM(size) , 0) FROM cache").fetchone()[0]
+
+            if total > self.max_bytes :
+                for key , size in conn.execute("SELECT key , size FROM cache ORDER BY accessed_at ASC").fetchall() :
+                    if total <= self.max_bytes :
+                        break
+                    conn.execute("DELETE FROM cache WHERE key = ?" , (key ,))
+                    total -= size
+
+
+    def delete(self , key : str) -> None :
+        with self._lock , self._connect() as conn :
+            conn.execute("DELETE FROM cache WHERE key = ?" , (key ,))
+
+
+    def clear(self) -> None :
+        with self._lock , self._connect() as conn :
+            conn.execute("DELETE FROM cache")
+
+
+    def __len__(self) -> int :
+        with self._connect() as conn :
+            return conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+
+
+
+class TieredCache :
+    '''
+    Two-level cache : a bounded in-memory LRU in front of an optional SQLite disk tier.
+    Disk hits are promoted to memory. Keeps hit/miss counters for monitoring (/health).
+    '''
+
+    _MISSING = object()
+
+    def __init__(self , memory : LRUCache , disk : Optional[SQLiteCache] = None) :
+        self.memory = memory
+        self.disk = disk
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits" : 0 , "disk_hits" : 0 , "misses" : 0}
+
+
+    def _count(self , name : str) -> None :
+        with self._lock :
+            self._stats[name] += 1
+
+
+    def record_miss(self) -> None :
+        '''Counts a miss decided without a lookup (the key cannot be built , e.g. unknown document).'''
+        self._count("misses")
+
+
+    def get(self , key : str , default : Any = None , count : bool = True) -> Any :
+        '''Looks the key up in memory, then on disk. count=False keeps auxiliary lookups out of the hit/miss counters.'''
+
+        value = self.memory.get(key , TieredCache._MISSING)
+
+        if value is not TieredCache._MISSING :
+            if count :
+                self._count("memory_hits")
+            return value
+
+        if self.disk is not None :
+            value = self.disk.get(key , TieredCache._MISSING)
+
+            if value is not TieredCache._MISSING :
+                if count :
+                    self._count("disk_hits")
+                self.memory.set(key , value)
+                return value
+
+        if count :
+            self._count("misses")
+        return default
+
+
+    def get_many(self , keys : list[str] , count : bool = True) -> dict[str , Any] :
+        '''Values of the keys found , looked up in memory then in a single disk query for the rest (disk hits are promoted).'''
+
+        values , missing = {} , []
+
+        for key in dict.fromkeys(keys) :
+            value = self.memory.get(key , TieredCache._MISSING)
+
+            if value is TieredCache._MISSING :
+                missing.append(key)
+            else :
+                values[key] = value
+
+        found = self.disk.get_many(missing) if self.disk is not None and missing else {}
+
+        for key , value in found.items() :
+            self.memory.set(key , value)
+
+        if count :
+            with self._lock :
+                self._stats["memory_hits"] += len(values)
+                self._stats["disk_hits"] += len(found)
+                self._stats["misses"] += len(missing) - len(found)
+
+        values.update(found)
+        return values
+
+
+    def set(self , key : str , value : Any) -> None :
+        self.memory.set(key , value)
+
+        if self.disk is not None :
+            self.disk.set(key , value)
+
+
+    def set_many(self , items : dict[str , Any]) -> None :
+        for key , value in items.items() :
+            self.memory.set(key , value)
+
+        if self.disk is not None :
+            self.disk.set_many(items)
+
+
+    def delete(self , key : str) -> None :
+        self.memory.delete(key)
+
+        if self.disk is not None :
+            self.disk.delete(key)
+
+
+    def clear(self) -> None :
+        self.memory.clear()
+
+        if self.disk is not None :
+            self.disk.clear()
+
+
+    def stats(self) -> dict :
+        with self._lock :
+            stats = dict(self._stats)
+
+        stats["hits"] = stats["memory_hits"] + stats["disk_hits"]
+        stats["memory_entries"] = len(self.memory)
+        stats["disk_enabled"] = self.disk is not None
+
+        return stats
@@ -1,7 +1,7 @@
 from functools import lru_cache
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import Field, field_validator
-from typing import Set, Tuple
+from typing import Dict, List, Optional, Set, Tuple
 
 class Settings(BaseSettings):
 
@@ -17,24 +17,33 @@ class Settings(BaseSettings):
     """
 
     
-    GOOGLE_API_KEY: str = Field(..., description="Google API Key")
-    GROQ_API_KEY: str = Field(..., description="Groq API Key")
+    # API keys : only checked when the provider that needs them is first used (see core/providers.py)
+
+    GOOGLE_API_KEY: Optional[str] = Field(default=None, description="Google API Key (Gemini TTS and embeddings)")
+    GROQ_API_KEY: Optional[str] = Field(default=None, description="Groq API Key (chat LLM)")
 
     # ELEVENLABS_API_KEY : str = Field(..., description="Elevenlabs API Key")
     # ELEVENLABS_VOICE_ID : str = Field(..., description="Elevenlabs Voice ID")
 
-    LANGCHAIN_API_KEY: str = Field(..., description="LangSmith/LangChain API Key")
+    LANGCHAIN_API_KEY: Optional[str] = Field(default=None, description="LangSmith/LangChain API Key (tracing is off without it)")
     LANGCHAIN_TRACING_V2: bool = Field(default=True, description="Enable LangSmith tracing")
-    LANGCHAIN_PROJECT: str = Field(..., description="LangSmith project name")
+    LANGCHAIN_PROJECT: Optional[str] = Field(default=None, description="LangSmith project name")
 
-    FASTAPI_URL : str = Field(... , description = "FastAPI URL")
+    FASTAPI_URL : Optional[str] = Field(default = None , description = "FastAPI URL (used by the frontend)")
 
 
 
     # Optional fields with default values
 
+    LLM_MODEL: str = Field(default="llama-3.3-70b-versatile", description="Groq chat model used for summaries and answers (first model of the default route)")
+    PROVIDERS_WARMUP: bool = Field(default=True, description="Build the LLM / embedding clients in the background right after the API starts (instead of on the first request)")
+
     MAX_FILE_SIZE: int = Field(default=10 * 1024 * 1024, description="Max file size in bytes")
 
+    UPLOAD_CHUNK_SIZE: int = Field(default=1024 * 1024, ge=4096, description="Size of the chunks uploads are read with")
+
+    UPLOAD_SPOOL_MAX_MEMORY: int = Field(default=8 * 1024 * 1024, ge=0, description="Uploads up to this size are extracted from memory, larger ones are spooled to a temp file")
+
     ALLOWED_EXTENSIONS: Set[str] = Field(default={".pdf", ".txt", ".docx"})
 
     SUPPORTED_LANGUAGES: Tuple[str, ...] = Field(
@@ -42,6 +51,156 @@ class Settings(BaseSettings):
     )
 
 
+    # Document extraction
+
+    PDF_EXTRACT_PROCESSES: int = Field(default=0, ge=0, description="Processes parsing the pages of large PDFs in parallel (0 -> pages are parsed lazily in the calling thread)")
+
+    PDF_PARALLEL_MIN_PAGES: int = Field(default=64, ge=1, description="PDFs with fewer pages are always parsed in the calling thread")
+
+    PDF_PAGES_PER_TASK: int = Field(default=32, ge=1, description="Pages parsed by one process pool task")
+
+
+    # Execution layer (worker pool that runs the blocking pipelines off the event loop)
+
+    WORKER_POOL_SIZE: int = Field(default=4, ge=1, description="Number of worker threads running blocking pipelines")
+    WORKER_QUEUE_SIZE: int = Field(default=8, ge=0, description="Max jobs waiting for a free worker before requests are rejected with 503")
+
+    SUMMARIZE_MAX_CONCURRENCY: int = Field(default=2, ge=1, description="Max in-flight /summarize requests before 429")
+    RAG_INDEX_MAX_CONCURRENCY: int = Field(default=2, ge=1, description="Max in-flight /rag/index requests before 429")
+    RAG_ASK_MAX_CONCURRENCY: int = Field(default=8, ge=1, description="Max in-flight /rag/ask requests before 429")
+
+
+    # Caching
+
+    CACHE_DIR: str = Field(default=".cache", description="Directory holding the on-disk cache tiers")
+
+    SUMMARY_CACHE_MAX_ENTRIES: int = Field(default=256, ge=1, description="Max summaries kept in the in-memory LRU tier")
+    SUMMARY_CACHE_TTL_SECONDS: int = Field(default=7 * 24 * 3600, ge=1, description="Time-to-live of a cached summary")
+    SUMMARY_CACHE_DISK_ENABLED: bool = Field(default=True, description="Enable the SQLite on-disk summary cache tier")
+    SUMMARY_CACHE_DISK_MAX_MB: int = Field(default=100, ge=1, description="Max size of the on-disk summary cache in MB")
+
+    EXTRACTION_CACHE_MAX_ENTRIES: int = Field(default=32, ge=1, description="Extracted documents / chunk lists kept in the in-memory LRU tier")
+    EXTRACTION_CACHE_TTL_SECONDS: int = Field(default=7 * 24 * 3600, ge=1, description="Time-to-live of an extracted document")
+    EXTRACTION_CACHE_DISK_ENABLED: bool = Field(default=True, description="Enable the SQLite on-disk extracted text cache tier")
+    EXTRACTION_CACHE_DISK_MAX_MB: int = Field(default=200, ge=1, description="Max size of the on-disk extracted text cache in MB")
+    TTS_CACHE_MAX_ENTRIES: int = Field(default=64, ge=1, description="Synthesized audio segments kept in the in-memory LRU tier")
+    TTS_CACHE_TTL_SECONDS: int = Field(default=30 * 24 * 3600, ge=1, description="Time-to-live of a cached audio segment")
+    TTS_CACHE_DISK_ENABLED: bool = Field(default=True, description="Enable the SQLite on-disk TTS audio cache tier")
+    TTS_CACHE_DISK_MAX_MB: int = Field(default=500, ge=1, description="Max size of the on-disk TTS audio cache in MB (least recently used evicted first)")
+    TTS_CACHE_COMPRESS: bool = Field(default=False, description="zlib compress the cached audio (smaller on disk , costs CPU , PCM compresses moderately)")
+
+
+    # Vector store
+
+    CHROMA_PERSIST_DIR: str = Field(default="chroma_db", description="Directory of the persistent Chroma index and document registry")
+    CHROMA_COLLECTION_NAME: str = Field(default="lawlens_documents", description="Chroma collection holding all ingested documents")
+
+
+    # Retrieval (hybrid BM25 + vector search, fused with reciprocal-rank fusion)
+
+    RAG_TOP_K: int = Field(default=3, ge=1, le=50, description="Chunks passed to the answer prompt by default")
+    RAG_FETCH_K: int = Field(default=20, ge=1, description="Candidates fetched from each index before fusion")
+    RAG_RETRIEVAL_MODE: str = Field(default="hybrid", pattern="^(hybrid|vector|keyword)$", description="Default retrieval mode : hybrid , vector or keyword")
+    RAG_VECTOR_WEIGHT: float = Field(default=1.0, ge=0, description="Default weight of the vector ranking in the fusion")
+    RAG_KEYWORD_WEIGHT: float = Field(default=1.0, ge=0, description="Default weight of the keyword (BM25) ranking in the fusion")
+    RAG_VECTOR_TIMEOUT_SECONDS: float = Field(default=5.0, gt=0, description="A hybrid search waiting longer than this for the embedding API answers from the keyword index alone")
+    RAG_RRF_K: int = Field(default=60, ge=1, description="Reciprocal-rank fusion constant (higher -> flatter rank contributions)")
+    RAG_RERANK_ENABLED: bool = Field(default=False, description="Re-rank over-fetched candidates and pack them into RAG_CONTEXT_TOKEN_BUDGET (instead of the top k)")
+    RAG_RERANKER: str = Field(default="lexical", pattern="^(lexical|cross-encoder)$", description="Re-ranking scorer : lexical (term overlap) or cross-encoder (local sentence-transformers model)")
+    RAG_CROSS_ENCODER_MODEL: str = Field(default="cross-encoder/ms-marco-MiniLM-L-6-v2", description="Cross-encoder model of the cross-encoder re-ranker")
+    RAG_RERANK_CANDIDATES: int = Field(default=12, ge=1, description="Fused candidates re-ranked per question")
+    RAG_CONTEXT_TOKEN_BUDGET: int = Field(default=600, ge=50, description="Estimated tokens of retrieved text packed into the answer prompt when re-ranking")
+    RAG_DEDUPE_MIN_OVERLAP: int = Field(default=20, ge=1, description="Min shared characters for two consecutive chunks to be merged into one passage")
+    ANSWER_CACHE_ENABLED: bool = Field(default=True, description="Serve repeated / near-duplicate /rag/ask questions from the answer cache")
+    ANSWER_CACHE_MAX_ENTRIES: int = Field(default=1024, ge=1, description="Max answers kept in the answer cache (LRU)")
+    ANSWER_CACHE_TTL_SECONDS: int = Field(default=24 * 3600, ge=1, description="Time-to-live of a cached answer")
+    ANSWER_CACHE_SIMILARITY_THRESHOLD: float = Field(default=0.92, gt=0, le=1, description="Min cosine similarity of two questions to share a cached answer")
+    ANSWER_CACHE_MAX_PER_SCOPE: int = Field(default=256, ge=1, description="Max questions of one scope (documents , language , options) compared by a semantic lookup")
+
+
+    # Embeddings
+
+    EMBEDDING_BACKEND: str = Field(default="gemini", pattern="^(gemini|huggingface)$", description="gemini (API) or huggingface (local sentence-transformers model on CPU)")
+    EMBEDDING_MODEL: str = Field(default="gemini-embedding-001", description="Gemini embedding model")
+    HF_EMBEDDING_MODEL: str = Field(default="sentence-transformers/all-MiniLM-L6-v2", description="Local embedding model (huggingface backend)")
+    HF_EMBEDDING_DEVICE: str = Field(default="cpu", description="Device of the local embedding model")
+    HF_EMBEDDING_BATCH_SIZE: int = Field(default=32, ge=1, description="Texts encoded per batch by the local embedding model")
+    HF_EMBEDDING_THREADS: int = Field(default=0, ge=0, description="Torch threads used by the local embedding model (0 -> torch default , one per core)")
+    EMBEDDING_CACHE_MEMORY_ENTRIES: int = Field(default=4096, ge=1, description="Embeddings kept in the in-memory LRU tier")
+    EMBEDDING_CACHE_MAX_ENTRIES: int = Field(default=200_000, ge=1, description="Max embeddings kept in the on-disk cache")
+    INGEST_BATCH_SIZE: int = Field(default=64, ge=1, description="Chunks embedded and written to the vector store per ingest batch")
+    INGEST_MAX_CONCURRENCY: int = Field(default=4, ge=1, description="Embedding batches of one ingest in flight at the same time")
+    INGEST_MAX_RETRIES: int = Field(default=4, ge=0, description="Retries of a batch failing with a transient error (429 , 5xx , timeout)")
+
+
+    # LLM calls (map phase concurrency, Groq rate limits, retries)
+
+    SUMMARY_CHUNK_TOKENS: int = Field(default=3000, ge=100, description="Token budget of one map chunk (sized to the model context window)")
+    SUMMARY_CHUNK_OVERLAP_TOKENS: int = Field(default=100, ge=0, description="Token overlap between two consecutive map chunks")
+    SUMMARY_REDUCE_TOKENS: int = Field(default=6000, ge=500, description="Max tokens of partial summaries fed to one reduce call (larger sets are reduced hierarchically)")
+    SUMMARY_MAP_CONCURRENCY: int = Field(default=8, ge=1, description="Max map calls of one summary running in parallel")
+    LLM_REQUESTS_PER_MINUTE: int = Field(default=30, ge=1, description="Request budget of the LLM provider tier")
+    LLM_TOKENS_PER_MINUTE: int = Field(default=12_000, ge=1, description="Token budget of the LLM provider tier")
+    LLM_MAX_RETRIES: int = Field(default=5, ge=0, description="Retries of a rate limited (429) LLM call")
+    LLM_RETRY_BASE_DELAY: float = Field(default=1.0, gt=0, description="Base delay in seconds of the jittered exponential backoff")
+    LLM_RETRY_MAX_DELAY: float = Field(default=30.0, gt=0, description="Max delay in seconds between two retries")
+
+
+    # Text to speech (pipelined : segments synthesized while the summary is generated)
+
+    TTS_SEGMENT_MIN_CHARS: int = Field(default=300, ge=1, description="A TTS segment ends at the first sentence boundary after this many characters")
+    TTS_SEGMENT_MAX_CHARS: int = Field(default=1500, ge=50, description="Max characters of a TTS segment (cut at a space when no sentence ends)")
+    TTS_MAX_CONCURRENCY: int = Field(default=3, ge=1, description="TTS calls in flight at the same time in the process")
+    AUDIO_DIR: str = Field(default=".audio", description="Directory of the synthesized audio served by /audio/{audio_id}")
+    AUDIO_STORE_MAX_MB: int = Field(default=500, ge=1, description="Max size of the audio directory (oldest files removed first)")
+    TTS_SEGMENT_PAUSE_MS: int = Field(default=250, ge=0, description="Silence inserted between two synthesized segments")
+
+
+    # LLM routing (ordered "provider:model" candidates per task , providers : groq , gemini)
+
+    LLM_ROUTES: Dict[str, List[str]] = Field(default_factory=dict, description='Candidates per task (map , reduce , stuff , rag_answer) in priority order , e.g. {"map": ["groq:llama-3.1-8b-instant", "gemini:gemini-2.5-flash"]}')
+    LLM_FALLBACK_MODELS: List[str] = Field(default_factory=list, description="Candidates tried after groq:LLM_MODEL by the tasks missing from LLM_ROUTES")
+    LLM_ROUTING_STRATEGY: str = Field(default="priority", pattern="^(priority|latency)$", description="priority (configured order) or latency (lowest rolling p50 first)")
+    LLM_ROUTER_WINDOW: int = Field(default=50, ge=1, description="Calls per model kept for the rolling latency / error rate")
+    LLM_ROUTER_MIN_SAMPLES: int = Field(default=5, ge=1, description="Calls needed before a model's latency / error rate is used for routing")
+    LLM_ROUTER_MAX_ERROR_RATE: float = Field(default=0.5, ge=0, le=1, description="Models above this rolling error rate are tried last")
+    LLM_ROUTER_COOLDOWN_SECONDS: float = Field(default=30.0, ge=0, description="A rate limited (429) model is tried last for this long")
+    LLM_HEDGE_ENABLED: bool = Field(default=False, description="Start the next model when a call is slower than the current model's p95 (first answer wins , costs extra tokens)")
+    LLM_HEDGE_DELAY_SECONDS: float = Field(default=5.0, gt=0, description="Hedging delay used until a model has LLM_ROUTER_MIN_SAMPLES calls")
+
+    @field_validator("LLM_ROUTES")
+    @classmethod
+    def check_llm_routes(cls, routes: Dict[str, List[str]]) -> Dict[str, List[str]]:
+        for task, models in routes.items():
+            if task not in ("map", "reduce", "stuff", "rag_answer", "default"):
+                raise ValueError(f"Unknown LLM task {task!r} (map , reduce , stuff , rag_answer , default)")
+            for model in models:
+                cls.check_model_spec(model)
+        return routes
+
+    @field_validator("LLM_FALLBACK_MODELS")
+    @classmethod
+    def check_fallback_models(cls, models: List[str]) -> List[str]:
+        for model in models:
+            cls.check_model_spec(model)
+        return models
+
+    @staticmethod
+    def check_model_spec(model: str) -> None:
+        provider, _, name = model.partition(":")
+        if provider not in ("groq", "gemini") or not name:
+            raise ValueError(f"Invalid LLM {model!r} , expected provider:model with provider groq or gemini")
+
+
+    # Background jobs (durable SQLite queue processed by worker.py)
+
+    JOBS_DIR: str = Field(default=".jobs", description="Directory of the job queue database and of the job inputs")
+    JOB_WORKERS: int = Field(default=2, ge=1, description="Jobs processed in parallel by one worker process")
+    JOB_LEASE_SECONDS: int = Field(default=300, ge=10, description="A running job whose worker stays silent this long is picked up again")
+    JOB_MAX_ATTEMPTS: int = Field(default=3, ge=1, description="Max times a job is started before it is marked failed")
+    JOB_POLL_INTERVAL: float = Field(default=1.0, gt=0, description="Seconds an idle worker waits before polling the queue again")
+
+
     # Configuration for loading settings from .env file
 
     model_config = SettingsConfigDict(
@@ -0,0 +1,127 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+
+from fastapi import HTTPException
+
+from core.config import get_settings
+
+
+class WorkerPool :
+    '''
+    Bounded execution layer for the blocking (synchronous) pipelines.
+
+    - Runs every pipeline call on a fixed size thread pool, so the event loop keeps serving other requests (incl. /health).
+    - Enforces a per-endpoint concurrency limit. A saturated endpoint is rejected fast with 429.
+    - Enforces a global bound of (workers + queued jobs). A full pool is rejected fast with 503.
+    '''
+
+    def __init__(self , max_workers : int , max_queue : int , limits : dict[str , int]) :
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.capacity = max_workers + max_queue
+        self.limits = dict(limits)
+
+        self._executor = ThreadPoolExecutor(max_workers = max_workers , thread_name_prefix = "lawlens-worker")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._in_flight = {name : 0 for name in self.limits}
+        self._rejected = {name : 0 for name in self.limits}
+
+
+    def _acquire(self , endpoint : str) -> None :
+        '''Reserves a slot for the endpoint or raises 429 / 503 without waiting.'''
+
+        with self._lock :
+            limit = self.limits.get(endpoint)
+
+            if limit is not None and self._in_flight.get(endpoint , 0) >= limit :
+                self._rejected[endpoint] = self._rejected.get(endpoint , 0) + 1
+                raise HTTPException(
+                    status_code = 429 ,
+                    detail = f"Too many concurrent '{endpoint}' requests. Please retry shortly." ,
+                    headers = {"Retry-After" : "1"}
+                )
+
+            if self._pending >= self.capacity :
+                self._rejected[endpoint] = self._rejected.get(endpoint , 0) + 1
+                raise HTTPException(
+                    status_code = 503 ,
+                    detail = "Server is busy, the worker queue is full. Please retry shortly." ,
+                    headers = {"Retry-After" : "2"}
+                )
+
+            self._pending += 1
+            self._in_flight[endpoint] = self._in_flight.get(endpoint , 0) + 1
+
+
+    def _release(self , endpoint : str) -> None :
+        with self._lock :
+            self._pending -= 1
+            self._in_flight[endpoint] -= 1
+
+
+    def submit(self , endpoint : str , func , *args , **kwargs) -> asyncio.Future :
+        '''
+        Schedules a blocking callable on the worker pool and returns an awaitable future.
+        Raises 429 / 503 right away (before anything is scheduled) when the endpoint or the pool is saturated.
+        The slot is released when the job actually finishes (not when the client disconnects),
+        so the limits always reflect the real load on the workers.
+        '''
+
+        self._acquire(endpoint)
+
+        try :
+            future = self._executor.submit(partial(func , *args , **kwargs))
+        except Exception :
+            self._release(endpoint)
+            raise
+
+        future.add_done_callback(lambda _ : self._release(endpoint))
+
+        return asyncio.wrap_future(future)
+
+
+    async def run(self , endpoint : str , func , *args , **kwargs) :
+        '''Runs a blocking callable on the worker pool and awaits its result.'''
+        return await self.submit(endpoint , func , *args , **kwargs)
+
+
+    def stats(self) -> dict :
+        '''Snapshot of the pool load, exposed on /health.'''
+
+        with self._lock :
+            return {
+                "workers" : self.max_workers ,
+                "capacity" : self.capacity ,
+                "pending" : self._pending ,
+                "in_flight" : dict(self._in_flight) ,
+                "limits" : dict(self.limits) ,
+                "rejected" : dict(self._rejected)
+            }
+
+
+    def shutdown(self) -> None :
+        self._executor.shutdown(wait = False , cancel_futures = True)
+
+
+
+
+"""
+Single shared WorkerPool built from the settings (same singleton pattern as get_settings).
+"""
+
+@lru_cache
+def get_worker_pool() -> WorkerPool :
+    settings = get_settings()
+
+    return WorkerPool(
+        max_workers = settings.WORKER_POOL_SIZE ,
+        max_queue = settings.WORKER_QUEUE_SIZE ,
+        limits = {
+            "summarize" : settings.SUMMARIZE_MAX_CONCURRENCY ,
+            "rag_index" : settings.RAG_INDEX_MAX_CONCURRENCY ,
+            "rag_ask" : settings.RAG_ASK_MAX_CONCURRENCY
+        }
+    )
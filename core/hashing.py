@@ -0,0 +1,53 @@
+import hashlib
+from typing import BinaryIO, Union
+
+
+'''Size of the blocks read when hashing files, so large uploads are never loaded into memory at once.'''
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def hash_bytes(data : bytes) -> str :
+    """Returns the sha256 hex digest of raw bytes."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_text(text : str) -> str :
+    """Returns the sha256 hex digest of a text (utf-8 encoded)."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def hash_stream(stream : BinaryIO) -> str :
+    """Returns the sha256 hex digest of a binary buffer, read block by block from its start (rewound afterwards)."""
+
+    digest = hashlib.sha256()
+
+    stream.seek(0)
+    for block in iter(lambda : stream.read(HASH_BLOCK_SIZE) , b"") :
+        digest.update(block)
+    stream.seek(0)
+
+    return digest.hexdigest()
+
+
+def hash_file(file_path : str) -> str :
+    """Returns the sha256 hex digest of a file's content, reading it block by block."""
+
+    with open(file_path , "rb") as f :
+        return hash_stream(f)
+
+
+def hash_source(source : Union[str , bytes , BinaryIO]) -> str :
+    """Returns the sha256 hex digest of a document given as a path, bytes or binary buffer."""
+
+    if isinstance(source , str) :
+        return hash_file(source)
+
+    if isinstance(source , (bytes , bytearray)) :
+        return hash_bytes(bytes(source))
+
+    return hash_stream(source)
+
+
+def make_key(*parts) -> str :
+    """Builds a stable cache key from several parts (hashes, language, model id...)."""
+    return hash_text("\x1f".join(str(part) for part in parts))
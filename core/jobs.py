@@ -0,0 +1,236 @@
+import json
+import os
+import sqlite3
+import time
+import uuid
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Optional
+
+from core.config import get_settings
+
+
+class JobStore :
+    '''
+    Durable job queue backed by SQLite, shared by the API (which enqueues and reads jobs)
+    and the background workers (worker.py, which claim and run them).
+
+    Job lifecycle : queued -> running -> succeeded | failed
+    - A running job holds a lease that its worker renews (heartbeat) while it runs the job.
+      If the worker dies, the lease expires and another worker claims the job again (up to max_attempts).
+    - Progress and results are only written by the worker currently holding the job : a worker whose job
+      was reclaimed cannot overwrite the outcome of the new attempt.
+    - Inputs (uploaded files) live on disk under the jobs directory until the job finishes.
+    '''
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+    def __init__(self , directory : str , lease_seconds : int = 300 , max_attempts : int = 3) :
+        self.directory = directory
+        self.uploads_dir = os.path.join(directory , "uploads")
+        self.path = os.path.join(directory , "jobs.sqlite3")
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+
+        os.makedirs(self.uploads_dir , exist_ok = True)
+
+        with self._connect() as conn :
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY ,
+                    kind TEXT NOT NULL ,
+                    status TEXT NOT NULL ,
+                    phase TEXT ,
+                    progress REAL NOT NULL DEFAULT 0 ,
+                    params TEXT NOT NULL ,
+                    input_path TEXT ,
+                    result TEXT ,
+                    error TEXT ,
+                    attempts INTEGER NOT NULL DEFAULT 0 ,
+                    worker_id TEXT ,
+                    lease_expires_at REAL ,
+                    created_at REAL NOT NULL ,
+                    updated_at REAL NOT NULL
+                )"""
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status , created_at)")
+
+
+    @contextmanager
+    def _connect(self) :
+        '''Autocommit connection : transactions are opened explicitly where atomicity matters (claim).'''
+        conn = sqlite3.connect(self.path , timeout = 30 , isolation_level = None)
+        conn.row_factory = sqlite3.Row
+        try :
+            yield conn
+        finally :
+            conn.close()
+
+
+    @staticmethod
+    def _to_dict(row : sqlite3.Row) -> dict :
+        job = dict(row)
+        job["params"] = json.loads(job["params"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+
+    def new_input_path(self , suffix : str = "") -> tuple[str , str] :
+        '''Returns (job_id , path) : the durable location where the API stores the job input before enqueuing it.'''
+        job_id = uuid.uuid4().hex
+        return job_id , os.path.join(self.uploads_dir , f"{job_id}{suffix}")
+
+
+    def enqueue(self , kind : str , params : dict , input_path : Optional[str] = None , job_id : Optional[str] = None) -> str :
+        job_id = job_id or uuid.uuid4().hex
+        now = time.time()
+
+        with self._connect() as conn :
+            conn.execute(
+                "INSERT INTO jobs (id , kind , status , phase , params , input_path , created_at , updated_at) VALUES (? , ? , ? , ? , ? , ? , ? , ?)" ,
+                (job_id , kind , JobStore.QUEUED , JobStore.QUEUED , json.dumps(params) , input_path , now , now)
+            )
+
+        return job_id
+
+
+    def get(self , job_id : str) -> Optional[dict] :
+        with self._connect() as conn :
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?" , (job_id ,)).fetchone()
+            return JobStore._to_dict(row) if row else None
+
+
+    def claim(self , worker_id : str) -> Optional[dict] :
+        '''
+        Atomically takes the oldest queued job, or a running job whose lease expired (its worker died).
+        Jobs that already used all their attempts are marked failed instead of being run again.
+        '''
+
+        now = time.time()
+
+        with self._connect() as conn :
+            conn.execute("BEGIN IMMEDIATE")
+
+            try :
+                abandoned = conn.execute(
+                    "SELECT input_path FROM jobs WHERE status = ? AND lease_expires_at < ? AND attempts >= ?" ,
+                    (JobStore.RUNNING , now , self.max_attempts)
+                ).fetchall()
+
+                conn.execute(
+                    "UPDATE jobs SET status = ? , phase = ? , error = ? , lease_expires_at = NULL , updated_at = ? WHERE status = ? AND lease_expires_at < ? AND attempts >= ?" ,
+                    (JobStore.FAILED , JobStore.FAILED , "Job abandoned : worker stopped too many times" , now , JobStore.RUNNING , now , self.max_attempts)
+                )
+
+                row = conn.execute(
+                    """SELECT * FROM jobs
+                    WHERE status = ? OR (status = ? AND lease_expires_at < ?)
+                    ORDER BY created_at LIMIT 1""" ,
+                    (JobStore.QUEUED , JobStore.RUNNING , now)
+                ).fetchone()
+
+                if row is not None :
+                    conn.execute(
+                        """UPDATE jobs SET status = ? , phase = ? , worker_id = ? , attempts = attempts + 1 ,
+                        lease_expires_at = ? , updated_at = ? WHERE id = ?""" ,
+                        (JobStore.RUNNING , "started" , worker_id , now + self.lease_seconds , now , row["id"])
+                    )
+                conn.execute("COMMIT")
+
+            except Exception :
+                conn.execute("ROLLBACK")
+                raise
+
+        '''the inputs of the abandoned jobs are never read again'''
+        for abandoned_row in abandoned :
+            JobStore._remove_input(abandoned_row["input_path"])
+
+        return self.get(row["id"]) if row is not None else None
+
+
+    @staticmethod
+    def _remove_input(input_path : Optional[str]) -> None :
+        if input_path and os.path.exists(input_path) :
+            try :
+                os.remove(input_path)
+            except FileNotFoundError :
+                pass
+
+
+    def renew(self , job_id : str , worker_id : str) -> bool :
+        '''Extends the lease of a job held by worker_id. False when the job was reclaimed or already finished.'''
+
+        now = time.time()
+
+        with self._connect() as conn :
+            cursor = conn.execute(
+                "UPDATE jobs SET lease_expires_at = ? , updated_at = ? WHERE id = ? AND worker_id = ? AND status = ?" ,
+                (now + self.lease_seconds , now , job_id , worker_id , JobStore.RUNNING)
+            )
+            return cursor.rowcount > 0
+
+
+    def update_progress(self , job_id : str , worker_id : str , phase : str , progress : float) -> None :
+        '''Records the phase / progress and renews the lease of the running job (ignored when worker_id no longer holds it).'''
+
+        now = time.time()
+
+        with self._connect() as conn :
+            conn.execute(
+                "UPDATE jobs SET phase = ? , progress = ? , lease_expires_at = ? , updated_at = ? WHERE id = ? AND worker_id = ? AND status = ?" ,
+                (phase , progress , now + self.lease_seconds , now , job_id , worker_id , JobStore.RUNNING)
+            )
+
+
+    def complete(self , job_id : str , worker_id : str , result : dict) -> bool :
+        return self._finish(job_id , worker_id , JobStore.SUCCEEDED , result = json.dumps(result))
+
+
+    def fail(self , job_id : str , worker_id : str , error : str) -> bool :
+        return self._finish(job_id , worker_id , JobStore.FAILED , error = error)
+
+
+    def _finish(self , job_id : str , worker_id : str , status : str , result : Optional[str] = None , error : Optional[str] = None) -> bool :
+        '''Records the final state of a job held by worker_id. False (nothing written) when another worker took the job over.'''
+
+        now = time.time()
+
+        with self._connect() as conn :
+            row = conn.execute("SELECT input_path FROM jobs WHERE id = ?" , (job_id ,)).fetchone()
+
+            cursor = conn.execute(
+                """UPDATE jobs SET status = ? , phase = ? , progress = COALESCE(? , progress) , result = ? , error = ? ,
+                lease_expires_at = NULL , updated_at = ? WHERE id = ? AND worker_id = ? AND status = ?""" ,
+                (status , status , 1.0 if status == JobStore.SUCCEEDED else None , result , error , now , job_id , worker_id , JobStore.RUNNING)
+            )
+
+        if cursor.rowcount == 0 :
+            return False
+
+        '''the input is no longer needed once the job reached a final state'''
+        if row is not None :
+            JobStore._remove_input(row["input_path"])
+
+        return True
+
+
+    def counts(self) -> dict :
+        with self._connect() as conn :
+            return {row["status"] : row["n"] for row in conn.execute("SELECT status , COUNT(*) AS n FROM jobs GROUP BY status")}
+
+
+
+
+@lru_cache
+def get_job_store() -> JobStore :
+    settings = get_settings()
+
+    return JobStore(
+        directory = settings.JOBS_DIR ,
+        lease_seconds = settings.JOB_LEASE_SECONDS ,
+        max_attempts = settings.JOB_MAX_ATTEMPTS
+    )
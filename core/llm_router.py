@@ -0,0 +1,387 @@
+import logging
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Iterator, Optional
+
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import ConfigDict
+
+from core.rate_limit import RateLimiter, is_rate_limit_error
+
+logger = logging.getLogger("lawlens.llm_router")
+
+
+'''Tasks routed separately : map / reduce (and collapse) of the map-reduce summary , the stuff summary , the RAG answer'''
+TASKS = ("map" , "reduce" , "stuff" , "rag_answer")
+
+
+class LatencyStats :
+    '''Rolling window of the last calls of a model : latency of the successful ones , error rate of all.'''
+
+    def __init__(self , window : int) :
+        self.calls : deque[tuple[float , bool]] = deque(maxlen = window)
+        self._lock = threading.Lock()
+
+
+    def record(self , seconds : float , ok : bool) -> None :
+        with self._lock :
+            self.calls.append((seconds , ok))
+
+
+    def percentile(self , p : float) -> Optional[float] :
+        with self._lock :
+            latencies = sorted(seconds for seconds , ok in self.calls if ok)
+
+        if not latencies :
+            return None
+
+        return latencies[min(len(latencies) - 1 , math.ceil(p / 100 * len(latencies)) - 1)]
+
+
+    def error_rate(self) -> float :
+        with self._lock :
+            return sum(1 for _ , ok in self.calls if not ok) / len(self.calls) if self.calls else 0.0
+
+
+    def samples(self) -> int :
+        with self._lock :
+            return len(self.calls)
+
+
+    def snapshot(self) -> dict :
+        p50 , p95 = self.percentile(50) , self.percentile(95)
+        return {
+            "calls" : self.samples() ,
+            "p50_ms" : None if p50 is None else round(p50 * 1000) ,
+            "p95_ms" : None if p95 is None else round(p95 * 1000) ,
+            "error_rate" : round(self.error_rate() , 3)
+        }
+
+
+
+
+class RouteCandidate :
+    '''A "provider:model" of a route. The chat model is only loaded on first use (see core/providers.py).'''
+
+    def __init__(self , name : str , loader : Callable[[] , BaseChatModel] , window : int) :
+        self.name = name
+        self.loader = loader
+        self.stats = LatencyStats(window)
+        self.cooldown_until = 0.0
+
+
+    def model(self) -> BaseChatModel :
+        return self.loader()
+
+
+
+
+class LLMRouter :
+    '''
+    Routes the LLM calls of every task over an ordered list of "provider:model" candidates.
+
+    - Order : the configured priority ("priority" strategy) or the lowest rolling p50 first ("latency" strategy).
+      Candidates over max_error_rate (once min_samples calls are known) or cooling down after a 429 are tried last.
+    - Fallback : a failing call moves on to the next candidate (a stream only before its first token).
+    - Hedging (optional , invoke only) : when the current call is slower than the candidate p95 (hedge_delay until
+      min_samples calls are known , counted from the moment the call actually starts), the next candidate is started too
+      and the first answer wins. A hedge takes its own slot from the rate limiter. The calls run on a pool sized for
+      max_hedge_workers calls , i.e. every LLM call the process can have in flight plus one hedge each.
+    - Rolling p50 / p95 latency and error rate per candidate are exposed by stats().
+
+    Chains use the per-task chat model returned by for_task (a regular LangChain chat model),
+    local fake chat models can be given as loaders for tests.
+    '''
+
+    def __init__(
+        self ,
+        routes : dict[str , list[tuple[str , Callable[[] , BaseChatModel]]]] ,
+        strategy : str = "priority" ,
+        window : int = 50 ,
+        min_samples : int = 5 ,
+        max_error_rate : float = 0.5 ,
+        cooldown : float = 30.0 ,
+        hedge : bool = False ,
+        hedge_delay : float = 5.0 ,
+        max_hedge_workers : int = 8 ,
+        rate_limiter : Optional[RateLimiter] = None
+    ) :
+        self.strategy = strategy
+        self.min_samples = min_samples
+        self.max_error_rate = max_error_rate
+        self.cooldown = cooldown
+        self.hedge = hedge
+        self.hedge_delay = hedge_delay
+        self.rate_limiter = rate_limiter
+
+        '''one candidate (and one set of stats) per model , shared by the tasks routed to it'''
+        self.candidates : dict[str , RouteCandidate] = {}
+        self.routes : dict[str , list[RouteCandidate]] = {}
+
+        for task , entries in routes.items() :
+            self.routes[task] = []
+            for name , loader in entries :
+                candidate = self.candidates.setdefault(name , RouteCandidate(name , loader , window))
+                self.routes[task].append(candidate)
+
+        self._hedges = 0
+        self._fallbacks = 0
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers = max_hedge_workers , thread_name_prefix = "llm-hedge") if hedge else None
+
+        '''identifies the routing for the summary / answer caches : the model name itself when there is a single model'''
+        names = list(self.candidates)
+        self.model_name = names[0].split(":" , 1)[-1] if len(names) == 1 else "router:" + ",".join(names)
+
+
+    def route(self , task : str) -> list[RouteCandidate] :
+        candidates = self.routes.get(task) or self.routes.get("default")
+        if not candidates :
+            raise KeyError(f"No LLM route configured for task : {task}")
+        return candidates
+
+
+    def _healthy(self , candidate : RouteCandidate , now : float) -> bool :
+        if candidate.cooldown_until > now :
+            return False
+        return candidate.stats.samples() < self.min_samples or candidate.stats.error_rate() <= self.max_error_rate
+
+
+    def order(self , task : str) -> list[RouteCandidate] :
+        '''Candidates of the task in the order they are tried.'''
+
+        candidates = self.route(task)
+        now = time.monotonic()
+
+        healthy = [c for c in candidates if self._healthy(c , now)]
+        degraded = [c for c in candidates if not self._healthy(c , now)]
+
+        if self.strategy == "latency" :
+            '''models without enough samples first (explored) , then by p50 ; configured order breaks ties'''
+            def latency(candidate : RouteCandidate) -> float :
+                if candidate.stats.samples() < self.min_samples :
+                    return 0.0
+                p50 = candidate.stats.percentile(50)
+                return math.inf if p50 is None else p50
+
+            healthy.sort(key = latency)
+
+        return healthy + degraded
+
+
+    def _record(self , candidate : RouteCandidate , started : float , error : Optional[Exception] = None) -> None :
+        candidate.stats.record(time.perf_counter() - started , error is None)
+
+        if error is not None and is_rate_limit_error(error) :
+            candidate.cooldown_until = time.monotonic() + self.cooldown
+
+
+    '''Used to reserve the rate limiter budget of a hedged call (same estimate as the summarizer)'''
+    CHARS_PER_TOKEN = 4
+    EXPECTED_OUTPUT_TOKENS = 512
+
+    @staticmethod
+    def estimate_tokens(messages : list[BaseMessage]) -> int :
+        return sum(len(str(message.content)) for message in messages) // LLMRouter.CHARS_PER_TOKEN + LLMRouter.EXPECTED_OUTPUT_TOKENS
+
+
+    def _call(self , candidate : RouteCandidate , messages : list[BaseMessage] , started_at : Optional[Future] = None ,
+              reserve : bool = False , **kwargs) -> BaseMessage :
+        '''Calls a candidate. reserve : takes a rate limiter slot first (hedges , the caller already took one for the first call).
+        started_at (optional) receives the start time once the call is actually sent (after the pool queue and the rate limiter).'''
+
+        if reserve and self.rate_limiter is not None :
+            self.rate_limiter.acquire(LLMRouter.estimate_tokens(messages))
+
+        started = time.perf_counter()
+        if started_at is not None :
+            started_at.set_result(started)
+
+        try :
+            result = candidate.model().invoke(messages , **kwargs)
+        except Exception as e :
+            self._record(candidate , started , e)
+            raise
+
+        self._record(candidate , started)
+        return result
+
+
+    def _count(self , name : str) -> None :
+        with self._lock :
+            setattr(self , name , getattr(self , name) + 1)
+
+
+    def invoke(self , task : str , messages : list[BaseMessage] , **kwargs) -> BaseMessage :
+        '''Answer of the first candidate that succeeds (hedged when enabled). Raises the last error when all fail.'''
+
+        candidates = self.order(task)
+
+        if self.hedge and len(candidates) > 1 :
+            return self._invoke_hedged(task , candidates , messages , **kwargs)
+
+        error = None
+        for i , candidate in enumerate(candidates) :
+            try :
+                return self._call(candidate , messages , **kwargs)
+            except Exception as e :
+                error = e
+                if i + 1 < len(candidates) :
+                    self._count("_fallbacks")
+                    logger.warning("%s failed for %s (%s) , falling back to %s" , candidate.name , task , e , candidates[i + 1].name)
+
+        raise error
+
+
+    def _hedge_after(self , candidate : RouteCandidate) -> float :
+        if candidate.stats.samples() >= self.min_samples :
+            p95 = candidate.stats.percentile(95)
+            if p95 is not None :
+                return p95
+        return self.hedge_delay
+
+
+    def _invoke_hedged(self , task : str , candidates : list[RouteCandidate] , messages : list[BaseMessage] , **kwargs) -> BaseMessage :
+        remaining = list(candidates)
+        pending = {}
+        error = None
+
+        def launch(reserve : bool) -> tuple[RouteCandidate , Future] :
+            candidate = remaining.pop(0)
+            started_at = Future()
+            pending[self._pool.submit(self._call , candidate , messages , started_at , reserve , **kwargs)] = candidate
+            return candidate , started_at
+
+        last , last_started_at = launch(reserve = False)
+
+        while pending :
+            '''the hedge timer only runs once the last call actually started (not while it waits in the pool queue or for the rate limiter)'''
+            timeout = None
+            watched = set(pending)
+
+            if remaining :
+                if last_started_at.done() :
+                    timeout = max(0.0 , last_started_at.result() + self._hedge_after(last) - time.perf_counter())
+                else :
+                    watched.add(last_started_at)
+
+            done , _ = wait(watched , timeout = timeout , return_when = FIRST_COMPLETED)
+            done.discard(last_started_at)
+
+            if not done :
+                if timeout is not None :
+                    '''slower than usual : race the next candidate (the slow call keeps running , its latency is still recorded)'''
+                    self._count("_hedges")
+                    logger.info("%s slow for %s , hedging with %s" , last.name , task , remaining[0].name)
+                    last , last_started_at = launch(reserve = True)
+                continue
+
+            for future in done :
+                pending.pop(future)
+                try :
+                    return future.result()
+                except Exception as e :
+                    error = e
+
+            if remaining and not pending :
+                self._count("_fallbacks")
+                last , last_started_at = launch(reserve = False)
+
+        raise error
+
+
+    def stream(self , task : str , messages : list[BaseMessage] , **kwargs) -> Iterator[AIMessageChunk] :
+        '''Streams from the first candidate that starts answering. Once a token is out, an error is raised instead of switching models.'''
+
+        candidates = self.order(task)
+        error = None
+
+        for i , candidate in enumerate(candidates) :
+            started = time.perf_counter()
+            streamed = False
+
+            try :
+                for chunk in candidate.model().stream(messages , **kwargs) :
+                    streamed = True
+                    yield chunk
+
+            except Exception as e :
+                self._record(candidate , started , e)
+                if streamed :
+                    raise
+                error = e
+                if i + 1 < len(candidates) :
+                    self._count("_fallbacks")
+                    logger.warning("%s failed for %s (%s) , falling back to %s" , candidate.name , task , e , candidates[i + 1].name)
+                continue
+
+            self._record(candidate , started)
+            return
+
+        raise error
+
+
+    def for_task(self , task : str) -> "RoutedChatModel" :
+        '''Chat model of a task , to be used in chains like any other chat model.'''
+        return RoutedChatModel(router = self , task = task , model_name = f"{self.model_name}/{task}")
+
+
+    def stats(self) -> dict :
+        return {
+            "strategy" : self.strategy ,
+            "hedge" : self.hedge ,
+            "hedges" : self._hedges ,
+            "fallbacks" : self._fallbacks ,
+            "routes" : {task : [c.name for c in candidates] for task , candidates in self.routes.items()} ,
+            "models" : {name : candidate.stats.snapshot() for name , candidate in self.candidates.items()}
+        }
+
+
+
+
+class RoutedChatModel(BaseChatModel) :
+    '''LangChain chat model delegating every call of one task to the LLMRouter.'''
+
+    model_config = ConfigDict(arbitrary_types_allowed = True)
+
+    router : Any
+    task : str
+    model_name : str
+
+
+    @property
+    def _llm_type(self) -> str :
+        return "lawlens-router"
+
+
+    def _generate(self , messages : list[BaseMessage] , stop : Optional[list[str]] = None ,
+                  run_manager : Optional[CallbackManagerForLLMRun] = None , **kwargs) -> ChatResult :
+
+        message = self.router.invoke(self.task , messages , stop = stop , **kwargs)
+
+        if not isinstance(message , AIMessage) :
+            message = AIMessage(content = message.content)
+
+        return ChatResult(generations = [ChatGeneration(message = message)])
+
+
+    def _stream(self , messages : list[BaseMessage] , stop : Optional[list[str]] = None ,
+                run_manager : Optional[CallbackManagerForLLMRun] = None , **kwargs) -> Iterator[ChatGenerationChunk] :
+
+        for chunk in self.router.stream(self.task , messages , stop = stop , **kwargs) :
+            if run_manager is not None :
+                run_manager.on_llm_new_token(chunk.content)
+            yield ChatGenerationChunk(message = AIMessageChunk(content = chunk.content))
+
+
+
+
+def route_model(llm , task : str) :
+    """Chat model to use for a task : the routed model when llm is an LLMRouter , llm itself otherwise (single model , fakes)."""
+    return llm.for_task(task) if isinstance(llm , LLMRouter) else llm
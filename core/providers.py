@@ -0,0 +1,201 @@
+import asyncio
+import os
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Callable
+
+from core.config import get_settings
+
+
+class ProviderRegistry :
+    '''
+    Lazily built clients of the external providers (chat LLM , TTS , embeddings), shared by all requests.
+
+    - A provider is registered as a factory and only built (its SDK imported) on first use,
+      so importing the API / a worker is fast and a missing key only fails the feature that needs it.
+    - Built once per process , thread-safe (concurrent first uses wait for the same instance).
+    '''
+
+    def __init__(self) :
+        self._factories : dict[str , Callable[[] , Any]] = {}
+        self._instances : dict[str , Any] = {}
+        self._load_seconds : dict[str , float] = {}
+        self._lock = threading.RLock()
+
+
+    def register(self , name : str , factory : Callable[[] , Any]) -> None :
+        '''Registers (or replaces) a provider. A replaced provider is built again on its next use.'''
+
+        with self._lock :
+            self._factories[name] = factory
+            self._instances.pop(name , None)
+
+
+    def get_or_register(self , name : str , factory : Callable[[] , Any]) -> Any :
+        '''Builds with factory the first time name is used , unless a provider was already registered under that name (e.g. a fake in tests).'''
+
+        with self._lock :
+            self._factories.setdefault(name , factory)
+
+        return self.get(name)
+
+
+    def get(self , name : str) -> Any :
+        instance = self._instances.get(name)
+        if instance is not None :
+            return instance
+
+        with self._lock :
+            if name not in self._instances :
+                if name not in self._factories :
+                    raise KeyError(f"Unknown provider : {name}")
+
+                started = time.perf_counter()
+                self._instances[name] = self._factories[name]()
+                self._load_seconds[name] = round(time.perf_counter() - started , 3)
+
+            return self._instances[name]
+
+
+    def is_loaded(self , name : str) -> bool :
+        return name in self._instances
+
+
+    def stats(self) -> dict :
+        '''Registered providers , and the build time of the ones already loaded (exposed on /health).'''
+
+        with self._lock :
+            return {name : {"loaded" : name in self._instances , "load_seconds" : self._load_seconds.get(name)} for name in self._factories}
+
+
+
+
+def require_key(name : str) -> str :
+    """Value of an API key setting , or a clear error for the feature that needs it."""
+
+    value = getattr(get_settings() , name)
+    if not value :
+        raise RuntimeError(f"{name} is not set , add it to the .env file to use this feature")
+    return value
+
+
+def ensure_event_loop() -> None :
+    """The Google GenAI clients create an asyncio client when built : give the current (worker) thread a loop if it has none."""
+
+    try :
+        asyncio.get_event_loop()
+    except RuntimeError :
+        asyncio.set_event_loop(asyncio.new_event_loop())
+
+
+@lru_cache
+def configure_tracing() -> bool :
+    '''Exports the LangSmith settings to the environment (once , on first use). Tracing stays off without an API key.'''
+
+    settings = get_settings()
+
+    if not (settings.LANGCHAIN_TRACING_V2 and settings.LANGCHAIN_API_KEY) :
+        os.environ["LANGCHAIN_TRACING_V2"] = "false"
+        return False
+
+    os.environ["LANGCHAIN_API_KEY"] = settings.LANGCHAIN_API_KEY
+    os.environ["LANGCHAIN_TRACING_V2"] = "true"
+    if settings.LANGCHAIN_PROJECT :
+        os.environ["LANGCHAIN_PROJECT"] = settings.LANGCHAIN_PROJECT
+
+    return True
+
+
+
+
+def build_chat_model(spec : str) :
+    """Chat model of a "provider:model" spec (groq or gemini)."""
+
+    configure_tracing()
+    provider , _ , model = spec.partition(":")
+
+    if provider == "groq" :
+        from langchain_groq import ChatGroq
+        return ChatGroq(model = model , api_key = require_key("GROQ_API_KEY"))
+
+    if provider == "gemini" :
+        ensure_event_loop()
+        from langchain_google_genai import ChatGoogleGenerativeAI
+        return ChatGoogleGenerativeAI(model = model , google_api_key = require_key("GOOGLE_API_KEY"))
+
+    raise ValueError(f"Unknown LLM provider : {provider}")
+
+
+def get_chat_model(spec : str) :
+    """Shared chat model of a "provider:model" spec , built on first use (registered as "llm:<spec>")."""
+    return get_provider_registry().get_or_register(f"llm:{spec}" , lambda : build_chat_model(spec))
+
+
+def build_llm() :
+    """
+    LLM router used for summaries and answers : LLM_ROUTES per task , groq:LLM_MODEL then LLM_FALLBACK_MODELS for the others.
+    No chat model is built here , each one is built on its first call.
+    """
+
+    from core.llm_router import TASKS, LLMRouter
+    from core.rate_limit import get_llm_rate_limiter
+
+    settings = get_settings()
+
+    '''every LLM call the process can have in flight (parallel summaries or jobs x map calls , plus RAG answers) , plus one hedge each'''
+    max_calls = settings.SUMMARY_MAP_CONCURRENCY * max(settings.SUMMARIZE_MAX_CONCURRENCY , settings.JOB_WORKERS) + settings.RAG_ASK_MAX_CONCURRENCY
+    default = list(dict.fromkeys([f"groq:{settings.LLM_MODEL}" , *settings.LLM_FALLBACK_MODELS]))
+
+    def candidates(specs : list[str]) -> list :
+        return [(spec , lambda spec = spec : get_chat_model(spec)) for spec in specs]
+
+    return LLMRouter(
+        routes = {task : candidates(settings.LLM_ROUTES.get(task) or settings.LLM_ROUTES.get("default") or default) for task in TASKS} ,
+        strategy = settings.LLM_ROUTING_STRATEGY ,
+        window = settings.LLM_ROUTER_WINDOW ,
+        min_samples = settings.LLM_ROUTER_MIN_SAMPLES ,
+        max_error_rate = settings.LLM_ROUTER_MAX_ERROR_RATE ,
+        cooldown = settings.LLM_ROUTER_COOLDOWN_SECONDS ,
+        hedge = settings.LLM_HEDGE_ENABLED ,
+        hedge_delay = settings.LLM_HEDGE_DELAY_SECONDS ,
+        max_hedge_workers = 2 * max_calls ,
+        rate_limiter = get_llm_rate_limiter()
+    )
+
+
+def build_tts_client() :
+    """Gemini TTS model."""
+
+    ensure_event_loop()
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    from src.speech import TextToSpeech
+
+    return ChatGoogleGenerativeAI(model = TextToSpeech.MODEL , google_api_key = require_key("GOOGLE_API_KEY"))
+
+
+def build_embedder() :
+    """Cached embedder of the configured EMBEDDING_BACKEND."""
+
+    ensure_event_loop()
+    from rag.embedder import Embedder
+
+    return Embedder.build_embedder()
+
+
+
+
+@lru_cache
+def get_provider_registry() -> ProviderRegistry :
+    registry = ProviderRegistry()
+
+    registry.register("llm" , build_llm)
+    registry.register("tts" , build_tts_client)
+    registry.register("embeddings" , build_embedder)
+
+    return registry
+
+
+def get_llm() :
+    """The shared LLMRouter (pass it as the llm of the pipelines , they route each task through it)."""
+    return get_provider_registry().get("llm")
@@ -0,0 +1,143 @@
+import random
+import threading
+import time
+from functools import lru_cache
+
+from core.config import get_settings
+
+
+class TokenBucket :
+    '''
+    Thread-safe token bucket.
+    Holds up to `capacity` tokens and refills at `rate` tokens per second.
+    acquire() blocks until the requested amount is available.
+    '''
+
+    def __init__(self , capacity : float , rate : float) :
+        self.capacity = capacity
+        self.rate = rate
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+
+    def _refill(self) -> None :
+        now = time.monotonic()
+        self._tokens = min(self.capacity , self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+
+    def acquire(self , amount : float = 1) -> None :
+        '''Requests bigger than the bucket are clamped to its capacity, so they can never wait forever.'''
+
+        amount = min(amount , self.capacity)
+
+        while True :
+            with self._lock :
+                self._refill()
+
+                if self._tokens >= amount :
+                    self._tokens -= amount
+                    return
+
+                wait = (amount - self._tokens) / self.rate
+
+            time.sleep(wait)
+
+
+
+
+class RateLimiter :
+    '''
+    Client side limiter sized to the provider tier : one bucket for requests per minute
+    and one for tokens per minute (prompt + expected completion).
+    '''
+
+    def __init__(self , requests_per_minute : int , tokens_per_minute : int) :
+        self.requests = TokenBucket(capacity = requests_per_minute , rate = requests_per_minute / 60)
+        self.tokens = TokenBucket(capacity = tokens_per_minute , rate = tokens_per_minute / 60)
+
+
+    def acquire(self , tokens : int = 0) -> None :
+        self.requests.acquire(1)
+
+        if tokens :
+            self.tokens.acquire(tokens)
+
+
+
+
+def is_rate_limit_error(error : Exception) -> bool :
+    """True for HTTP 429 / rate limit errors raised by the provider SDKs."""
+
+    if getattr(error , "status_code" , None) == 429 :
+        return True
+
+    message = str(error).lower()
+    return "429" in message or "rate limit" in message or "rate_limit" in message
+
+
+def is_transient_error(error : Exception) -> bool :
+    """True for errors worth retrying on any provider call : rate limits, 5xx, timeouts and dropped connections."""
+
+    if is_rate_limit_error(error) or isinstance(error , (TimeoutError , ConnectionError)) :
+        return True
+
+    if getattr(error , "status_code" , None) in (500 , 502 , 503 , 504) :
+        return True
+
+    message = str(error).lower()
+    return any(marker in message for marker in ("500" , "502" , "503" , "504" , "timeout" , "timed out" , "unavailable" , "deadline exceeded" , "connection"))
+
+
+def _retry_after(error : Exception) -> float | None :
+    """Delay suggested by the provider (Retry-After header), if any."""
+
+    response = getattr(error , "response" , None)
+    headers = getattr(response , "headers" , None) or {}
+
+    try :
+        return float(headers.get("retry-after"))
+    except (TypeError , ValueError) :
+        return None
+
+
+def call_with_retry(func , max_retries : int , base_delay : float , max_delay : float , retry_on = is_rate_limit_error) :
+    """
+    Calls func() and retries it on rate limit errors with exponential backoff and full jitter
+    (or the provider's Retry-After when it is given). Other errors are raised immediately.
+    retry_on decides which errors are retried (e.g. is_transient_error).
+    """
+
+    attempt = 0
+
+    while True :
+        try :
+            return func()
+
+        except Exception as e :
+            if attempt >= max_retries or not retry_on(e) :
+                raise
+
+            delay = _retry_after(e)
+            if delay is None :
+                delay = random.uniform(0 , min(max_delay , base_delay * (2 ** attempt)))
+
+            time.sleep(delay)
+            attempt += 1
+
+
+
+
+"""
+Single limiter shared by every LLM call of the process, since they all draw from the same provider quota.
+"""
+
+@lru_cache
+def get_llm_rate_limiter() -> RateLimiter :
+    settings = get_settings()
+
+    return RateLimiter(
+        requests_per_minute = settings.LLM_REQUESTS_PER_MINUTE ,
+        tokens_per_minute = settings.LLM_TOKENS_PER_MINUTE
+    )
@@ -0,0 +1,59 @@
+import asyncio
+import json
+from typing import Any, AsyncIterator, Callable, Optional
+
+
+'''Signature of the progress callbacks passed down the pipelines : on_event(event_name , data)'''
+EventCallback = Callable[[str , dict] , None]
+
+
+def emit(on_event : Optional[EventCallback] , event : str , **data : Any) -> None :
+    """Calls the progress callback if one was given (pipelines run the same way with or without streaming)."""
+
+    if on_event is not None :
+        on_event(event , data)
+
+
+def format_sse(event : str , data : Any) -> str :
+    """Formats one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data , ensure_ascii = False)}\n\n"
+
+
+'''Headers preventing proxies (nginx) from buffering the event stream'''
+SSE_HEADERS = {"Cache-Control" : "no-cache" , "X-Accel-Buffering" : "no"}
+
+
+
+
+class EventChannel :
+    '''
+    Bridges progress events emitted by a pipeline running on a worker thread
+    to an async consumer on the event loop (e.g. a StreamingResponse generator).
+    Must be created on the event loop.
+    '''
+
+    _CLOSED = object()
+
+    def __init__(self) :
+        self._loop = asyncio.get_running_loop()
+        self._queue : asyncio.Queue = asyncio.Queue()
+
+
+    def emit(self , event : str , data : dict) -> None :
+        '''Thread-safe : called from the worker thread.'''
+        self._loop.call_soon_threadsafe(self._queue.put_nowait , (event , data))
+
+
+    def close(self) -> None :
+        '''Thread-safe : ends the stream once everything emitted before has been consumed.'''
+        self._loop.call_soon_threadsafe(self._queue.put_nowait , EventChannel._CLOSED)
+
+
+    async def events(self) -> AsyncIterator[tuple[str , dict]] :
+        while True :
+            item = await self._queue.get()
+
+            if item is EventChannel._CLOSED :
+                return
+
+            yield item
@@ -0,0 +1,98 @@
+import hashlib
+import os
+import tempfile
+from typing import BinaryIO, Optional, Union
+
+from fastapi import HTTPException, UploadFile
+
+from core.config import get_settings
+
+
+class StoredUpload :
+    '''
+    An upload received by save_upload : its content, size and the sha256 of its content.
+    source is either a file path (durable destination given by the caller) or an in-memory buffer
+    spooled to disk above UPLOAD_SPOOL_MAX_MEMORY, both accepted directly by the document processors.
+    '''
+
+    def __init__(self , source : Union[str , BinaryIO] , size : int , sha256 : str , filename : str) :
+        self.source = source
+        self.size = size
+        self.sha256 = sha256
+        self.filename = filename
+
+
+    def close(self) -> None :
+        '''Releases the buffer, or deletes the file (safe to call twice).'''
+
+        if isinstance(self.source , str) :
+            remove_file(self.source)
+        else :
+            self.source.close()
+
+
+def get_extension(filename : Optional[str]) -> str :
+    """Lower case extension of an uploaded file name ('.pdf', '.txt' ...), '' when it has none."""
+    return os.path.splitext(filename or "")[1].lower()
+
+
+def remove_file(path : Optional[str]) -> None :
+    """Deletes a temporary file if it exists (safe to call with None, or twice)."""
+
+    if path and os.path.exists(path) :
+        os.remove(path)
+
+
+async def save_upload(file : UploadFile , path : Optional[str] = None , max_size : Optional[int] = None , chunk_size : Optional[int] = None) -> StoredUpload :
+    '''
+    Streams an upload in fixed size chunks and hashes it on the fly.
+
+    - Rejects with 413 as soon as the limit is crossed : the declared size is checked before reading anything,
+      the bytes actually read are counted (a wrong or missing declared size cannot bypass the limit).
+    - path : durable destination on disk (e.g. a job input). Without it the upload stays in memory,
+      and only spills to a temp file above UPLOAD_SPOOL_MAX_MEMORY.
+    - The partial file / buffer is always released when the upload is rejected or fails.
+    '''
+
+    settings = get_settings()
+    max_size = max_size or settings.MAX_FILE_SIZE
+    chunk_size = chunk_size or settings.UPLOAD_CHUNK_SIZE
+
+    if file.size is not None and file.size > max_size :
+        raise HTTPException(status_code=413, detail=f"File too large. Max size : {max_size // (1024 * 1024)} MB")
+
+    if path is None :
+        buffer = tempfile.SpooledTemporaryFile(max_size = settings.UPLOAD_SPOOL_MAX_MEMORY)
+    else :
+        buffer = open(path , "wb")
+
+    digest = hashlib.sha256()
+    size = 0
+
+    try :
+        while True :
+            chunk = await file.read(chunk_size)
+            if not chunk :
+                break
+
+            size += len(chunk)
+            if size > max_size :
+                raise HTTPException(status_code=413, detail=f"File too large. Max size : {max_size // (1024 * 1024)} MB")
+
+            digest.update(chunk)
+            buffer.write(chunk)
+
+        if size == 0 :
+            raise HTTPException(status_code=400, detail="Empty file")
+
+    except BaseException :
+        buffer.close()
+        remove_file(path)
+        raise
+
+    if path is not None :
+        buffer.close()
+        return StoredUpload(path , size , digest.hexdigest() , file.filename)
+
+    buffer.seek(0)
+    return StoredUpload(buffer , size , digest.hexdigest() , file.filename)
@@ -1,4 +1,4 @@
-import base64
+import json
 from io import BytesIO
 import streamlit as st
 import requests
@@ -13,6 +13,48 @@ SUPPORTED_LANGUAGES = ("English","Hindi","Spanish","French","German","Chinese","
 
 FASTAPI_URL = st.secrets["FASTAPI_URL"]
 
+# Optional : API address reachable from the browser. When set, the audio is streamed straight from the API ;
+# otherwise (e.g. FASTAPI_URL is an internal service address) this app fetches it and hands it to the player.
+PUBLIC_API_URL = st.secrets.get("PUBLIC_API_URL")
+
+
+def iter_sse(response):
+    """Parses a Server-Sent Events response (requests, stream=True) into (event, data) pairs."""
+    event, data_lines = "message", []
+
+    # chunk_size=None : yield the lines as soon as they arrive instead of waiting for a 512 bytes buffer
+    for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+        if line:
+            if line.startswith("event:"):
+                event = line[len("event:"):].strip()
+            elif line.startswith("data:"):
+                data_lines.append(line[len("data:"):].strip())
+            continue
+
+        # A blank line ends the event
+        if data_lines:
+            yield event, json.loads("\n".join(data_lines))
+        event, data_lines = "message", []
+
+
+def render_summary(placeholder, text):
+    """Renders the (partial) summary in the summary card."""
+    placeholder.markdown(
+        f"""
+        <div style="
+            background-color:#161b22;
+            padding:20px;
+            border-radius:12px;
+            color:#e5e5e5;
+            border:1px solid #2c323c;
+            font-size:16px;
+        ">
+            {text}
+        </div>
+        """,
+        unsafe_allow_html=True
+    )
+
 
 st.set_page_config(page_title="LawLens", layout="centered")
 
@@ -234,44 +276,71 @@ unsafe_allow_html=True
             st.error("Please upload a document first.")
 
         else:
-            # Show loading animation while processing
-            with st.spinner("Summarizing your document..."):
-                try:
-                    # Send file + data to FastAPI backend
-                    response = requests.post(
-                        f"{FASTAPI_URL}/summarize",
-                        files={"file": uploaded_file},
-                        data={"language": language, "tts": tts}
-                    )
-                    if response.status_code != 200:
-                        st.markdown("<br><br>", unsafe_allow_html=True)
-                        st.error(f"Error: {response.json().get('detail')}")
+            try:
+                # Stream the summary : progress events first, then the summary tokens as they are generated
+                status = st.empty()
+                progress = st.progress(0.0)
+                summary_box = st.empty()
+                summary_text = ""
+                result = None
 
-                    else:
-                        result = response.json()
-
-                        st.success("Summary generated!")
-                        st.markdown("<br><br>", unsafe_allow_html=True)
-
-                        st.markdown(
-                            f"""
-                            <div style="
-                                background-color:#161b22;
-                                padding:20px;
-                                border-radius:12px;
-                                color:#e5e5e5;
-                                border:1px solid #2c323c;
-                                font-size:16px;
-                            ">
-                                {result.get("summary", "No summary returned.")}
-                            </div>
-                            """,
-                            unsafe_allow_html=True
-                        )
-
-                        if tts and "audio" in result:
-
-                            audio_bytes = base64.b64decode(result["audio"])
+                status.info("Uploading your document...")
+
+                response = requests.post(
+                    f"{FASTAPI_URL}/summarize/stream",
+                    files={"file": uploaded_file},
+                    data={"language": language, "tts": tts},
+                    stream=True
+                )
+                if response.status_code != 200:
+                    st.markdown("<br><br>", unsafe_allow_html=True)
+                    st.error(f"Error: {response.json().get('detail')}")
+
+                else:
+                    for event, data in iter_sse(response):
+
+                        if event == "extracted":
+                            status.info(f"Document read: {data['pages']} page(s), ~{data['tokens']} tokens")
+
+                        elif event == "cache_hit":
+                            status.info("This document was already summarized, loading the summary...")
+
+                        elif event == "map_started":
+                            status.info(f"Summarizing {data['total']} sections..." if data.get("total") else "Summarizing sections...")
+
+                        elif event == "map":
+                            progress.progress(data["completed"] / data["total"])
+                            status.info(f"Sections summarized: {data['completed']}/{data['total']}")
+
+                        elif event == "collapse":
+                            status.info("Condensing the partial summaries...")
+
+                        elif event == "reduce_started":
+                            progress.progress(1.0)
+                            status.info("Writing the final summary...")
+
+                        elif event == "token":
+                            summary_text += data["text"]
+                            render_summary(summary_box, summary_text)
+
+                        elif event == "tts_started":
+                            status.info("Generating speech...")
+
+                        elif event == "tts_segment":
+                            status.info(f"Generating speech... {data['completed']} part(s) ready")
+
+                        elif event == "done":
+                            result = data
+
+                        elif event == "error":
+                            status.error(f"Error: {data.get('detail')}")
+
+                    if result:
+                        progress.empty()
+                        status.success("Summary generated!")
+                        render_summary(summary_box, result.get("summary", "No summary returned."))
+
+                        if tts and result.get("audio_url"):
 
                             st.markdown("<br><br>", unsafe_allow_html=True)
                             st.markdown(
@@ -288,10 +357,17 @@ unsafe_allow_html=True
                                 unsafe_allow_html=True
                             )
 
-                            st.audio(audio_bytes, format="audio/wav")
+                            if PUBLIC_API_URL:
+                                # Played straight from the API (streamed with Range requests, nothing decoded here)
+                                st.audio(f"{PUBLIC_API_URL}{result['audio_url']}", format="audio/wav")
+                            else:
+                                audio = requests.get(f"{FASTAPI_URL}{result['audio_url']}", timeout=120)
+                                audio.raise_for_status()
+                                st.audio(audio.content, format="audio/wav")
+
+            except Exception as e:
+                st.error(f"Error: {e}")
 
-                except Exception as e:
-                    st.error(f"Error: {e}")
 
                     
 
@@ -382,12 +458,16 @@ unsafe_allow_html=True
             # Handle response
             if response.status_code == 200:
                 data = response.json()
-                st.success("Index built successfully!")
+                if data.get("cached"):
+                    st.success("Document already indexed, reusing the existing index!")
+                else:
+                    st.success("Index built successfully!")
                 st.write(f"Chunks created: {data['chunks']}")
 
                 st.markdown("<br><br>", unsafe_allow_html=True)
 
                 st.session_state['rag_ready'] = True 
+                st.session_state['rag_document_id'] = data.get("document_id")
 
             else:
                 st.error(f"Failed: {response.text}")
@@ -448,32 +528,61 @@ unsafe_allow_html=True
         
             else:
                 try :
-                    with st.spinner("Getting answer..") :
+                    payload = {"query": user_question , "language": language}
+
+                    # Only search the document uploaded in this session
+                    if st.session_state.get('rag_document_id'):
+                        payload["document_ids"] = [st.session_state['rag_document_id']]
+
+                    # Stream the answer : the retrieved sources first, then the answer tokens as they are generated
+                    status = st.empty()
+                    answer_box = st.empty()
+                    answer_text = ""
+                    sources, result = [], None
 
-                        payload = {"query": user_question , "language": language}
+                    status.info("Searching your document...")
 
-                        response = requests.post(
-                        f"{FASTAPI_URL}/rag/ask",
-                        json=payload
-                    )           
+                    response = requests.post(
+                        f"{FASTAPI_URL}/rag/ask/stream",
+                        json=payload,
+                        stream=True
+                    )
 
                     # Handle response
-                    if response.status_code == 200:
-                        data = response.json()
-                        st.markdown("<br>", unsafe_allow_html=True)
-                        st.success("Answer generated!")
-                        st.write(data["answer"])
-
-                        # Display source chunks if available
-                        st.markdown("<br>", unsafe_allow_html=True)
-                        if data.get("sources"):
-                            st.markdown("### Retrieved Sources")
-                            for idx, src in enumerate(data["sources"], 1):
-                                with st.expander(f"Source {idx}"):
-                                    st.write(src["content"])
+                    if response.status_code != 200:
+                        st.error(f"error generating answer: {response.text}")
 
                     else:
-                        st.error(f"error generating answer: {response.text}")
+                        for event, data in iter_sse(response):
+
+                            if event == "sources":
+                                sources = data["sources"]
+                                status.info("Writing the answer...")
+
+                            elif event == "token":
+                                answer_text += data["text"]
+                                answer_box.write(answer_text)
+
+                            elif event == "done":
+                                result = data
+
+                            elif event == "error":
+                                status.error(f"Error: {data.get('detail')}")
+
+                        if result:
+                            status.success("Answer generated!")
+                            answer_box.write(result["answer"])
+
+                            if result.get("time_to_first_token_ms") is not None:
+                                st.caption(f"First token after {result['time_to_first_token_ms']} ms , answered in {result['total_ms']} ms")
+
+                            # Display source chunks if available
+                            st.markdown("<br>", unsafe_allow_html=True)
+                            if sources:
+                                st.markdown("### Retrieved Sources")
+                                for idx, src in enumerate(sources, 1):
+                                    with st.expander(f"Source {idx}"):
+                                        st.write(src["content"])
 
                 except Exception as e:
                     st.error(f"Error: {e}")
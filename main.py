@@ -1,53 +1,74 @@
-import base64
-from fastapi import FastAPI, Form , UploadFile, File , HTTPException 
-from fastapi.responses import JSONResponse
-from pydantic import Field 
-import os
-import tempfile
-import shutil
-from pathlib import Path
+import logging
+import threading
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Form , UploadFile, File , HTTPException , Request
+from fastapi.responses import JSONResponse, StreamingResponse, FileResponse, Response
 
 from core.config import get_settings
-from langchain_groq import ChatGroq
-from langchain_google_genai import ChatGoogleGenerativeAI
+from core.executor import get_worker_pool
+from core.jobs import JobStore, get_job_store
+from core.streaming import EventChannel, format_sse, SSE_HEADERS
+from core.uploads import save_upload, get_extension, remove_file
+from core.providers import get_llm, get_provider_registry
+from core.llm_router import LLMRouter
 
 
 from pipelines.summarizer_pipeline import SummarizerPipeline
-from pipelines.rag_pipeline import RagPipeline
+from src.summary_cache import get_summary_cache
+from src.extraction_cache import get_extraction_cache
+from src.audio_store import get_audio_store
+from src.tts_cache import get_tts_cache
+from pipelines.rag_pipeline import get_rag_pipeline
+from rag.answer_cache import get_answer_cache
+from rag.embedder import Embedder
 
 from schema.request_model import RAGInput
-from schema.response_model import RAGResponse, RAGSource
-
-from langsmith import Client
+from schema.response_model import RAGResponse, RAGSource, JobStatusResponse, SummaryResponse
 
 settings = get_settings()
 
-# LANGSMITH TRACING
-os.environ["LANGCHAIN_API_KEY"] = settings.LANGCHAIN_API_KEY
-os.environ["LANGCHAIN_TRACING_V2"] = str(settings.LANGCHAIN_TRACING_V2).lower()
-os.environ["LANGCHAIN_PROJECT"] = settings.LANGCHAIN_PROJECT
 
 
 
+logger = logging.getLogger("lawlens.api")
 
 MODEL_VERSION = "1.0.0"
 
 
-llm = ChatGroq(model = "llama-3.3-70b-versatile" , 
-               api_key = settings.GROQ_API_KEY)
+'''The LLM , TTS and embedding clients (and the LangSmith tracing setup) are built on first use by the provider registry (core/providers.py) ,
+so the API starts without loading the provider SDKs and a missing key only fails the feature that needs it.'''
+
+'''Bounded worker pool : the pipelines are synchronous, so they run here instead of on the event loop'''
+worker_pool = get_worker_pool()
+
+'''Durable queue of the background jobs (processed by worker.py, outside of the API process)'''
+job_store = get_job_store()
+
 
-# llm = ChatGoogleGenerativeAI(
-#     model = "gemini-2.5-pro" , 
-#     google_api_key = settings.GOOGLE_API_KEY
-# )
+def warm_up() -> None :
+    '''Builds the RAG pipeline (LLM client) and the embedder in the background once the API is up, so the first requests rarely pay for it.'''
 
-rag_pipeline = RagPipeline(llm)
+    for name , build in (("rag pipeline" , get_rag_pipeline) , ("embedder" , Embedder.get_embedder)) :
+        try :
+            build()
+        except Exception as e :
+            logger.warning("warm-up of the %s skipped : %s" , name , e)
+
+
+@asynccontextmanager
+async def lifespan(app : FastAPI) :
+    if settings.PROVIDERS_WARMUP :
+        threading.Thread(target = warm_up , name = "providers-warmup" , daemon = True).start()
+    yield
+    worker_pool.shutdown()
 
 
 app = FastAPI(
      title = "Legal Document Summarizer and RAG API",
      description="API for Summarizing leagal files along with RAG",
-     version = MODEL_VERSION
+     version = MODEL_VERSION ,
+     lifespan = lifespan
  )
  
 
@@ -67,10 +88,30 @@ def read_root() :
 # HEALTH CHECK
 # ------------
 
+def llm_router_stats() -> dict | None :
+    '''Stats of the loaded LLM router, None while not loaded or when the "llm" provider is a plain chat model.'''
+
+    if not get_provider_registry().is_loaded("llm") :
+        return None
+
+    llm = get_llm()
+    return llm.stats() if isinstance(llm , LLMRouter) else None
+
+
 @app.get("/health")
 def read_health() :
     return {
-        "status" : "OK" , "version" : MODEL_VERSION , "api" : "up and running" , "endpoints" : ["/summarize" , "/rag/ask"]
+        "status" : "OK" , "version" : MODEL_VERSION , "api" : "up and running" , "endpoints" : ["/summarize" , "/summarize/stream" , "/audio/{audio_id}" , "/jobs/summarize" , "/rag/index" , "/rag/documents" , "/rag/ask" , "/rag/ask/stream"] ,
+        "workers" : worker_pool.stats() ,
+        "summary_cache" : get_summary_cache().stats() ,
+        "extraction_cache" : get_extraction_cache().stats() ,
+        "tts_cache" : get_tts_cache().stats() ,
+        "answer_cache" : get_answer_cache().stats() ,
+        "embedding_model" : Embedder.get_model_tag() ,
+        "embedding_cache" : Embedder.get_embedder().cache.stats() if get_provider_registry().is_loaded("embeddings") else None ,
+        "providers" : get_provider_registry().stats() ,
+        "llm_router" : llm_router_stats() ,
+        "jobs" : job_store.counts()
     }
 
 
@@ -80,67 +121,221 @@ def read_health() :
 # ------------
 
 
+def store_audio(audio_bytes : bytes) -> dict :
+    '''Stores the synthesized audio and returns the fields pointing to it (the audio itself is fetched from /audio/{audio_id}).'''
+    audio_id = get_audio_store().put(audio_bytes)
+    return {"audio_id" : audio_id , "audio_url" : f"/audio/{audio_id}"}
+
+
 
-@app.post("/summarize") 
+@app.post("/summarize" , response_model = SummaryResponse , response_model_exclude_none = True) 
 async def summarize_text(
     file : UploadFile = File(...) ,
     language : str = Form("English")  ,
     tts : bool = Form(False)       
 ) :
     
-    tmp_path = None
+    upload = None
     
 
     try :
         '''Validate extension using config file'''
-        ext = "." + file.filename.split(".")[-1].lower()
+        ext = get_extension(file.filename)
 
         if ext not in settings.ALLOWED_EXTENSIONS :
             raise HTTPException(status_code=400, detail="Invalid file type")
         
-        size = file.size
-        if size > settings.MAX_FILE_SIZE:
-            raise HTTPException(400, "File too large.")
-        
-        
         if language not in settings.SUPPORTED_LANGUAGES :
             raise HTTPException(status_code=400, detail="Invalid language")
         
 
  
-        '''Save uploaded file temporarily. The UplaodFile is an object by FASTAPI but has no real path. The docloader cant read from that. So we create real file temporarily'''
-        suffix = os.path.splitext(file.filename)[1]  # get .pdf / .txt / .docx
-
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-            tmp_path = tmp.name
-            '''copies file stream to new real file'''
-            shutil.copyfileobj(file.file, tmp)
+        '''Save uploaded file temporarily. Kept in memory (spooled to a temp file only when large) : the document processors read it directly.
+        Streamed in chunks : rejected (413) as soon as it crosses MAX_FILE_SIZE , and hashed on the way for the caches'''
+        upload = await save_upload(file)
 
 
         '''Summarizer Pipeline'''
-        pipeline = SummarizerPipeline(llm , language)
+        pipeline = SummarizerPipeline(get_llm() , language)
 
-        result = pipeline.run(tmp_path , tts)
+        result = await worker_pool.run("summarize" , pipeline.run , upload.source , tts , doc_hash = upload.sha256)
 
         if tts :
 
   
             summary_text , audio_bytes = result
-            return {
-                "summary": summary_text,
-                "audio": base64.b64encode(audio_bytes).decode()
-            }
+            return {"summary": summary_text , **store_audio(audio_bytes)}
         
         return {"summary": result}
 
             
 
+    except HTTPException :
+        raise
+
     except Exception as e :
         raise HTTPException(status_code=500, detail=str(e))
     
     finally :
-        if os.path.exists(tmp_path):
-            os.remove(tmp_path)
+        if upload is not None :
+            upload.close()
+
+
+# ---------------------
+# SUMMARIZER (STREAMING)
+# ---------------------
+
+
+@app.post("/summarize/stream")
+async def summarize_stream(
+    file : UploadFile = File(...) ,
+    language : str = Form("English")  ,
+    tts : bool = Form(False)
+) :
+    '''Same as /summarize, but streams Server-Sent Events while the summary is produced :
+    extracted -> map (k/N) -> reduce_started -> token ... [tts_started -> tts_segment ...] -> done (summary [+ audio_id , audio_url]) , or error.'''
+
+    if get_extension(file.filename) not in settings.ALLOWED_EXTENSIONS :
+        raise HTTPException(status_code=400, detail="Invalid file type")
+
+    if language not in settings.SUPPORTED_LANGUAGES :
+        raise HTTPException(status_code=400, detail="Invalid language")
+
+    upload = await save_upload(file)
+
+    channel = EventChannel()
+    pipeline = SummarizerPipeline(get_llm() , language)
+
+    try :
+        '''rejected with 429 / 503 here, before the stream starts, when the workers are saturated'''
+        future = worker_pool.submit("summarize" , pipeline.run , upload.source , tts , channel.emit , doc_hash = upload.sha256)
+    except Exception :
+        upload.close()
+        raise
+
+    def on_finished(_) :
+        '''the pipeline reads the upload until it finishes, even if the client already disconnected'''
+        upload.close()
+        channel.close()
+
+    future.add_done_callback(on_finished)
+
+
+    async def event_stream() :
+        async for event , data in channel.events() :
+            yield format_sse(event , data)
+
+        try :
+            result = future.result()
+        except Exception as e :
+            yield format_sse("error" , {"detail" : str(e)})
+            return
+
+        if tts :
+            summary_text , audio_bytes = result
+            yield format_sse("done" , {"summary" : summary_text , **store_audio(audio_bytes)})
+        else :
+            yield format_sse("done" , {"summary" : result})
+
+
+    return StreamingResponse(event_stream() , media_type = "text/event-stream" , headers = SSE_HEADERS)
+
+
+
+#---------------------
+# AUDIO
+#---------------------
+
+
+@app.get("/audio/{audio_id}")
+def get_audio(audio_id : str , request : Request) :
+    '''Synthesized audio of a summary (WAV). Supports Range requests (seeking , progressive playback).
+    The content never changes for an id (content-addressed) : cached by clients for good , revalidated with the ETag.'''
+
+    path = get_audio_store().path(audio_id)
+    if path is None :
+        raise HTTPException(status_code=404, detail="Audio not found")
+
+    headers = {"Cache-Control" : "public, max-age=31536000, immutable" , "ETag" : f'"{audio_id}"'}
+
+    if request.headers.get("if-none-match") in (f'"{audio_id}"' , "*") :
+        return Response(status_code = 304 , headers = headers)
+
+    return FileResponse(path , media_type = "audio/wav" , headers = headers)
+
+
+
+#---------------------
+# BACKGROUND JOBS
+#---------------------
+
+
+@app.post("/jobs/summarize" , status_code = 202)
+async def submit_summarize_job(
+    file : UploadFile = File(...) ,
+    language : str = Form("English")  ,
+    tts : bool = Form(False)
+) :
+    '''Queue a summarization and return immediately with a job id.
+    The job is processed by the background workers (worker.py) : poll /jobs/{job_id} then fetch /jobs/{job_id}/result.'''
+
+    ext = get_extension(file.filename)
+
+    if ext not in settings.ALLOWED_EXTENSIONS :
+        raise HTTPException(status_code=400, detail="Invalid file type")
+
+    if language not in settings.SUPPORTED_LANGUAGES :
+        raise HTTPException(status_code=400, detail="Invalid language")
+
+    job_id , input_path = job_store.new_input_path(ext)
+    upload = await save_upload(file , path = input_path)
+
+    try :
+        job_store.enqueue(
+            "summarize" ,
+            {"language" : language , "tts" : tts , "filename" : file.filename , "doc_hash" : upload.sha256} ,
+            input_path ,
+            job_id = job_id
+        )
+
+    except Exception as e :
+        remove_file(input_path)
+        raise HTTPException(status_code=500, detail=f"Error queuing job : {e}")
+
+    return {
+        "job_id" : job_id ,
+        "status" : "queued" ,
+        "status_url" : f"/jobs/{job_id}" ,
+        "result_url" : f"/jobs/{job_id}/result"
+    }
+
+
+@app.get("/jobs/{job_id}" , response_model = JobStatusResponse)
+def get_job_status(job_id : str) :
+    '''Status, phase and progress of a job.'''
+
+    job = job_store.get(job_id)
+    if job is None :
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    return JobStatusResponse(job_id = job["id"] , **{key : job[key] for key in ("kind" , "status" , "phase" , "progress" , "error" , "created_at" , "updated_at")})
+
+
+@app.get("/jobs/{job_id}/result")
+def get_job_result(job_id : str) :
+    '''Result of a finished job (409 while it is still queued / running).'''
+
+    job = job_store.get(job_id)
+    if job is None :
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    if job["status"] == JobStore.FAILED :
+        raise HTTPException(status_code=500, detail=f"Job failed : {job['error']}")
+
+    if job["status"] != JobStore.SUCCEEDED :
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']} ({job['phase']} , {job['progress']:.0%}). Retry later.")
+
+    return job["result"]
 
 
 
@@ -153,41 +348,83 @@ async def build_index(file : UploadFile = File(...)) :
     '''Upload a document (PDF, TXT, DOCX) and ingest it.
     Build vector store and retriever for querying.'''
 
+    upload = None
+
     try :
 
-        file_ext = Path(file.filename).suffix.lower()
+        file_ext = get_extension(file.filename)
 
         if file_ext not in settings.ALLOWED_EXTENSIONS :
             raise HTTPException(status_code=400, detail = f"Invalid file type : {file_ext}. Allowed extensions : {settings.ALLOWED_EXTENSIONS}")
         
-        with tempfile.NamedTemporaryFile(delete=False , suffix=file_ext) as tmp:
-            file_path = tmp.name
-            shutil.copyfileobj(file.file, tmp)
-
-            result = rag_pipeline.ingest_documents(file_path)
-            os.remove(file_path)
-
-            return JSONResponse(
-                content = {
-                    "status" : result['status'] ,
-                    "message" : result['message'] , 
-                    "chunks" : result['chunks'] ,
-                   
-                }
-            )
+        '''streamed in memory (413 above MAX_FILE_SIZE) , its sha256 is the document id'''
+        upload = await save_upload(file)
+
+        result = await worker_pool.run("rag_index" , get_rag_pipeline().ingest_documents , upload.source , file.filename , upload.sha256)
+
+        return JSONResponse(
+            content = {
+                "status" : result['status'] ,
+                "message" : result['message'] , 
+                "chunks" : result['chunks'] ,
+                "document_id" : result['document_id'] ,
+                "cached" : result['cached'] ,
+                "batches" : result.get('batches') ,
+                "resumed_batches" : result.get('resumed_batches')
+               
+            }
+        )
             
         
 
+    except HTTPException :
+        raise
+
     except Exception as e :
         raise HTTPException(status_code=500, detail=str(e))
+
+    finally :
+        if upload is not None :
+            upload.close()
     
 
 
+#---------------------
+# RAG INDEXED DOCUMENTS
+#---------------------
+
+@app.get("/rag/documents")
+def list_documents() :
+    '''List the documents stored in the persistent index (ids usable in /rag/ask document_ids)
+    and the ingests that are running or were interrupted (committed / total batches).'''
+    return {"documents" : get_rag_pipeline().registry.list_documents() , "ingests_in_progress" : get_rag_pipeline().registry.list_ingests()}
+
+
+
 #---------------------
 # RAG ASK QUESTION
 #---------------------
 
 
+def validate_rag_request(request : RAGInput) -> None :
+    '''Raises 400 / 404 before anything is scheduled.'''
+
+    if not request.query :
+        raise HTTPException(status_code=400, detail="Query can't be empty. Please provide a query")
+
+    if request.language not in settings.SUPPORTED_LANGUAGES :
+        raise HTTPException(status_code=400, detail="Invalid language")
+
+    if not get_rag_pipeline().has_documents() :
+        raise HTTPException(status_code=400, detail="Index not built. Please upload a document first.")
+
+    if request.document_ids :
+        missing = get_rag_pipeline().registry.missing(request.document_ids)
+        if missing :
+            raise HTTPException(status_code=404, detail=f"Unknown document id(s) : {missing}. Please upload the document first.")
+
+
+
 @app.post("/rag/ask" , response_model = RAGResponse)
 async def ask(request : RAGInput) :
     '''Ask a question and get RAG-enhanced answer. request is an object of Pydantic class RAGInput'''
@@ -195,21 +432,16 @@ async def ask(request : RAGInput) :
     language = request.language
 
     try :
-        if not query :
-            raise HTTPException(status_code=400, detail="Query can't be empty. Please provide a query")
-        
-        if language not in settings.SUPPORTED_LANGUAGES :
-            raise HTTPException(status_code=400, detail="Invalid language")
-        
-        if rag_pipeline.retriever is None :
-            raise HTTPException(status_code=400, detail="Index not built. Please upload a document first.")
+        validate_rag_request(request)
 
-
-        result , retrieved_docs = rag_pipeline.ask_question(query , language)
+        result , retrieved_docs = await worker_pool.run("rag_ask" , get_rag_pipeline().ask_question , query , language , request.document_ids ,
+                                                        request.k , request.retrieval_mode , request.vector_weight , request.keyword_weight ,
+                                                        request.rerank)
 
         sources = [
         RAGSource(
-            content=doc.page_content
+            content=doc.page_content ,
+            document_id=doc.metadata.get("doc_id")
         )
         for doc in retrieved_docs
     ] 
@@ -220,27 +452,52 @@ async def ask(request : RAGInput) :
 
         )
 
+    except HTTPException :
+        raise
+
     except Exception as e :
         raise HTTPException(status_code=500, detail = f"Error processing query : {str(e)}")
 
 
 
+@app.post("/rag/ask/stream")
+async def ask_stream(request : RAGInput) :
+    '''Same as /rag/ask, but streams Server-Sent Events : sources (retrieved chunks) -> token ... -> done , or error.
+    done carries the answer and the timings : time to first token and total time (ms).'''
 
+    validate_rag_request(request)
 
+    started = time.perf_counter()
+    channel = EventChannel()
 
+    '''rejected with 429 / 503 here, before the stream starts, when the workers are saturated'''
+    future = worker_pool.submit(
+        "rag_ask" , get_rag_pipeline().ask_question , request.query , request.language , request.document_ids ,
+        request.k , request.retrieval_mode , request.vector_weight , request.keyword_weight , request.rerank ,
+        on_event = channel.emit
+    )
+    future.add_done_callback(lambda _ : channel.close())
 
 
+    async def event_stream() :
+        first_token = None
 
+        async for event , data in channel.events() :
+            if event == "token" and first_token is None :
+                first_token = time.perf_counter()
+            yield format_sse(event , data)
 
+        try :
+            answer , _ = future.result()
+        except Exception as e :
+            yield format_sse("error" , {"detail" : str(e)})
+            return
 
+        total_ms = round((time.perf_counter() - started) * 1000)
+        ttft_ms = None if first_token is None else round((first_token - started) * 1000)
+        logger.info("rag/ask/stream : time to first token %s ms , total %s ms" , ttft_ms , total_ms)
 
+        yield format_sse("done" , {"answer" : answer , "time_to_first_token_ms" : ttft_ms , "total_ms" : total_ms})
 
 
-
-
-
-
-
-
-
-
+    return StreamingResponse(event_stream() , media_type = "text/event-stream" , headers = SSE_HEADERS)
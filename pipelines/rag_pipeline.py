@@ -1,4 +1,8 @@
+import threading
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from rag.retriever import RetrieverBuilder
+from rag.reranker import Reranker
 from rag.vector_store import VectorStore
 from langchain_core.documents import Document
 from langchain.chains.combine_documents import create_stuff_documents_chain
@@ -6,7 +10,20 @@ from langchain.chains import create_retrieval_chain
 from prompt_templates.prompts import PromptManager
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_core.language_models import BaseChatModel
-from src.document_processor import DocumentProcessorFactory
+from langchain_core.runnables import RunnableLambda
+from rag.document_registry import get_document_registry
+from rag.keyword_index import get_keyword_index
+from rag.answer_cache import AnswerCache, get_answer_cache
+from rag.embedder import Embedder
+from src.summary_cache import get_model_id
+from core.config import get_settings
+from core.providers import get_llm
+from core.llm_router import LLMRouter, route_model
+from core.rate_limit import call_with_retry, is_transient_error
+from core.streaming import EventCallback, emit
+from src.document_processor import DocumentSource
+from src.extraction_cache import get_extraction_cache
+from core.hashing import hash_source
 
 
 
@@ -14,12 +31,12 @@ class RagPipeline :
     '''
     Full orchestration:
     - Extract text
-    - Build index
+    - Build index (persistent, one namespace per document id)
     - Ask question
     - Convert answer to speech (optional)
     '''
 
-    def __init__(self , llm : BaseChatModel , chunk_size : int = 400 , chunk_overlap : int = 80) :
+    def __init__(self , llm : BaseChatModel | LLMRouter , chunk_size : int = 400 , chunk_overlap : int = 80 , k : int | None = None) :
 
         self.llm = llm
         self.chunk_size = chunk_size
@@ -30,66 +47,330 @@ class RagPipeline :
             chunk_size = self.chunk_size ,
             chunk_overlap = self.chunk_overlap
         )
-        self.retriever = None # Store retriever (will be set during ingesting documents)
+        self.settings = get_settings()
+        self.k = k or self.settings.RAG_TOP_K
+        self.registry = get_document_registry() # documents already indexed in the persistent store
+        self.keyword_index = get_keyword_index() # BM25 index over the same chunks, next to the Chroma collection
+        self._keyword_index_synced = False
+        self.answer_cache = get_answer_cache() # answers of repeated / near-duplicate questions
+        self._sync_lock = threading.Lock()
+        self.extraction_cache = get_extraction_cache() # extracted pages / chunks shared with the summarizer
 
+        '''Chains are built once and reused for every question.
+        The retrieval step runs the (document filtered) hybrid search at call time, so ingesting new documents does not require rebuilding the chains.'''
+        self.stuff_chain = create_stuff_documents_chain(
+            llm = route_model(self.llm , "rag_answer") , prompt = self.prompt
+        )
+
+        self.retrieval_chain = create_retrieval_chain(
+            RunnableLambda(self._retrieve) ,
+            self.stuff_chain
+        )
+
+
+    def has_documents(self) -> bool :
+        return self.registry.count() > 0
+
+
+    def _retrieve(self , inputs : dict) -> list[Document] :
+        '''Single retrieval per query. The retrieved docs become both the stuffed context and the returned sources.
+        k , retrieval_mode , the fusion weights and rerank can be set per question (settings defaults otherwise).
+        With rerank, RAG_RERANK_CANDIDATES candidates are fetched, re-ranked and packed into RAG_CONTEXT_TOKEN_BUDGET
+        (k , when given , still caps the number of passages).'''
+
+        self.sync_keyword_index()
+
+        def option(name : str , default) :
+            value = inputs.get(name)
+            return default if value is None else value
+
+        rerank = option("rerank" , self.settings.RAG_RERANK_ENABLED)
+
+        documents = RetrieverBuilder.hybrid_search(
+            VectorStore.get_vector_store() ,
+            self.keyword_index ,
+            inputs["input"] ,
+            k = max(self.settings.RAG_RERANK_CANDIDATES , inputs.get("k") or 0) if rerank else option("k" , self.k) ,
+            document_ids = inputs.get("document_ids") ,
+            mode = option("retrieval_mode" , self.settings.RAG_RETRIEVAL_MODE) ,
+            vector_weight = option("vector_weight" , self.settings.RAG_VECTOR_WEIGHT) ,
+            keyword_weight = option("keyword_weight" , self.settings.RAG_KEYWORD_WEIGHT) ,
+            fetch_k = self.settings.RAG_FETCH_K ,
+            rrf_k = self.settings.RAG_RRF_K ,
+            vector_timeout = self.settings.RAG_VECTOR_TIMEOUT_SECONDS
+        )
+
+        if not rerank :
+            return documents
+
+        return Reranker.rerank(
+            inputs["input"] ,
+            documents ,
+            token_budget = self.settings.RAG_CONTEXT_TOKEN_BUDGET ,
+            max_chunks = inputs.get("k") ,
+            scorer = self.settings.RAG_RERANKER ,
+            min_overlap = self.settings.RAG_DEDUPE_MIN_OVERLAP
+        )
+
+
+    def sync_keyword_index(self) -> None :
+        '''Once per process : adds to the keyword index the documents indexed in Chroma before it existed (read back from Chroma, nothing is re-embedded).'''
+
+        if self._keyword_index_synced :
+            return
+
+        with self._sync_lock :
+            if self._keyword_index_synced :
+                return
+
+            missing = {row["doc_id"] for row in self.registry.list_documents()} - self.keyword_index.indexed_documents()
+
+            for doc_id in missing :
+                stored = VectorStore.get_vector_store().get(where = {"doc_id" : doc_id} , include = ["documents" , "metadatas"])
+                order = sorted(range(len(stored["ids"])) , key = lambda i : int(stored["ids"][i].rsplit(":" , 1)[1]))
+
+                self.keyword_index.add(
+                    doc_id ,
+                    [Document(page_content = stored["documents"][i] , metadata = stored["metadatas"][i] or {}) for i in order]
+                )
+
+            self._keyword_index_synced = True
+
+
+    def index_chunks(self , chunks : list[Document] , doc_id : str , filename : str | None = None , on_event : EventCallback | None = None) -> tuple[int , int] :
+        '''
+        Embeds and writes the chunks batch by batch (INGEST_BATCH_SIZE chunks), with up to INGEST_MAX_CONCURRENCY batches in flight.
+        - Every batch is retried on its own on transient errors (429 , 5xx , timeouts) and written as soon as it is embedded.
+        - Batches already stored by an interrupted ingest (same deterministic chunk ids) are skipped : the ingest resumes.
+        - Progress is recorded in the registry and emitted as "ingest" events (completed / total batches).
+        Returns (batches , resumed batches). Raises once the running batches are done if a batch kept failing.
+        '''
+
+        vectorstore = VectorStore.get_vector_store()
+        batch_size = self.settings.INGEST_BATCH_SIZE
+        starts = list(range(0 , len(chunks) , batch_size))
+
+        for chunk in chunks :
+            chunk.metadata["doc_id"] = doc_id
+
+        existing = VectorStore.existing_ids(vectorstore , VectorStore.chunk_ids(doc_id , 0 , len(chunks)))
+        pending = [start for start in starts if not set(VectorStore.chunk_ids(doc_id , start , len(chunks[start : start + batch_size]))) <= existing]
+        resumed = len(starts) - len(pending)
+
+        '''the keyword index is local and cheap : (re)built for the whole document'''
+        self.keyword_index.add(doc_id , chunks)
+
+        lock = threading.Lock()
+        progress = {"committed" : resumed}
+        self.registry.set_progress(doc_id , filename , resumed , len(starts))
+        emit(on_event , "ingest_started" , batches = len(starts) , resumed_batches = resumed , chunks = len(chunks))
+
+        def index_batch(start : int) -> None :
+            batch = chunks[start : start + batch_size]
+
+            call_with_retry(
+                lambda : VectorStore.add_document(vectorstore , batch , doc_id , start) ,
+                max_retries = self.settings.INGEST_MAX_RETRIES ,
+                base_delay = self.settings.LLM_RETRY_BASE_DELAY ,
+                max_delay = self.settings.LLM_RETRY_MAX_DELAY ,
+                retry_on = is_transient_error
+            )
+
+            with lock :
+                progress["committed"] += 1
+                self.registry.set_progress(doc_id , filename , progress["committed"] , len(starts))
+                emit(on_event , "ingest" , completed = progress["committed"] , total = len(starts))
+
+        errors = []
 
-    def ingest_documents(self , file_path : str) :
-        '''Process document and create vector store + retriever.
-        Call this once when user uploads a document'''
+        with ThreadPoolExecutor(max_workers = max(1 , min(self.settings.INGEST_MAX_CONCURRENCY , len(pending)))) as executor :
+            futures = [executor.submit(index_batch , start) for start in pending]
+
+            for future in as_completed(futures) :
+                '''batches cancelled after a failure are not errors of their own'''
+                if future.cancelled() :
+                    continue
+
+                try :
+                    future.result()
+                except Exception as e :
+                    '''stop scheduling new batches , the ones in flight still get committed'''
+                    errors.append(e)
+                    for other in futures :
+                        other.cancel()
+
+        if errors :
+            raise RuntimeError(
+                f"{progress['committed']}/{len(starts)} batches indexed , upload the document again to resume. Error : {errors[0]!r}"
+            )
+
+        return len(starts) , resumed
+
+
+    def ingest_documents(self , source : DocumentSource , filename : str | None = None , doc_id : str | None = None , on_event : EventCallback | None = None) :
+        '''Process document and add it to the persistent vector store under its document id (hash of the file content).
+        A document that is already indexed is not extracted nor embedded again , an interrupted ingest resumes from its stored batches.
+        on_event (optional) receives the ingest progress events.'''
 
         try : 
-            docs = DocumentProcessorFactory.process(file_path)
+            doc_id = doc_id or hash_source(source)
+
+            indexed = self.registry.get(doc_id)
+            if indexed is not None :
+                return {
+                    "status": "success",
+                    "message": "Document already indexed , embedding skipped" ,
+                    "chunks": indexed["chunks"] ,
+                    "document_id": doc_id ,
+                    "cached": True
+                }
+
+            '''chunks (or at least the extracted pages) are reused when the document was already processed, e.g. by /summarize.
+            Otherwise pages are split as soon as they are extracted.'''
+            splitter_params = ("recursive" , self.chunk_size , self.chunk_overlap)
+            chunks = self.extraction_cache.get_chunks(doc_id , splitter_params , filename)
 
-            chunks = self.splitter.split_documents(docs)
+            if chunks is None :
+                chunks = [
+                    chunk
+                    for page in self.extraction_cache.extract(source , doc_id , filename)
+                    for chunk in self.splitter.split_documents([page])
+                ]
+                self.extraction_cache.set_chunks(doc_id , splitter_params , chunks)
 
-            vectorstore = VectorStore.build_vector_store(chunks)
+            if not chunks :
+                raise ValueError("No text could be extracted from the document")
 
-            self.retriever = RetrieverBuilder.build_retriever(vectorstore) # stored retriever
+            if filename :
+                for chunk in chunks :
+                    chunk.metadata["source"] = filename
+
+            batches , resumed = self.index_chunks(chunks , doc_id , filename , on_event)
+
+            self.registry.add(doc_id , filename , len(chunks))
 
             return {
                 "status": "success",
                 "message": "Document ingested successfully , index built" ,
-                "chunks": len(chunks)
-            
+                "chunks": len(chunks) ,
+                "document_id": doc_id ,
+                "cached": False ,
+                "batches" : batches ,
+                "resumed_batches" : resumed
             }
         
         except Exception as e:
             raise RuntimeError(f"Error ingesting document: {e}")
         
     
-    def ask_question(self , query : str , language : str = "English") -> str :
-        '''Ask a question and get RAG-enhanced answer.'''
+    def _query_vector(self , query : str , retrieval_mode : str | None) -> tuple[list[float] | None , Exception | None] :
+        '''Query embedding for the semantic answer cache (the same cached vector is reused by the retrieval).
+        Returns (vector , error) : no vector in keyword mode (no embedding call wanted) or when the embedding API fails
+        (exact matches only , and the error is kept so the retrieval does not call the API again).'''
+
+        if (retrieval_mode or self.settings.RAG_RETRIEVAL_MODE) == "keyword" :
+            return None , None
+
+        try :
+            return RetrieverBuilder.run_with_timeout(lambda : Embedder.get_embedder().embed_query(query) , self.settings.RAG_VECTOR_TIMEOUT_SECONDS) , None
+        except Exception as e :
+            return None , e
+
+
+    @staticmethod
+    def source_dicts(documents : list[Document]) -> list[dict] :
+        '''Retrieved chunks in the RAGSource shape (content , document_id).'''
+        return [{"content" : doc.page_content , "document_id" : doc.metadata.get("doc_id")} for doc in documents]
+
+
+    def _stream_answer(self , inputs : dict , on_event : EventCallback) -> tuple[str , list[Document]] :
+        '''Same steps as the retrieval chain, run one by one : the sources are sent before the generation starts.'''
+
+        context = self._retrieve(inputs)
+        emit(on_event , "sources" , sources = RagPipeline.source_dicts(context) , cached = False)
+
+        parts = []
+        for token in self.stuff_chain.stream({"input" : inputs["input"] , "language" : inputs["language"] , "context" : context}) :
+            parts.append(token)
+            emit(on_event , "token" , text = token)
+
+        return "".join(parts) , context
+
+
+    def ask_question(
+        self ,
+        query : str ,
+        language : str = "English" ,
+        document_ids : list[str] | None = None ,
+        k : int | None = None ,
+        retrieval_mode : str | None = None ,
+        vector_weight : float | None = None ,
+        keyword_weight : float | None = None ,
+        rerank : bool | None = None ,
+        on_event : EventCallback | None = None
+    ) -> str :
+        '''Ask a question and get RAG-enhanced answer.
+        document_ids restricts the search to those documents (None -> all indexed documents).
+        k , retrieval_mode (hybrid / vector / keyword) , the fusion weights and rerank override the settings defaults.
+        Repeated and near-duplicate questions on the same (unchanged) documents are answered from the answer cache.
+        With on_event, the answer is streamed : a "sources" event with the retrieved chunks, then a "token" event per generated token
+        (a cached answer comes as a single token).'''
 
         try : 
 
-            if self.retriever is None :
+            if not self.has_documents() :
                 raise RuntimeError("Index not built , No documents ingested. Call ingest_documents() first.")
-            
-            retrieved_docs = self.retriever.get_relevant_documents(query)
-        
-            stuff_chain = create_stuff_documents_chain(
-                llm = self.llm , prompt = self.prompt
-            )
 
-            retrieval_chain = create_retrieval_chain(
-                self.retriever , 
-                stuff_chain
-            )
+            use_cache = self.settings.ANSWER_CACHE_ENABLED
+            embedding_error = None
 
-            response = retrieval_chain.invoke(
-                {"input" : query , "language" : language}
-            )
+            if use_cache :
+                scope = AnswerCache.build_scope(
+                    document_ids , self.registry.version(document_ids) , language ,
+                    k , retrieval_mode , vector_weight , keyword_weight , rerank , get_model_id(self.llm)
+                )
+                cached = self.answer_cache.get_exact(scope , query)
 
-            return response['answer'] , retrieved_docs
+                if cached is None :
+                    query_vector , embedding_error = self._query_vector(query , retrieval_mode)
+                    cached = self.answer_cache.get_similar(scope , query_vector)
 
-        except Exception as e:
-            raise RuntimeError(f"Error during question-answering: {e}")
+                if cached is not None :
+                    emit(on_event , "sources" , sources = RagPipeline.source_dicts(cached[1]) , cached = True)
+                    emit(on_event , "token" , text = cached[0])
+                    return cached
 
+            inputs = {
+                "input" : query , "language" : language , "document_ids" : document_ids ,
+                "k" : k , "retrieval_mode" : retrieval_mode , "vector_weight" : vector_weight , "keyword_weight" : keyword_weight ,
+                "rerank" : rerank
+            }
 
-        
+            if embedding_error is not None :
+                '''the query embedding just failed (or timed out) : retrieve without waiting for the embedding API a second time'''
+                if (retrieval_mode or self.settings.RAG_RETRIEVAL_MODE) == "vector" :
+                    raise embedding_error
+                inputs["retrieval_mode"] = "keyword"
 
+            if on_event is None :
+                response = self.retrieval_chain.invoke(inputs)
+                answer , context = response['answer'] , response['context']
+            else :
+                answer , context = self._stream_answer(inputs , on_event)
 
+            '''a degraded (keyword only) answer is not cached under the scope of the requested retrieval'''
+            if use_cache and embedding_error is None :
+                self.answer_cache.set(scope , query , answer , context , query_vector)
+
+            return answer , context
+
+        except Exception as e:
+            raise RuntimeError(f"Error during question-answering: {e}")
 
 
 
 
+@lru_cache
+def get_rag_pipeline() -> RagPipeline :
+    '''Shared pipeline of the API , built on the first RAG request.'''
+    return RagPipeline(get_llm())
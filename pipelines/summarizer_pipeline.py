@@ -1,6 +1,11 @@
-from src.document_processor import DocumentProcessorFactory
-from src.summarizer import summarize_document
-from src.speech import TextToSpeech
+from src.document_processor import DocumentSource
+from src.extraction_cache import get_extraction_cache
+from src.summarizer import summarize_pages
+from src.summary_cache import get_summary_cache, get_model_id
+from src.speech import SpeechStream
+from core.hashing import hash_source
+from core.streaming import EventCallback, emit
+from core.llm_router import LLMRouter
 from langchain_core.language_models import BaseChatModel
 
 
@@ -8,29 +13,56 @@ from langchain_core.language_models import BaseChatModel
 class SummarizerPipeline :
     """
     Full orchestration:
-    - Extract text
-    - Summarize
-    - Convert summary to speech (optional)
+    - Extract text (reused from the extraction cache when the document was already processed, e.g. by /rag/index)
+    - Summarize (served from the summary cache when the same document was already summarized)
+    - Convert summary to speech (optional , synthesized segment by segment while the summary is generated)
     """
-    def __init__(self , llm : BaseChatModel , language : str = "English") :
+    def __init__(self , llm : BaseChatModel | LLMRouter , language : str = "English") :
         self.llm = llm
         self.language = language
+        self.cache = get_summary_cache()
+        self.extraction_cache = get_extraction_cache()
 
-    def run(self , file_path : str , tts : bool = False) :
+    def run(self , source : DocumentSource , tts : bool = False , on_event : EventCallback | None = None , doc_hash : str | None = None) :
         '''Runs complete pipeline.
         and returns summary_text OR (summary and audio_bytes)
+        on_event (optional) receives the progress events : extracted, cache_hit, map k/N, reduce_started, token, tts_started, tts_segment
+        source : file path, bytes or binary buffer of the document (an upload is extracted without a temp file)
+        doc_hash (optional) : sha256 of the file when already computed (while the upload was saved)
         '''
 
         try :
-            '''load and extract the text'''
-            docs = DocumentProcessorFactory.process(file_path)
+            '''hash the upload : a repeat of the same document is served from the summary cache without extraction'''
+            doc_hash = doc_hash or hash_source(source)
+            model_id = get_model_id(self.llm)
 
-            '''summarize the text'''
-            summary_text = summarize_document(llm = self.llm , documents = docs , language = self.language)
+            speech = SpeechStream(self.language , on_event) if tts else None
+
+            def forward(event : str , data : dict) -> None :
+                '''the summary tokens also feed the TTS , which starts on the first sentences'''
+                if event == "token" :
+                    speech.feed(data["text"])
+                emit(on_event , event , **data)
+
+            chain_type = self.cache.get_chain_type(doc_hash)
+            summary_text = self.cache.get(doc_hash , self.language , model_id , chain_type)
+
+            if summary_text is None :
+                '''extract the pages lazily (or reuse the text extracted for /rag/index) and summarize them while the extraction goes on (chain type decided on the way)'''
+                pages = self.extraction_cache.extract(source , doc_hash)
+                summary_text , chain_type = summarize_pages(
+                    llm = self.llm , pages = pages , language = self.language , on_event = forward if tts else on_event
+                )
+
+                self.cache.set_chain_type(doc_hash , chain_type)
+                self.cache.set(doc_hash , self.language , model_id , chain_type , summary_text)
+
+            else :
+                emit(on_event , "cache_hit" , chain_type = chain_type)
 
             '''convert summary to speech'''
             if tts :
-                audio_bytes = TextToSpeech.text_to_speech(summary_text , language = self.language)
+                audio_bytes = speech.finish(summary_text)
                 return summary_text , audio_bytes
             
           
@@ -38,4 +70,3 @@ class SummarizerPipeline :
         
         except Exception as e :
             raise RuntimeError(f"Error running pipeline: {e}")
-
@@ -49,6 +49,29 @@ class PromptManager :
         return prompt
     
     
+    @staticmethod
+    def get_collapse_prompt() -> ChatPromptTemplate :
+        """
+        Prompt for the intermediate levels of the hierarchical REDUCE phase.
+        Condenses a batch of partial summaries into one partial summary, which is combined again at the next level.
+        """
+
+        system_template = "You are a legal document summarizer skilled at condensing partial summaries of consecutive parts of a legal document into one partial summary in {language}"
+
+        user_template = """Condense the following partial summaries into a single partial summary
+        Requirements:
+        1. Keep every key point : parties, dates, amounts, obligations, rights and conditions
+        2. Keep the order in which the points appear
+        3. Do not add a title or a conclusion, the result will be combined with other partial summaries \n {text}"""
+
+        prompt = ChatPromptTemplate.from_messages([
+            ("system" , system_template),
+            ("user" , user_template)
+        ])
+
+        return prompt
+
+
     @staticmethod
     def get_stuff_prompt() -> ChatPromptTemplate :
         """
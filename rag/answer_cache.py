@@ -0,0 +1,218 @@
+import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Optional
+
+import numpy as np
+from langchain_core.documents import Document
+
+from core.cache import LRUCache
+from core.config import get_settings
+from core.hashing import make_key
+
+
+def normalize_query(query : str) -> str :
+    """Lower case, punctuation dropped, whitespace collapsed : "What is the Termination clause ?" == "what is the termination clause"."""
+    return " ".join(re.sub(r"[^\w\s]" , " " , query.lower()).split())
+
+
+def unit_vector(vector : list[float]) -> Optional[np.ndarray] :
+    '''float32 copy scaled to length 1 (cosine similarity = dot product) , None for a null vector.'''
+
+    array = np.asarray(vector , dtype = np.float32)
+    norm = float(np.linalg.norm(array))
+    return array / norm if norm else None
+
+
+
+
+class ScopeVectors :
+    '''Unit query vectors of the cached answers of one scope , in insertion order, stacked into a matrix on demand.'''
+
+    def __init__(self) :
+        self.vectors : OrderedDict[str , np.ndarray] = OrderedDict()
+        self._matrix : Optional[tuple[list[str] , np.ndarray]] = None
+
+
+    def add(self , key : str , vector : np.ndarray) -> None :
+        self.vectors.pop(key , None)
+        self.vectors[key] = vector
+        self._matrix = None
+
+
+    def remove(self , key : str) -> None :
+        if self.vectors.pop(key , None) is not None :
+            self._matrix = None
+
+
+    def pop_oldest(self) -> None :
+        self.vectors.popitem(last = False)
+        self._matrix = None
+
+
+    def matrix(self) -> tuple[list[str] , np.ndarray] :
+        if self._matrix is None :
+            self._matrix = (list(self.vectors) , np.stack(list(self.vectors.values())))
+        return self._matrix
+
+
+
+
+class AnswerCache :
+    '''
+    Cache of /rag/ask answers (answer + retrieved sources).
+
+    - Scope : the document set, the index version of that set, the language and the retrieval options.
+      Any (re)ingest of a document of the scope changes the index version, so stale answers are never served.
+    - Lookup : exact match on the normalized query first, then the most similar cached query of the
+      same scope, if its embedding similarity is above similarity_threshold.
+    - Query vectors are kept normalized and bucketed by scope (at most max_per_scope per scope , max_entries overall) :
+      a semantic lookup is one matrix-vector product over the scope bucket instead of a scan of every answer.
+    - Bounded LRU with TTL (entries of outdated scopes simply age out , their vectors are dropped with the least recent scopes).
+    '''
+
+    def __init__(self , max_entries : int , ttl : float , similarity_threshold : float , max_per_scope : int = 256) :
+        self.entries = LRUCache(max_entries = max_entries , ttl = ttl)
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.max_per_scope = max_per_scope
+        self._buckets : OrderedDict[str , ScopeVectors] = OrderedDict() # scope -> vectors , least recently used scope first
+        self._vector_count = 0
+        self._lock = threading.Lock()
+        self._stats = {"exact_hits" : 0 , "semantic_hits" : 0 , "misses" : 0}
+
+
+    @staticmethod
+    def build_scope(document_ids : Optional[list[str]] , index_version : str , language : str , *options) -> str :
+        return make_key("answer_scope" , ",".join(sorted(document_ids)) if document_ids else "*" , index_version , language , *options)
+
+
+    def _count(self , name : str) -> None :
+        with self._lock :
+            self._stats[name] += 1
+
+
+    def get(self , scope : str , query : str , query_vector : Optional[list[float]] = None) -> Optional[tuple[str , list[Document]]] :
+        '''Returns (answer , sources) of the same or a near-duplicate question of the scope, None on a miss.
+        Without query_vector (embeddings unavailable) only exact matches are looked up.'''
+
+        cached = self.get_exact(scope , query)
+        return cached if cached is not None else self.get_similar(scope , query_vector)
+
+
+    def get_exact(self , scope : str , query : str) -> Optional[tuple[str , list[Document]]] :
+        '''Returns (answer , sources) of the same normalized question of the scope, None otherwise (not counted as a miss ,
+        the caller follows up with get_similar once the query is embedded).'''
+
+        entry = self.entries.get(make_key("answer" , scope , normalize_query(query)))
+
+        if entry is None :
+            return None
+
+        self._count("exact_hits")
+        return entry["answer"] , entry["sources"]
+
+
+    def get_similar(self , scope : str , query_vector : Optional[list[float]]) -> Optional[tuple[str , list[Document]]] :
+        '''Returns (answer , sources) of the most similar question of the scope, None on a miss (counted).'''
+
+        entry = self._most_similar(scope , query_vector) if query_vector is not None else None
+
+        if entry is not None :
+            self._count("semantic_hits")
+            return entry["answer"] , entry["sources"]
+
+        self._count("misses")
+        return None
+
+
+    def _most_similar(self , scope : str , query_vector : list[float]) -> Optional[dict] :
+        '''Entry of the most similar question of the scope above the threshold (expired / evicted answers are skipped and forgotten).'''
+
+        vector = unit_vector(query_vector)
+
+        with self._lock :
+            bucket = self._buckets.get(scope)
+            if vector is None or bucket is None or not bucket.vectors :
+                return None
+
+            self._buckets.move_to_end(scope)
+            keys , matrix = bucket.matrix()
+
+        if matrix.shape[1] != vector.shape[0] :
+            return None
+
+        scores = matrix @ vector
+
+        for i in np.argsort(-scores) :
+            if scores[i] < self.similarity_threshold :
+                return None
+
+            entry = self.entries.get(keys[i])
+            if entry is not None :
+                return entry
+
+            with self._lock :
+                if keys[i] in bucket.vectors :
+                    bucket.remove(keys[i])
+                    self._vector_count -= 1
+                if not bucket.vectors and self._buckets.get(scope) is bucket :
+                    del self._buckets[scope]
+
+        return None
+
+
+    def set(self , scope : str , query : str , answer : str , sources : list[Document] , query_vector : Optional[list[float]] = None) -> None :
+        key = make_key("answer" , scope , normalize_query(query))
+        self.entries.set(key , {"scope" : scope , "answer" : answer , "sources" : sources})
+
+        vector = unit_vector(query_vector) if query_vector is not None else None
+        if vector is not None :
+            self._add_vector(scope , key , vector)
+
+
+    def _add_vector(self , scope : str , key : str , vector : np.ndarray) -> None :
+        with self._lock :
+            bucket = self._buckets.setdefault(scope , ScopeVectors())
+            self._buckets.move_to_end(scope)
+
+            self._vector_count += 0 if key in bucket.vectors else 1
+            bucket.add(key , vector)
+
+            if len(bucket.vectors) > self.max_per_scope :
+                bucket.pop_oldest()
+                self._vector_count -= 1
+
+            '''overall bound : the oldest vectors of the least recently used scopes go first'''
+            while self._vector_count > self.max_entries :
+                oldest_scope , oldest = next(iter(self._buckets.items()))
+                oldest.pop_oldest()
+                self._vector_count -= 1
+                if not oldest.vectors :
+                    del self._buckets[oldest_scope]
+
+
+    def stats(self) -> dict :
+        with self._lock :
+            stats = dict(self._stats)
+
+        stats["hits"] = stats["exact_hits"] + stats["semantic_hits"]
+        stats["entries"] = len(self.entries)
+        stats["scopes"] = len(self._buckets)
+
+        return stats
+
+
+
+
+@lru_cache
+def get_answer_cache() -> AnswerCache :
+    settings = get_settings()
+
+    return AnswerCache(
+        max_entries = settings.ANSWER_CACHE_MAX_ENTRIES ,
+        ttl = settings.ANSWER_CACHE_TTL_SECONDS ,
+        similarity_threshold = settings.ANSWER_CACHE_SIMILARITY_THRESHOLD ,
+        max_per_scope = settings.ANSWER_CACHE_MAX_PER_SCOPE
+    )
@@ -0,0 +1,179 @@
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Optional
+
+from core.config import get_settings
+from rag.embedder import Embedder
+
+
+class DocumentRegistry :
+    '''
+    Keeps track of the documents stored in the persistent vector store.
+    A document is registered only after all of its chunks were written, so a registered
+    document id means "fully indexed" and re-ingesting it can skip embedding entirely.
+    Rows are keyed by the Chroma collection and the tag of the embedding model that indexed them : only the documents
+    of the configured collection and model count as indexed (after a switch they are re-indexed on upload), and the
+    rows of the other collections are kept untouched.
+    '''
+
+    def __init__(self , path : str , embedding_model : str , collection : str) :
+        self.path = path
+        self.embedding_model = embedding_model
+        self.collection = collection
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)) , exist_ok = True)
+
+        with self._connect() as conn :
+            self._migrate(conn)
+
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS documents (
+                    doc_id TEXT NOT NULL ,
+                    collection TEXT NOT NULL ,
+                    embedding_model TEXT NOT NULL ,
+                    filename TEXT ,
+                    chunks INTEGER NOT NULL ,
+                    ingested_at REAL NOT NULL ,
+                    PRIMARY KEY (doc_id , collection , embedding_model)
+                )"""
+            )
+
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS ingests (
+                    doc_id TEXT NOT NULL ,
+                    collection TEXT NOT NULL ,
+                    embedding_model TEXT NOT NULL ,
+                    filename TEXT ,
+                    committed_batches INTEGER NOT NULL ,
+                    total_batches INTEGER NOT NULL ,
+                    updated_at REAL NOT NULL ,
+                    PRIMARY KEY (doc_id , collection , embedding_model)
+                )"""
+            )
+
+
+    def _migrate(self , conn : sqlite3.Connection) -> None :
+        '''
+        Registries keyed by doc_id alone : their documents were indexed in the configured collection
+        (with the gemini model when they predate the model tag). The ingests in progress only report progress
+        (an ingest resumes from the chunks stored in Chroma) and are dropped.
+        '''
+
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(documents)")}
+        if not columns or "collection" in columns :
+            return
+
+        model = "COALESCE(embedding_model , ?)" if "embedding_model" in columns else "?"
+
+        conn.execute("ALTER TABLE documents RENAME TO documents_unscoped")
+        conn.execute(
+            """CREATE TABLE documents (
+                doc_id TEXT NOT NULL ,
+                collection TEXT NOT NULL ,
+                embedding_model TEXT NOT NULL ,
+                filename TEXT ,
+                chunks INTEGER NOT NULL ,
+                ingested_at REAL NOT NULL ,
+                PRIMARY KEY (doc_id , collection , embedding_model)
+            )"""
+        )
+        conn.execute(
+            f"""INSERT INTO documents (doc_id , collection , embedding_model , filename , chunks , ingested_at)
+            SELECT doc_id , ? , {model} , filename , chunks , ingested_at FROM documents_unscoped""" ,
+            (self.collection , get_settings().EMBEDDING_MODEL)
+        )
+        conn.execute("DROP TABLE documents_unscoped")
+        conn.execute("DROP TABLE IF EXISTS ingests")
+
+
+    @contextmanager
+    def _connect(self) :
+        conn = sqlite3.connect(self.path , timeout = 30)
+        conn.row_factory = sqlite3.Row
+        try :
+            with conn :
+                yield conn
+        finally :
+            conn.close()
+
+
+    def get(self , doc_id : str) -> Optional[dict] :
+        with self._connect() as conn :
+            row = conn.execute("SELECT * FROM documents WHERE doc_id = ? AND collection = ? AND embedding_model = ?" , (doc_id , self.collection , self.embedding_model)).fetchone()
+            return dict(row) if row else None
+
+
+    def add(self , doc_id : str , filename : Optional[str] , chunks : int) -> None :
+        with self._lock , self._connect() as conn :
+            conn.execute("DELETE FROM ingests WHERE doc_id = ? AND collection = ? AND embedding_model = ?" , (doc_id , self.collection , self.embedding_model))
+            conn.execute(
+                "INSERT OR REPLACE INTO documents (doc_id , collection , embedding_model , filename , chunks , ingested_at) VALUES (? , ? , ? , ? , ? , ?)" ,
+                (doc_id , self.collection , self.embedding_model , filename , chunks , time.time())
+            )
+
+
+    def set_progress(self , doc_id : str , filename : Optional[str] , committed_batches : int , total_batches : int) -> None :
+        '''Progress of an ingest that is running (or was interrupted : it resumes from its committed batches on the next upload).'''
+
+        with self._lock , self._connect() as conn :
+            conn.execute(
+                "INSERT OR REPLACE INTO ingests (doc_id , collection , embedding_model , filename , committed_batches , total_batches , updated_at) VALUES (? , ? , ? , ? , ? , ? , ?)" ,
+                (doc_id , self.collection , self.embedding_model , filename , committed_batches , total_batches , time.time())
+            )
+
+
+    def list_ingests(self) -> list[dict] :
+        '''Ingests started but not completed (running or interrupted).'''
+
+        with self._connect() as conn :
+            return [
+                dict(row)
+                for row in conn.execute("SELECT * FROM ingests WHERE collection = ? AND embedding_model = ? ORDER BY updated_at DESC" , (self.collection , self.embedding_model))
+            ]
+
+
+    def missing(self , doc_ids : list[str]) -> list[str] :
+        '''Returns the ids that are not indexed.'''
+        return [doc_id for doc_id in doc_ids if self.get(doc_id) is None]
+
+
+    def list_documents(self) -> list[dict] :
+        with self._connect() as conn :
+            return [dict(row) for row in conn.execute("SELECT * FROM documents WHERE collection = ? AND embedding_model = ? ORDER BY ingested_at DESC" , (self.collection , self.embedding_model))]
+
+
+    def version(self , doc_ids : Optional[list[str]] = None) -> str :
+        '''
+        Changes whenever a document of the scope is (re)indexed : number of documents and latest ingest time,
+        over the given documents or the whole index. Used to invalidate what was derived from the index (answer cache).
+        '''
+
+        query = "SELECT COUNT(*) , MAX(ingested_at) FROM documents WHERE collection = ? AND embedding_model = ?"
+        params = [self.collection , self.embedding_model]
+
+        if doc_ids :
+            query += f" AND doc_id IN ({' , '.join('?' for _ in doc_ids)})"
+            params += list(doc_ids)
+
+        with self._connect() as conn :
+            count , latest = conn.execute(query , params).fetchone()
+
+        return f"{count}:{latest}"
+
+
+    def count(self) -> int :
+        with self._connect() as conn :
+            return conn.execute("SELECT COUNT(*) FROM documents WHERE collection = ? AND embedding_model = ?" , (self.collection , self.embedding_model)).fetchone()[0]
+
+
+
+
+@lru_cache
+def get_document_registry() -> DocumentRegistry :
+    settings = get_settings()
+    return DocumentRegistry(os.path.join(settings.CHROMA_PERSIST_DIR , "registry.sqlite3") , Embedder.get_model_tag() , settings.CHROMA_COLLECTION_NAME)
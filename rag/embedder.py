@@ -1,18 +1,159 @@
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
+import os
+from array import array
 
+from langchain_core.embeddings import Embeddings
 
+from core.cache import LRUCache, SQLiteCache, TieredCache
 from core.config import get_settings
+from core.hashing import make_key
+from core.providers import get_provider_registry, require_key
+
 
 settings = get_settings()
+
+
+class CachedEmbeddings(Embeddings) :
+    '''
+    Wraps an embedding model with a content-addressed cache.
+    - Key = hash(model name , kind , chunk text). Documents and queries are kept apart because
+      Gemini embeds them with different task types.
+    - Only the texts that are not cached (deduplicated) are sent to the underlying model.
+    - Vectors are stored as float32 bytes to keep the on-disk store compact.
+    '''
+
+    def __init__(self , embeddings : Embeddings , model_name : str , cache : TieredCache) :
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.cache = cache
+
+
+    def _key(self , kind : str , text : str) -> str :
+        return make_key("embedding" , self.model_name , kind , text)
+
+
+    @staticmethod
+    def _pack(vector : list[float]) -> bytes :
+        return array("f" , vector).tobytes()
+
+
+    @staticmethod
+    def _unpack(blob : bytes) -> list[float] :
+        vector = array("f")
+        vector.frombytes(blob)
+        return vector.tolist()
+
+
+    def embed_documents(self , texts : list[str]) -> list[list[float]] :
+        vectors : list = [None] * len(texts)
+        missing : dict[str , list[int]] = {} # text -> positions waiting for its vector
+
+        '''one cache lookup for the whole batch'''
+        keys = [self._key("document" , text) for text in texts]
+        cached = self.cache.get_many(keys)
+
+        for i , text in enumerate(texts) :
+            blob = cached.get(keys[i])
+
+            if blob is not None :
+                vectors[i] = self._unpack(blob)
+            else :
+                missing.setdefault(text , []).append(i)
+
+        if missing :
+            new_texts = list(missing)
+            new_vectors = self.embeddings.embed_documents(new_texts)
+
+            for text , vector in zip(new_texts , new_vectors) :
+                for i in missing[text] :
+                    vectors[i] = list(vector)
+
+            self.cache.set_many({
+                self._key("document" , text) : self._pack(vector) for text , vector in zip(new_texts , new_vectors)
+            })
+
+        return vectors
+
+
+    def embed_query(self , text : str) -> list[float] :
+        key = self._key("query" , text)
+        blob = self.cache.get(key)
+
+        if blob is not None :
+            return self._unpack(blob)
+
+        vector = self.embeddings.embed_query(text)
+        self.cache.set(key , self._pack(vector))
+
+        return list(vector)
+
+
+
+
 class Embedder:
     """
-    Loads the embedding model used for the RAG pipeline.
+    Loads the embedding model used for the RAG pipeline, selected by EMBEDDING_BACKEND :
+    - gemini : GoogleGenerativeAIEmbeddings (network call per batch / query)
+    - huggingface : small sentence-transformers model run locally (batched, multi-threaded CPU inference)
+    A single cached embedder is shared by ingestion (/rag/index) and query embedding (/rag/ask).
+    Its model_name is the model tag stored with the Chroma collection, so embeddings of different models are never mixed.
     """
-    @staticmethod 
-    def get_embedder() :
-        
-        return GoogleGenerativeAIEmbeddings(
-            model = "gemini-embedding-001" , 
-            google_api_key = settings.GOOGLE_API_KEY
-    )
-        
+
+    @staticmethod
+    def get_model_tag() -> str :
+        """Identifies the configured embedding model (cache keys , collection tag , document registry)."""
+
+        if settings.EMBEDDING_BACKEND == "huggingface" :
+            return settings.HF_EMBEDDING_MODEL
+
+        return settings.EMBEDDING_MODEL
+
+
+    @staticmethod
+    def load_huggingface() -> Embeddings :
+        """Local model , imported only when selected (torch is heavy)."""
+
+        try :
+            from langchain_huggingface import HuggingFaceEmbeddings
+        except ImportError as e :
+            raise RuntimeError("EMBEDDING_BACKEND=huggingface needs the local embedding dependencies : pip install -r requirements-huggingface.txt") from e
+
+        if settings.HF_EMBEDDING_THREADS > 0 :
+            import torch
+            torch.set_num_threads(settings.HF_EMBEDDING_THREADS)
+
+        return HuggingFaceEmbeddings(
+            model_name = settings.HF_EMBEDDING_MODEL ,
+            model_kwargs = {"device" : settings.HF_EMBEDDING_DEVICE} ,
+            encode_kwargs = {"batch_size" : settings.HF_EMBEDDING_BATCH_SIZE , "normalize_embeddings" : True}
+        )
+
+
+    @staticmethod
+    def build_embedder() -> CachedEmbeddings :
+        """Builds the embedder (called once, on first use, by the provider registry)."""
+
+        if settings.EMBEDDING_BACKEND == "huggingface" :
+            embeddings = Embedder.load_huggingface()
+        else :
+            from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+            embeddings = GoogleGenerativeAIEmbeddings(
+                model = settings.EMBEDDING_MODEL ,
+                google_api_key = require_key("GOOGLE_API_KEY")
+            )
+
+        cache = TieredCache(
+            memory = LRUCache(max_entries = settings.EMBEDDING_CACHE_MEMORY_ENTRIES) ,
+            disk = SQLiteCache(
+                path = os.path.join(settings.CACHE_DIR , "embeddings.sqlite3") ,
+                max_entries = settings.EMBEDDING_CACHE_MAX_ENTRIES
+            )
+        )
+
+        return CachedEmbeddings(embeddings , Embedder.get_model_tag() , cache)
+
+
+    @staticmethod
+    def get_embedder() -> CachedEmbeddings :
+        """Shared embedder , built lazily by the provider registry."""
+        return get_provider_registry().get("embeddings")
@@ -0,0 +1,191 @@
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Optional
+
+from langchain_core.documents import Document
+
+from core.config import get_settings
+
+
+'''
+Words, numbers and compound references kept whole : "7.1", "12(b)", "non-compete", "s.2(1)(a)".
+Compounds are indexed both whole and split into their parts, so "section 7.1" matches "7.1" exactly and "7" loosely.
+'''
+TOKEN_PATTERN = re.compile(r"\w+(?:(?:[.\-/]\w+)|(?:\(\w{1,4}\)))*")
+PART_PATTERN = re.compile(r"\w+")
+
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were will with "
+    "what which who whom when where why how does do did shall".split()
+)
+
+
+def tokenize(text : str) -> list[str] :
+    """Lower case terms of a text for the keyword index (compounds + their parts, without stopwords)."""
+
+    terms = []
+
+    for match in TOKEN_PATTERN.finditer(text.lower()) :
+        token = match.group()
+        parts = PART_PATTERN.findall(token)
+
+        if len(parts) > 1 :
+            terms.append(token)
+
+        terms.extend(part for part in parts if part not in STOPWORDS)
+
+    return terms
+
+
+
+
+class KeywordIndex :
+    '''
+    Local inverted index (BM25) kept next to the Chroma collection, over the same chunks.
+    Exact terms (section numbers, defined terms, party names) that dense embeddings match poorly are found here,
+    and it keeps answering when the embedding API is slow or down.
+    Chunks are stored under the same ids as in Chroma ("<doc_id>:<index>"), one index file per Chroma collection.
+    '''
+
+    def __init__(self , path : str , k1 : float = 1.5 , b : float = 0.75) :
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)) , exist_ok = True)
+
+        with self._connect() as conn :
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS chunks (
+                    chunk_id TEXT PRIMARY KEY ,
+                    doc_id TEXT NOT NULL ,
+                    content TEXT NOT NULL ,
+                    metadata TEXT NOT NULL ,
+                    length INTEGER NOT NULL
+                )"""
+            )
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS postings (
+                    term TEXT NOT NULL ,
+                    chunk_id TEXT NOT NULL ,
+                    tf INTEGER NOT NULL ,
+                    PRIMARY KEY (term , chunk_id)
+                ) WITHOUT ROWID"""
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_doc ON chunks (doc_id)")
+
+
+    @contextmanager
+    def _connect(self) :
+        conn = sqlite3.connect(self.path , timeout = 30)
+        conn.row_factory = sqlite3.Row
+        try :
+            with conn :
+                yield conn
+        finally :
+            conn.close()
+
+
+    @staticmethod
+    def _doc_filter(document_ids : Optional[list[str]]) -> tuple[str , list] :
+        if not document_ids :
+            return "" , []
+
+        return f" AND c.doc_id IN ({' , '.join('?' for _ in document_ids)})" , list(document_ids)
+
+
+    def add(self , doc_id : str , chunks : list[Document] , start : int = 0) -> None :
+        '''Indexes the chunks of a document (ids "<doc_id>:<start + i>"). Re-adding a chunk id replaces it.'''
+
+        rows , postings = [] , []
+
+        for i , chunk in enumerate(chunks , start = start) :
+            chunk_id = f"{doc_id}:{i}"
+            terms = Counter(tokenize(chunk.page_content))
+            metadata = {**chunk.metadata , "doc_id" : doc_id}
+
+            rows.append((chunk_id , doc_id , chunk.page_content , json.dumps(metadata , default = str) , sum(terms.values())))
+            postings.extend((term , chunk_id , tf) for term , tf in terms.items())
+
+        with self._lock , self._connect() as conn :
+            conn.executemany("DELETE FROM postings WHERE chunk_id = ?" , [(row[0] ,) for row in rows])
+            conn.executemany("INSERT OR REPLACE INTO chunks (chunk_id , doc_id , content , metadata , length) VALUES (? , ? , ? , ? , ?)" , rows)
+            conn.executemany("INSERT INTO postings (term , chunk_id , tf) VALUES (? , ? , ?)" , postings)
+
+
+    def delete(self , doc_id : str) -> None :
+        with self._lock , self._connect() as conn :
+            conn.execute("DELETE FROM postings WHERE chunk_id IN (SELECT chunk_id FROM chunks WHERE doc_id = ?)" , (doc_id ,))
+            conn.execute("DELETE FROM chunks WHERE doc_id = ?" , (doc_id ,))
+
+
+    def indexed_documents(self) -> set[str] :
+        with self._connect() as conn :
+            return {row[0] for row in conn.execute("SELECT DISTINCT doc_id FROM chunks")}
+
+
+    def search(self , query : str , k : int = 3 , document_ids : Optional[list[str]] = None) -> list[tuple[Document , float]] :
+        '''Top k chunks by BM25 score (restricted to document_ids when given), best first.'''
+
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms :
+            return []
+
+        doc_filter , doc_params = KeywordIndex._doc_filter(document_ids)
+
+        with self._connect() as conn :
+            total , avg_length = conn.execute(
+                f"SELECT COUNT(*) , AVG(length) FROM chunks c WHERE 1 = 1{doc_filter}" , doc_params
+            ).fetchone()
+
+            if not total :
+                return []
+
+            rows = conn.execute(
+                f"""SELECT p.term , p.chunk_id , p.tf , c.length FROM postings p JOIN chunks c ON c.chunk_id = p.chunk_id
+                WHERE p.term IN ({' , '.join('?' for _ in terms)}){doc_filter}""" ,
+                terms + doc_params
+            ).fetchall()
+
+            document_frequency = Counter(row["term"] for row in rows)
+            scores = Counter()
+
+            for row in rows :
+                df = document_frequency[row["term"]]
+                idf = math.log(1 + (total - df + 0.5) / (df + 0.5))
+                norm = row["tf"] + self.k1 * (1 - self.b + self.b * row["length"] / (avg_length or 1))
+                scores[row["chunk_id"]] += idf * row["tf"] * (self.k1 + 1) / norm
+
+            top = scores.most_common(k)
+            if not top :
+                return []
+
+            found = {
+                row["chunk_id"] : row
+                for row in conn.execute(
+                    f"SELECT chunk_id , content , metadata FROM chunks WHERE chunk_id IN ({' , '.join('?' for _ in top)})" ,
+                    [chunk_id for chunk_id , _ in top]
+                )
+            }
+
+        return [
+            (Document(page_content = found[chunk_id]["content"] , metadata = json.loads(found[chunk_id]["metadata"])) , score)
+            for chunk_id , score in top
+        ]
+
+
+
+
+@lru_cache
+def get_keyword_index() -> KeywordIndex :
+    settings = get_settings()
+    return KeywordIndex(os.path.join(settings.CHROMA_PERSIST_DIR , f"keyword_index_{settings.CHROMA_COLLECTION_NAME}.sqlite3"))
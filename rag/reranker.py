@@ -0,0 +1,176 @@
+import math
+from collections import Counter
+from functools import lru_cache
+from typing import Optional
+
+from langchain_core.documents import Document
+
+from core.config import get_settings
+from rag.keyword_index import tokenize
+from src.summarizer import DocumentAnalyser
+
+
+'''
+Weight of the retrieval rank in the lexical score : a weak prior, so dense hits
+that share no exact term with the question are ranked lower but not dropped.
+'''
+RANK_PRIOR_WEIGHT = 0.3
+
+
+class Reranker :
+    '''
+    Optional second retrieval stage : the fused candidates (over-fetched) are re-scored against the question,
+    overlapping chunks are merged and the best passages are packed into a context-token budget.
+    The answer prompt then gets the most relevant text for fewer tokens than a larger k.
+
+    Scorers (local , no API call) :
+    - lexical : BM25 over the candidate pool , weighted by the share of the question terms covered.
+    - cross-encoder : sentence-transformers CrossEncoder on CPU (loaded on first use).
+    '''
+
+    @staticmethod
+    def lexical_scores(query : str , documents : list[Document] , k1 : float = 1.5 , b : float = 0.75) -> list[float] :
+        terms = set(tokenize(query))
+        if not terms or not documents :
+            return [0.0] * len(documents)
+
+        counts = [Counter(tokenize(doc.page_content)) for doc in documents]
+        avg_length = (sum(sum(c.values()) for c in counts) / len(counts)) or 1
+        idf = {
+            term : math.log(1 + (len(counts) - df + 0.5) / (df + 0.5))
+            for term in terms
+            for df in [sum(1 for c in counts if term in c)]
+        }
+        total_idf = sum(idf.values()) or 1
+
+        raw = []
+        for c in counts :
+            length = sum(c.values())
+            bm25 = sum(
+                idf[term] * c[term] * (k1 + 1) / (c[term] + k1 * (1 - b + b * length / avg_length))
+                for term in terms if term in c
+            )
+            coverage = sum(idf[term] for term in terms if term in c) / total_idf
+            raw.append(bm25 * coverage)
+
+        best = max(raw) or 1
+        return [
+            score / best + RANK_PRIOR_WEIGHT * (len(documents) - rank) / len(documents)
+            for rank , score in enumerate(raw)
+        ]
+
+
+    @staticmethod
+    @lru_cache
+    def load_cross_encoder(model_name : str , device : str) :
+        """Imported only when selected (torch is heavy)."""
+
+        try :
+            from sentence_transformers import CrossEncoder
+        except ImportError as e :
+            raise RuntimeError("RAG_RERANKER=cross-encoder needs the local model dependencies : pip install -r requirements-huggingface.txt") from e
+
+        return CrossEncoder(model_name , device = device)
+
+
+    @staticmethod
+    def cross_encoder_scores(query : str , documents : list[Document]) -> list[float] :
+        if not documents :
+            return []
+
+        settings = get_settings()
+        model = Reranker.load_cross_encoder(settings.RAG_CROSS_ENCODER_MODEL , settings.HF_EMBEDDING_DEVICE)
+        return [float(score) for score in model.predict([(query , doc.page_content) for doc in documents])]
+
+
+    @staticmethod
+    def overlap_length(first : str , second : str , min_overlap : int) -> int :
+        """Length of the longest suffix of first that is a prefix of second (0 below min_overlap)."""
+
+        for length in range(min(len(first) , len(second)) , min_overlap - 1 , -1) :
+            if first.endswith(second[:length]) :
+                return length
+        return 0
+
+
+    @staticmethod
+    def merge_overlapping(scored : list[tuple[Document , float]] , min_overlap : int) -> list[tuple[Document , float]] :
+        '''
+        Deduplicates the chunks of a same document : a chunk contained in another is dropped,
+        and consecutive chunks sharing their splitter overlap are merged into one passage (the overlap is kept once).
+        A merged passage gets the best score of its chunks. Input and output are sorted best first.
+        '''
+
+        passages : list[list] = []
+
+        for doc , score in scored :
+            text , doc_id = doc.page_content , doc.metadata.get("doc_id")
+            merged = False
+
+            for passage in passages :
+                if passage[0].metadata.get("doc_id") != doc_id :
+                    continue
+
+                current = passage[0].page_content
+
+                if text in current :
+                    merged = True
+                elif current in text :
+                    passage[0] = Document(page_content = text , metadata = dict(passage[0].metadata))
+                    merged = True
+                elif (length := Reranker.overlap_length(current , text , min_overlap)) :
+                    passage[0] = Document(page_content = current + text[length:] , metadata = dict(passage[0].metadata))
+                    merged = True
+                elif (length := Reranker.overlap_length(text , current , min_overlap)) :
+                    passage[0] = Document(page_content = text + current[length:] , metadata = dict(passage[0].metadata))
+                    merged = True
+
+                if merged :
+                    break
+
+            if not merged :
+                passages.append([doc , score])
+
+        return [(doc , score) for doc , score in passages]
+
+
+    @staticmethod
+    def pack(scored : list[tuple[Document , float]] , token_budget : int , max_chunks : Optional[int] = None) -> list[Document] :
+        '''Best passages first until the (estimated) token budget is spent. The best passage is always kept.'''
+
+        packed , used = [] , 0
+
+        for doc , _ in scored :
+            tokens = DocumentAnalyser.estimate_tokens(doc.page_content)
+
+            if packed and used + tokens > token_budget :
+                continue
+
+            packed.append(doc)
+            used += tokens
+
+            if max_chunks is not None and len(packed) >= max_chunks :
+                break
+
+        return packed
+
+
+    @staticmethod
+    def rerank(
+        query : str ,
+        documents : list[Document] ,
+        token_budget : int ,
+        max_chunks : Optional[int] = None ,
+        scorer : str = "lexical" ,
+        min_overlap : int = 20
+    ) -> list[Document] :
+        """Scores the candidates (in retrieval order), merges overlapping chunks and packs the best into token_budget."""
+
+        if scorer == "cross-encoder" :
+            scores = Reranker.cross_encoder_scores(query , documents)
+        else :
+            scores = Reranker.lexical_scores(query , documents)
+
+        scored = sorted(zip(documents , scores) , key = lambda item : item[1] , reverse = True)
+
+        return Reranker.pack(Reranker.merge_overlapping(scored , min_overlap) , token_budget , max_chunks)
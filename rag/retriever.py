@@ -1,19 +1,103 @@
+import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from langchain_core.documents import Document
+
+from core.config import get_settings
+from rag.vector_store import VectorStore
+from rag.keyword_index import KeywordIndex
+
+logger = logging.getLogger("lawlens.retriever")
+
+
+@lru_cache
+def get_vector_search_pool() -> ThreadPoolExecutor :
+    '''Query embeddings / vector searches run here so a question can stop waiting for a slow embedding API
+    (the abandoned call finishes in the background). Sized for every /rag/ask in flight plus the abandoned calls.'''
+    return ThreadPoolExecutor(max_workers = 2 * get_settings().RAG_ASK_MAX_CONCURRENCY , thread_name_prefix = "vector-search")
+
 
 class RetrieverBuilder :
     """
-    Creates a retriever from a vector store.
-    This retriever will be used by the pipeline to fetch
-    relevant document chunks for answering user queries.
+    Retrieval over the vector store and the keyword index.
+    The pipeline uses it to fetch the document chunks relevant to a user query.
     """
+
     @staticmethod
+    def reciprocal_rank_fusion(rankings : list[tuple[list[Document] , float]] , k : int , rrf_k : int = 60) -> list[Document] :
+        """
+        Fuses ranked lists with weighted reciprocal-rank fusion : score(chunk) = sum(weight / (rrf_k + rank)).
+        Only ranks are used, so BM25 and distance scores never have to be put on the same scale.
+        A chunk is identified by its document id and content (the same chunk comes from both indexes).
+        """
+
+        scores = defaultdict(float)
+        chunks = {}
+
+        for documents , weight in rankings :
+            for rank , doc in enumerate(documents , start = 1) :
+                key = (doc.metadata.get("doc_id") , doc.page_content)
+                scores[key] += weight / (rrf_k + rank)
+                chunks.setdefault(key , doc)
+
+        return [chunks[key] for key in sorted(scores , key = scores.get , reverse = True)[:k]]
 
-    def build_retriever(vectorstore , k : int = 3) :
+
+    @staticmethod
+    def run_with_timeout(func , timeout : float | None) :
+        """Returns func() , or raises TimeoutError after timeout seconds (None -> no limit , func runs on the calling thread)."""
+
+        if timeout is None :
+            return func()
+
+        return get_vector_search_pool().submit(func).result(timeout = timeout)
+
+
+    @staticmethod
+    def hybrid_search(
+        vectorstore ,
+        keyword_index : KeywordIndex ,
+        query : str ,
+        k : int = 3 ,
+        document_ids : list[str] | None = None ,
+        mode : str = "hybrid" ,
+        vector_weight : float = 1.0 ,
+        keyword_weight : float = 1.0 ,
+        fetch_k : int = 20 ,
+        rrf_k : int = 60 ,
+        vector_timeout : float | None = None
+    ) -> list[Document] :
         """
-        Convert vectorstore into a retriever.
+        Retrieves the top k chunks with dense (Chroma similarity) and / or keyword (BM25) search.
+        mode : "hybrid" (both, fused with RRF) , "vector" or "keyword" (no embedding call at all).
+        When the embedding API fails , or is slower than vector_timeout seconds , a hybrid search degrades to keyword results
+        instead of failing (or blocking) the question.
         """
-        retriever = vectorstore.as_retriever(search_type = "similarity" , search_kwargs = {"k" : k})
 
-        return retriever
+        rankings = []
+        fetch_k = max(k , fetch_k)
+
+        '''the weights only balance a hybrid fusion : a single-mode search ignores them'''
+        if mode == "vector" or (mode == "hybrid" and vector_weight > 0) :
+            try :
+                search_kwargs = {"k" : fetch_k if mode == "hybrid" else k}
+
+                metadata_filter = VectorStore.build_filter(document_ids)
+                if metadata_filter is not None :
+                    search_kwargs["filter"] = metadata_filter
+
+                documents = RetrieverBuilder.run_with_timeout(lambda : vectorstore.similarity_search(query , **search_kwargs) , vector_timeout)
+                rankings.append((documents , vector_weight or 1.0))
+
+            except Exception as e :
+                if mode == "vector" :
+                    raise
+                logger.warning("vector search failed (%s) , falling back to keyword search" , repr(e))
 
+        if mode in ("hybrid" , "keyword") and (keyword_weight > 0 or not rankings) :
+            documents = [doc for doc , _ in keyword_index.search(query , fetch_k if mode == "hybrid" else k , document_ids)]
+            rankings.append((documents , keyword_weight or 1.0))
 
-         
+        return RetrieverBuilder.reciprocal_rank_fusion(rankings , k , rrf_k)
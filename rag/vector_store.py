@@ -1,33 +1,114 @@
-from langchain_community.vectorstores import Chroma
+from functools import lru_cache
+from typing import TYPE_CHECKING
 from langchain.schema import Document
 from rag.embedder import Embedder
+from core.config import get_settings
+
+if TYPE_CHECKING :
+    from langchain_community.vectorstores import Chroma
+
+settings = get_settings()
+
 class VectorStore :
     '''
-    Builds a Chroma vector store from document chunks.
+    Persistent Chroma vector store shared by all ingested documents.
+    Every chunk carries the `doc_id` of its document in its metadata, so queries can be
+    restricted to one document or a set of them with a metadata filter.
     calls the embedder class (gemini embeddings) to create embeddings.
     '''
+    '''Collection metadata key holding the tag of the embedding model that filled it'''
+    MODEL_TAG_KEY = "embedding_model"
+
+    @staticmethod
+    @lru_cache
+    def get_vector_store() -> "Chroma" :
+        '''
+        Opens (or creates) the persistent collection. One instance is shared across requests.
+        '''
+
+        '''chromadb is imported on first use (slow import)'''
+        from langchain_community.vectorstores import Chroma
+
+        try :
+            '''Calls the embedder model (gemini or local embeddings, see EMBEDDING_BACKEND)'''
+            embedder = Embedder.get_embedder()
+
+            vectorstore = Chroma(
+                collection_name = settings.CHROMA_COLLECTION_NAME ,
+                embedding_function = embedder ,
+                persist_directory = settings.CHROMA_PERSIST_DIR ,
+                collection_metadata = {VectorStore.MODEL_TAG_KEY : embedder.model_name}
+            )
+
+        except Exception as e:
+            raise RuntimeError(f"Error opening vector store: {e}")
+
+        VectorStore.check_model_tag(vectorstore , embedder.model_name)
+
+        return vectorstore
+
+
+    @staticmethod
+    def check_model_tag(vectorstore : "Chroma" , model_tag : str) -> None :
+        '''
+        Refuses to query a collection filled by another embedding model (vectors of different models are not comparable).
+        Collections created before the tag existed were filled by the gemini model and get tagged on first open.
+        '''
+
+        collection = vectorstore._collection
+        metadata = dict(collection.metadata or {})
+        stored_tag = metadata.get(VectorStore.MODEL_TAG_KEY)
+
+        if stored_tag is None :
+            stored_tag = model_tag if collection.count() == 0 else settings.EMBEDDING_MODEL
+            collection.modify(metadata = {**metadata , VectorStore.MODEL_TAG_KEY : stored_tag})
+
+        if stored_tag != model_tag :
+            raise RuntimeError(
+                f"Collection '{settings.CHROMA_COLLECTION_NAME}' holds embeddings of '{stored_tag}' but the configured embedder is '{model_tag}'. "
+                "Set CHROMA_COLLECTION_NAME to another collection for this model (documents are re-indexed there on upload)."
+            )
+
+
+    @staticmethod
+    def chunk_ids(doc_id : str , start : int , count : int) -> list[str] :
+        '''Deterministic chunk ids ("<doc_id>:<index>") : a retried / resumed ingest overwrites instead of duplicating.'''
+        return [f"{doc_id}:{i}" for i in range(start , start + count)]
+
+
     @staticmethod
-    def build_vector_store(chunks : list[Document] , persist_dir : str = None) :
+    def add_document(vectorstore : "Chroma" , chunks : list[Document] , doc_id : str , start : int = 0) -> None :
         '''
-        Creates and returns a Chroma vector store containing embeddings
-        for the given document chunks. 
+        Embeds and stores chunks of one document under its doc_id (the batch starting at chunk index `start`).
         '''
-        
-        try : 
-            '''Calls the embedder model (gemini embeddings)'''
-            embedder = Embedder.get_embedder() 
 
-            '''Creates the vector store'''
-            vectorstore =  Chroma.from_documents(
+        try :
+            for chunk in chunks :
+                chunk.metadata["doc_id"] = doc_id
+
+            vectorstore.add_documents(
                 documents = chunks ,
-                embedding = embedder , 
-                persist_directory = persist_dir , 
-                collection_name = "lawlens_documents"
-            ) 
+                ids = VectorStore.chunk_ids(doc_id , start , len(chunks))
+            )
 
-            return vectorstore
-        
         except Exception as e:
-            raise RuntimeError(f"Error creating vector store: {e}")
+            raise RuntimeError(f"Error adding document to vector store: {e}")
+
+
+    @staticmethod
+    def existing_ids(vectorstore : "Chroma" , ids : list[str]) -> set[str] :
+        '''Ids among the given ones that are already stored (used to resume an interrupted ingest).'''
+        return set(vectorstore.get(ids = ids , include = [])["ids"])
+
+
+    @staticmethod
+    def build_filter(document_ids : list[str] | None = None) -> dict | None :
+        '''Chroma metadata filter restricting a search to the given documents (None -> all documents).'''
+
+        if not document_ids :
+            return None
+
+        if len(document_ids) == 1 :
+            return {"doc_id" : document_ids[0]}
 
-            
\ No newline at end of file
+        return {"doc_id" : {"$in" : list(document_ids)}}
@@ -1,5 +1,5 @@
 from pydantic import BaseModel , Field
-from typing import Optional 
+from typing import Optional , List , Literal
 
 
 class RAGInput(BaseModel) :
@@ -9,4 +9,9 @@ class RAGInput(BaseModel) :
 
     query : str = Field(... , description = "The question to be asked")
     language : Optional[str] = Field(default = "English" , description = "The language of the question")
-
+    document_ids : Optional[List[str]] = Field(default = None , description = "Ids of the indexed documents to search (all documents if omitted)")
+    k : Optional[int] = Field(default = None , ge = 1 , le = 50 , description = "Number of chunks used to answer (server default if omitted)")
+    retrieval_mode : Optional[Literal["hybrid" , "vector" , "keyword"]] = Field(default = None , description = "hybrid (BM25 + vector) , vector or keyword only (server default if omitted)")
+    vector_weight : Optional[float] = Field(default = None , ge = 0 , description = "Weight of the vector ranking in the fusion")
+    keyword_weight : Optional[float] = Field(default = None , ge = 0 , description = "Weight of the keyword (BM25) ranking in the fusion")
+    rerank : Optional[bool] = Field(default = None , description = "Re-rank over-fetched candidates and pack them into the context token budget (server default if omitted)")
@@ -4,7 +4,8 @@ from typing import Optional , List
 class SummaryResponse(BaseModel):
     '''Pydantic model for summary response'''
     summary : str = Field(... , description = "The summary of the document")
-    audio_hex : Optional[str] = Field(default=None , description = " The audio of the summary in hex format")
+    audio_id : Optional[str] = Field(default=None , description = "Id of the audio of the summary (tts) , served by /audio/{audio_id}")
+    audio_url : Optional[str] = Field(default=None , description = "URL of the audio of the summary (tts)")
 
 
 
@@ -12,6 +13,7 @@ class SummaryResponse(BaseModel):
 class RAGSource(BaseModel):
     '''Pydantic model to give retrieved chunks'''
     content : str = Field(... , description = "Retrieved context chunks")
+    document_id : Optional[str] = Field(default=None , description = "Id of the document the chunk belongs to")
    
 
 
@@ -20,3 +22,16 @@ class RAGResponse(BaseModel):
     answer : str = Field(... , description = "The answer to the question")
     sources : Optional[List[RAGSource]] = Field(default=None , description = "Optional list of retrieved chunks used to generate the answer")
 
+
+
+
+class JobStatusResponse(BaseModel):
+    '''Pydantic model for the status of a background job'''
+    job_id : str = Field(... , description = "Id of the job")
+    kind : str = Field(... , description = "Kind of job (e.g. summarize)")
+    status : str = Field(... , description = "queued , running , succeeded or failed")
+    phase : Optional[str] = Field(default=None , description = "Current phase (extracted , map k/N , reduce , tts ...)")
+    progress : float = Field(default=0 , description = "Progress between 0 and 1")
+    error : Optional[str] = Field(default=None , description = "Error message of a failed job")
+    created_at : float = Field(... , description = "Submission time (unix timestamp)")
+    updated_at : float = Field(... , description = "Last update time (unix timestamp)")
@@ -0,0 +1,103 @@
+import io
+import wave
+from array import array
+
+
+'''
+Format of the raw PCM returned by Gemini TTS when the audio comes without a WAV header :
+24 kHz , 16-bit signed little endian , mono.
+'''
+PCM_SAMPLE_RATE = 24000
+PCM_SAMPLE_WIDTH = 2
+PCM_CHANNELS = 1
+
+
+class PCMAudio :
+    '''Audio frames (interleaved samples , no header) and their format.'''
+
+    def __init__(self , frames : bytes , sample_rate : int = PCM_SAMPLE_RATE , sample_width : int = PCM_SAMPLE_WIDTH , channels : int = PCM_CHANNELS) :
+        self.frames = frames
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self.channels = channels
+
+
+def read_audio(audio : bytes) -> PCMAudio :
+    """Parses a WAV file, or takes the bytes as raw Gemini PCM when there is no RIFF header."""
+
+    if audio[:4] == b"RIFF" and audio[8:12] == b"WAVE" :
+        with wave.open(io.BytesIO(audio) , "rb") as wav :
+            return PCMAudio(
+                frames = wav.readframes(wav.getnframes()) ,
+                sample_rate = wav.getframerate() ,
+                sample_width = wav.getsampwidth() ,
+                channels = wav.getnchannels()
+            )
+
+    return PCMAudio(frames = audio)
+
+
+def resample(audio : PCMAudio , sample_rate : int) -> PCMAudio :
+    """Linear interpolation of 16-bit audio to another sample rate (only used when segments disagree)."""
+
+    if audio.sample_rate == sample_rate :
+        return audio
+
+    if audio.sample_width != 2 :
+        raise ValueError(f"Cannot resample {8 * audio.sample_width}-bit audio")
+
+    samples = array("h" , audio.frames)
+    channels = audio.channels
+    count = len(samples) // channels
+    new_count = max(1 , round(count * sample_rate / audio.sample_rate))
+    step = (count - 1) / max(1 , new_count - 1)
+
+    out = array("h" , bytes(2 * new_count * channels))
+
+    for i in range(new_count) :
+        position = i * step
+        left = int(position)
+        right = min(left + 1 , count - 1)
+        weight = position - left
+
+        for c in range(channels) :
+            a , b = samples[left * channels + c] , samples[right * channels + c]
+            out[i * channels + c] = int(round(a + (b - a) * weight))
+
+    return PCMAudio(frames = out.tobytes() , sample_rate = sample_rate , sample_width = 2 , channels = channels)
+
+
+def concat_wav(segments : list[bytes] , pause_ms : int = 0) -> bytes :
+    '''
+    Concatenates audio segments (WAV or raw PCM) into a single WAV file with one header.
+    The format of the first segment is kept : later segments with another sample rate are resampled,
+    a different sample width or channel count is an error. pause_ms of silence is put between two segments.
+    '''
+
+    if not segments :
+        raise ValueError("No audio segment to concatenate")
+
+    parts = [read_audio(segment) for segment in segments]
+    first = parts[0]
+
+    silence = bytes(first.sample_width * first.channels * (first.sample_rate * pause_ms // 1000))
+    buffer = io.BytesIO()
+
+    with wave.open(buffer , "wb") as wav :
+        wav.setnchannels(first.channels)
+        wav.setsampwidth(first.sample_width)
+        wav.setframerate(first.sample_rate)
+
+        for i , part in enumerate(parts) :
+            if (part.sample_width , part.channels) != (first.sample_width , first.channels) :
+                raise ValueError(
+                    f"Audio segment {i} is {8 * part.sample_width}-bit / {part.channels} channel(s) , "
+                    f"expected {8 * first.sample_width}-bit / {first.channels} channel(s)"
+                )
+
+            if i and silence :
+                wav.writeframes(silence)
+
+            wav.writeframes(resample(part , first.sample_rate).frames)
+
+    return buffer.getvalue()
@@ -0,0 +1,93 @@
+import os
+import re
+import tempfile
+import threading
+from functools import lru_cache
+from typing import Optional
+
+from core.config import get_settings
+from core.hashing import hash_bytes
+
+
+AUDIO_ID_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+
+class AudioStore :
+    '''
+    Content-addressed store of the synthesized audio : one WAV file per sha256 of its bytes.
+    The summary responses only carry the id , the audio itself is served by GET /audio/{audio_id}
+    (shared by the API and the job workers through the directory).
+    The oldest files are removed once the directory grows over max_bytes.
+    '''
+
+    def __init__(self , directory : str , max_bytes : int) :
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+        os.makedirs(directory , exist_ok = True)
+
+
+    def path(self , audio_id : str) -> Optional[str] :
+        '''Path of a stored audio , None for an unknown or malformed id.'''
+
+        if not AUDIO_ID_PATTERN.match(audio_id) :
+            return None
+
+        path = os.path.join(self.directory , f"{audio_id}.wav")
+        return path if os.path.exists(path) else None
+
+
+    def put(self , audio : bytes) -> str :
+        '''Stores the audio (written once , atomically) and returns its id.'''
+
+        audio_id = hash_bytes(audio)
+        path = os.path.join(self.directory , f"{audio_id}.wav")
+
+        if os.path.exists(path) :
+            os.utime(path)
+            return audio_id
+
+        fd , tmp_path = tempfile.mkstemp(dir = self.directory , suffix = ".tmp")
+        try :
+            with os.fdopen(fd , "wb") as f :
+                f.write(audio)
+            os.replace(tmp_path , path)
+        except Exception :
+            os.remove(tmp_path)
+            raise
+
+        self._evict(keep = path)
+
+        return audio_id
+
+
+    def _evict(self , keep : str) -> None :
+        with self._lock :
+            files = []
+            for entry in os.scandir(self.directory) :
+                if entry.name.endswith(".wav") and entry.path != keep :
+                    try :
+                        stat = entry.stat()
+                    except FileNotFoundError :
+                        continue
+                    files.append((stat.st_mtime , stat.st_size , entry.path))
+
+            total = sum(size for _ , size , _ in files) + os.path.getsize(keep)
+
+            for _ , size , path in sorted(files) :
+                if total <= self.max_bytes :
+                    break
+                try :
+                    os.remove(path)
+                    total -= size
+                except FileNotFoundError :
+                    pass
+
+
+
+
+@lru_cache
+def get_audio_store() -> AudioStore :
+    settings = get_settings()
+    return AudioStore(settings.AUDIO_DIR , settings.AUDIO_STORE_MAX_MB * 1024 * 1024)
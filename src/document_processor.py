@@ -1,92 +1,280 @@
-from langchain_community.document_loaders import TextLoader
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_community.document_loaders import Docx2txtLoader
+import io
+import multiprocessing
+import re
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import BinaryIO, Iterator, Union
+
+import docx2txt
+from pypdf import PdfReader
 
 from abc import ABC, abstractmethod
 from langchain_core.documents import Document
 
+from core.config import get_settings
+
+
+'''A document to extract : a file path, the raw bytes, or a binary file-like buffer (e.g. a spooled upload)'''
+DocumentSource = Union[str , bytes , BinaryIO]
+
+
+@contextmanager
+def open_source(source : DocumentSource) -> Iterator[BinaryIO] :
+    '''Yields the source as a seekable binary stream positioned at its start.
+    Only a path is opened (and closed) here : a buffer given by the caller stays open.'''
+
+    if isinstance(source , str) :
+        with open(source , "rb") as f :
+            yield f
+
+    elif isinstance(source , (bytes , bytearray)) :
+        yield io.BytesIO(source)
+
+    else :
+        source.seek(0)
+        yield source
+
+
 class DataProcessor(ABC) :
     '''
     Abstract base class for all file processors.
-    Stores the file path. Enforces that every subclass implements an extract_text() method returning Document objects.
+    Stores the source (path, bytes or binary buffer). Enforces that every subclass implements an extract_text() method returning Document objects.
     '''
 
-    def __init__(self , file_path : str) -> None :
-        self.file_path = file_path
+    def __init__(self , source : DocumentSource , source_name : str | None = None) -> None :
+        self.source = source
+        self.source_name = source_name or (source if isinstance(source , str) else "upload")
 
     @abstractmethod
     def extract_text(self) :
         """Extracts text and returns list of Document objects."""
         pass
-        
-        
+
+    def lazy_extract(self) -> Iterator[Document] :
+        """Yields the Document objects as they are extracted (one per page for PDFs, so consumers can start before the end)."""
+        yield from self.extract_text()
+
+
+
+def extract_pdf_pages(source : Union[str , bytes] , source_name : str , start : int , stop : int) -> list[Document] :
+    '''Extracts the pages [start , stop) of a PDF. Module level function so it can run in a worker process.'''
+
+    reader = PdfReader(source if isinstance(source , str) else io.BytesIO(source))
+    total_pages = len(reader.pages)
+    page_labels = reader.page_labels
+
+    return [PDFProcessor.page_document(reader , i , total_pages , source_name , page_labels[i]) for i in range(start , min(stop , total_pages))]
+
+
+@lru_cache
+def get_pdf_process_pool() -> ProcessPoolExecutor :
+    '''Shared process pool of the parallel PDF extraction (spawned : forking the multi-threaded API process is unsafe).'''
+    return ProcessPoolExecutor(max_workers = get_settings().PDF_EXTRACT_PROCESSES , mp_context = multiprocessing.get_context("spawn"))
+
 
 class PDFProcessor(DataProcessor) :
-    def extract_text(self) -> list[Document] :        
-        try : 
-            loader = PyPDFLoader(self.file_path)
-            return loader.load()
+    '''
+    One Document per page, with the same metadata as PyPDFLoader (source, page, total_pages, page_label).
+    Pages are parsed lazily (lazy_extract yields each page as soon as it is parsed). Large PDFs are split
+    into page ranges parsed in parallel by a process pool when PDF_EXTRACT_PROCESSES > 0.
+    '''
+
+    @staticmethod
+    def page_document(reader : PdfReader , i : int , total_pages : int , source_name : str , page_label : str) -> Document :
+        '''page_label comes from reader.page_labels read once per reader (every access of the property rebuilds all the labels).'''
+        return Document(
+            page_content = reader.pages[i].extract_text() ,
+            metadata = {
+                "source" : source_name ,
+                "page" : i ,
+                "total_pages" : total_pages ,
+                "page_label" : page_label
+            }
+        )
+
+
+    def lazy_extract(self) -> Iterator[Document] :
+        try :
+            with open_source(self.source) as stream :
+                reader = PdfReader(stream)
+                total_pages = len(reader.pages)
+                settings = get_settings()
+
+                if settings.PDF_EXTRACT_PROCESSES > 0 and total_pages >= settings.PDF_PARALLEL_MIN_PAGES :
+                    yield from self.parallel_extract(stream , total_pages , settings.PDF_PAGES_PER_TASK)
+                    return
+
+                page_labels = reader.page_labels
+
+                for i in range(total_pages) :
+                    yield PDFProcessor.page_document(reader , i , total_pages , self.source_name , page_labels[i])
+
         except Exception as e:
             raise RuntimeError(f"Error reading PDF: {e}")
-        
-    
+
+
+    def parallel_extract(self , stream : BinaryIO , total_pages : int , pages_per_task : int) -> Iterator[Document] :
+        '''Parses page ranges in the process pool and yields the pages in order, as soon as their range is done.'''
+
+        if isinstance(self.source , str) :
+            source = self.source
+        else :
+            stream.seek(0)
+            source = stream.read()
+
+        pool = get_pdf_process_pool()
+        futures = [
+            pool.submit(extract_pdf_pages , source , self.source_name , start , start + pages_per_task)
+            for start in range(0 , total_pages , pages_per_task)
+        ]
+
+        try :
+            for future in futures :
+                yield from future.result()
+        finally :
+            for future in futures :
+                future.cancel()
+
+
+    def extract_text(self) -> list[Document] :
+        return list(self.lazy_extract())
+
+
 class TXTProcessor(DataProcessor) :
     def extract_text(self) -> list[Document] :
-        try : 
-            loader = TextLoader(self.file_path)
-            return loader.load()
+        try :
+            with open_source(self.source) as stream :
+                text = stream.read().decode("utf-8-sig")
+            return [Document(page_content = text , metadata = {"source" : self.source_name})]
         except Exception as e:
             raise RuntimeError(f"Error reading TXT: {e}")
-        
-    
+
+
 class DOCXProcessor(DataProcessor) :
 
     # def __init__(self , file_path : str) -> None :
     #     super().__init__(file_path) -> no need
     def extract_text(self) -> list[Document] :
-        try : 
-            loader = Docx2txtLoader(self.file_path)
-            return loader.load()
+        try :
+            with open_source(self.source) as stream :
+                text = docx2txt.process(stream)
+            return [Document(page_content = text , metadata = {"source" : self.source_name})]
         except Exception as e:
             raise RuntimeError(f"Error reading DOCX: {e}")
-        
-    
+
+
 class DocumentProcessorFactory :
     """
     Factory class responsible for selecting and executing the correct document processor
-    based on the file extension (PDF, TXT, or DOCX).
+    based on the content of the file (PDF, TXT, or DOCX), sniffed from its magic bytes.
     """
 
+    '''Bytes read to sniff the type. The PDF header may follow a few junk bytes, it must start in the first 1024 bytes.'''
+    SNIFF_BYTES = 1024
+
+    '''Control bytes that never appear in a text file (anything below 0x20 but tab , new line , form feed and carriage return)'''
+    BINARY_BYTES = re.compile(rb"[\x00-\x08\x0b\x0e-\x1f\x7f]")
+
+    @staticmethod
+    def has_pdf_header(head : bytes) -> bool :
+        '''
+        True when head starts with %PDF- , possibly after a BOM , whitespace or binary junk (tolerated by PDF readers).
+        A text that merely mentions "%PDF-" is not a PDF : the bytes before the marker must not be readable text.
+        '''
+
+        position = head.find(b"%PDF-")
+        if position < 0 :
+            return False
+
+        prefix = head[: position].removeprefix(b"\xef\xbb\xbf").strip()
+        if not prefix :
+            return True
+
+        if DocumentProcessorFactory.BINARY_BYTES.search(prefix) :
+            return True
+
+        try :
+            prefix.decode("utf-8")
+        except UnicodeDecodeError :
+            return True
+
+        return False
+
+    @staticmethod
+    def detect_type(source : DocumentSource) -> str :
+        """
+        Returns 'pdf', 'docx' or 'txt' from the content, whatever the file name says :
+        %PDF- header -> pdf , zip archive holding word/document.xml -> docx , valid utf-8 -> txt.
+        """
+
+        with open_source(source) as stream :
+            head = stream.read(DocumentProcessorFactory.SNIFF_BYTES)
+
+            if DocumentProcessorFactory.has_pdf_header(head) :
+                return "pdf"
+
+            if head.startswith(b"PK\x03\x04") :
+                stream.seek(0)
+                try :
+                    with zipfile.ZipFile(stream) as archive :
+                        if "word/document.xml" in archive.namelist() :
+                            return "docx"
+                except zipfile.BadZipFile :
+                    pass
+                raise ValueError("Unsupported file format: zip archive that is not a Word document")
+
+            stream.seek(0)
+            try :
+                stream.read().decode("utf-8-sig")
+            except UnicodeDecodeError :
+                raise ValueError("Unsupported file format: not a PDF, DOCX or UTF-8 text file")
+
+            return "txt"
+
+
     @staticmethod
-    def get_processor(file_path : str) :
+    def get_processor(source : DocumentSource , source_name : str | None = None) :
         """
-        Determines the appropriate processor class based on file extension
+        Determines the appropriate processor class from the content
         and returns an instance of that processor.
         """
 
-        if file_path.endswith(".pdf") :
-            return PDFProcessor(file_path)
-        elif file_path.endswith(".txt") :
-            return TXTProcessor(file_path)
-        elif file_path.endswith(".docx") :
-            return DOCXProcessor(file_path)
-        else :
-            raise ValueError(f"Unsupported file format: {file_path}")
-        
-        
+        processors = {
+            "pdf" : PDFProcessor ,
+            "txt" : TXTProcessor ,
+            "docx" : DOCXProcessor
+        }
+
+        return processors[DocumentProcessorFactory.detect_type(source)](source , source_name)
+
+
     @staticmethod
-    def process(file_path : str) :
+    def lazy_process(source : DocumentSource , source_name : str | None = None) -> Iterator[Document] :
+        """
+        Same as process, but yields the Documents (pages) as they are extracted,
+        so the summarizer / splitter can start working before the extraction finishes.
+        """
+        try :
+            processor = DocumentProcessorFactory.get_processor(source , source_name)
+            yield from processor.lazy_extract()
+
+        except Exception as e:
+            raise RuntimeError(f"Error processing document: {e}")
+
+
+    @staticmethod
+    def process(source : DocumentSource , source_name : str | None = None) :
         """
         Automatically creates the correct processor
         and extracts text while handling any runtime errors.
+        source : file path, bytes or binary buffer (no temp file is needed)
         """
         try :
-            processor = DocumentProcessorFactory.get_processor(file_path)
+            processor = DocumentProcessorFactory.get_processor(source , source_name)
             docs = processor.extract_text()
             return docs
 
         except Exception as e:
             raise RuntimeError(f"Error processing document: {e}")
-
-
-
@@ -0,0 +1,129 @@
+import os
+import zlib
+from functools import lru_cache
+from typing import Iterator, Optional
+
+from langchain_core.documents import Document
+
+from core.cache import LRUCache, SQLiteCache, TieredCache
+from core.config import get_settings
+from core.hashing import make_key
+from src.document_processor import DocumentProcessorFactory, DocumentSource
+
+
+class ExtractionCache :
+    '''
+    Content-addressed cache of extracted text, shared by the summarizer and the RAG indexing,
+    so the second pipeline that touches a document skips parsing entirely.
+
+    - pages : keyed by the hash of the uploaded file bytes.
+    - chunks : keyed by the document hash and the splitter parameters.
+
+    Entries are stored compactly, in both tiers : the texts concatenated and zlib compressed,
+    plus the offsets where every page / chunk starts and their metadata.
+    The "source" metadata is not stored (it is the name given by the caller of extract).
+    '''
+
+    def __init__(self , cache : TieredCache) :
+        self.cache = cache
+
+
+    @staticmethod
+    def pack(documents : list[Document]) -> dict :
+        offsets , position = [] , 0
+
+        for doc in documents :
+            offsets.append(position)
+            position += len(doc.page_content)
+
+        return {
+            "text" : zlib.compress("".join(doc.page_content for doc in documents).encode("utf-8")) ,
+            "offsets" : offsets ,
+            "metadata" : [{key : value for key , value in doc.metadata.items() if key != "source"} for doc in documents]
+        }
+
+
+    @staticmethod
+    def unpack(entry : dict , source_name : Optional[str] = None) -> list[Document] :
+        text = zlib.decompress(entry["text"]).decode("utf-8")
+        bounds = entry["offsets"][1:] + [len(text)]
+
+        documents = []
+        for start , stop , metadata in zip(entry["offsets"] , bounds , entry["metadata"]) :
+            metadata = dict(metadata)
+            if source_name :
+                metadata["source"] = source_name
+            documents.append(Document(page_content = text[start : stop] , metadata = metadata))
+
+        return documents
+
+
+    def get_pages(self , doc_hash : str , source_name : Optional[str] = None) -> Optional[list[Document]] :
+        entry = self.cache.get(make_key("pages" , doc_hash))
+        return None if entry is None else ExtractionCache.unpack(entry , source_name)
+
+
+    def set_pages(self , doc_hash : str , pages : list[Document]) -> None :
+        self.cache.set(make_key("pages" , doc_hash) , ExtractionCache.pack(pages))
+
+
+    def get_chunks(self , doc_hash : str , splitter_params : tuple , source_name : Optional[str] = None) -> Optional[list[Document]] :
+        entry = self.cache.get(make_key("chunks" , doc_hash , *splitter_params))
+        return None if entry is None else ExtractionCache.unpack(entry , source_name)
+
+
+    def set_chunks(self , doc_hash : str , splitter_params : tuple , chunks : list[Document]) -> None :
+        self.cache.set(make_key("chunks" , doc_hash , *splitter_params) , ExtractionCache.pack(chunks))
+
+
+    def extract(self , source : DocumentSource , doc_hash : str , source_name : Optional[str] = None) -> Iterator[Document] :
+        '''
+        Yields the pages of the document : from the cache when it was already extracted,
+        otherwise lazily from DocumentProcessorFactory.lazy_process (cached once the extraction completes).
+        '''
+
+        pages = self.get_pages(doc_hash , source_name)
+
+        if pages is not None :
+            yield from pages
+            return
+
+        pages = []
+        for page in DocumentProcessorFactory.lazy_process(source , source_name) :
+            pages.append(page)
+            yield page
+
+        self.set_pages(doc_hash , pages)
+
+
+    def stats(self) -> dict :
+        return self.cache.stats()
+
+
+
+
+"""
+Single shared ExtractionCache (memory LRU + optional SQLite tier under CACHE_DIR).
+"""
+
+@lru_cache
+def get_extraction_cache() -> ExtractionCache :
+    settings = get_settings()
+    ttl = settings.EXTRACTION_CACHE_TTL_SECONDS
+
+    disk = None
+    if settings.EXTRACTION_CACHE_DISK_ENABLED :
+        '''entries are already compressed by ExtractionCache.pack'''
+        disk = SQLiteCache(
+            path = os.path.join(settings.CACHE_DIR , "extractions.sqlite3") ,
+            max_bytes = settings.EXTRACTION_CACHE_DISK_MAX_MB * 1024 * 1024 ,
+            ttl = ttl ,
+            compress = False
+        )
+
+    return ExtractionCache(
+        TieredCache(
+            memory = LRUCache(max_entries = settings.EXTRACTION_CACHE_MAX_ENTRIES , ttl = ttl) ,
+            disk = disk
+        )
+    )
@@ -1,15 +1,25 @@
-from langchain_google_genai import ChatGoogleGenerativeAI
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from core.config import get_settings
+from core.providers import get_provider_registry
+from core.rate_limit import call_with_retry, is_transient_error
+from core.streaming import EventCallback, emit
+from src.audio import concat_wav
+from src.tts_cache import get_tts_cache
 
 settings = get_settings()
 
 class TextToSpeech :
     
+    MODEL = "gemini-2.5-flash-preview-tts"
+    VOICE = "clear and professional"
 
-    client = ChatGoogleGenerativeAI(
-        model = "gemini-2.5-flash-preview-tts" , 
-        google_api_key = settings.GOOGLE_API_KEY
-    )
+    @staticmethod
+    def get_client() :
+        """Gemini TTS client , built on first use and shared (see core/providers.py)."""
+        return get_provider_registry().get("tts")
 
     @staticmethod
     def text_to_speech(summary_text : str , language : str = "en") -> bytes :
@@ -19,8 +29,8 @@ class TextToSpeech :
         """
 
         try :
-            response = TextToSpeech.client.invoke(
-                f"say this in a clear and professional voice in {language} : {summary_text}" , 
+            response = TextToSpeech.get_client().invoke(
+                f"say this in a {TextToSpeech.VOICE} voice in {language} : {summary_text}" , 
                 generation_config = {"response_modalities": ["AUDIO"]}
             )
 
@@ -35,4 +45,147 @@ class TextToSpeech :
             raise RuntimeError(f"Error converting text to speech: {e}")
 
 
+    @staticmethod
+    def voice_id() -> str :
+        """Identifies the voice of the generated audio (TTS model + voice), part of the audio cache key."""
+        return f"{TextToSpeech.MODEL}/{TextToSpeech.VOICE}"
+
+
+    @staticmethod
+    def cached_text_to_speech(text : str , language : str = "en") -> bytes :
+        """Same as text_to_speech, served from the TTS cache when the same text was already spoken in this language and voice."""
+
+        cache = get_tts_cache()
+        audio = cache.get(text , language , TextToSpeech.voice_id())
+
+        if audio is None :
+            audio = TextToSpeech.text_to_speech(text , language = language)
+            cache.set(text , language , TextToSpeech.voice_id() , audio)
+
+        return audio
+
+
+
+
+'''End of a sentence (followed by whitespace) or a paragraph break'''
+SEGMENT_BOUNDARY = re.compile(r"(?<=[.!?;:।。！？])\s+|\n\s*\n")
+
+
+class SpeechSegmenter :
+    '''
+    Cuts a text arriving token by token into segments for the TTS : a segment ends at the first sentence
+    or paragraph boundary after min_chars , or at the last space before max_chars when no boundary comes.
+    '''
+
+    def __init__(self , min_chars : int , max_chars : int) :
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self.buffer = ""
+
+
+    def feed(self , text : str) -> list[str] :
+        self.buffer += text
+        segments = []
+
+        while True :
+            boundary = next((m for m in SEGMENT_BOUNDARY.finditer(self.buffer) if m.start() >= self.min_chars) , None)
+
+            if boundary is not None and boundary.start() <= self.max_chars :
+                segments.append(self.buffer[: boundary.start()])
+                self.buffer = self.buffer[boundary.end() :]
+
+            elif len(self.buffer) > self.max_chars :
+                cut = self.buffer.rfind(" " , 0 , self.max_chars)
+                cut = cut if cut > 0 else self.max_chars
+                segments.append(self.buffer[: cut])
+                self.buffer = self.buffer[cut :].lstrip()
+
+            else :
+                return [segment.strip() for segment in segments if segment.strip()]
+
+
+    def flush(self) -> list[str] :
+        segment , self.buffer = self.buffer.strip() , ""
+        return [segment] if segment else []
+
+
+
+
+@lru_cache
+def get_tts_pool() -> ThreadPoolExecutor :
+    '''Shared by all the summaries : at most TTS_MAX_CONCURRENCY TTS calls in flight in the process.'''
+    return ThreadPoolExecutor(max_workers = settings.TTS_MAX_CONCURRENCY , thread_name_prefix = "tts")
+
+
+
+
+class SpeechStream :
+    '''
+    Pipelined TTS : the summary text is fed as it is generated, every complete segment is synthesized right away
+    (bounded parallelism , retried on transient errors) and finish() joins the segments , in order , into one WAV file.
+    Emits "tts_started" with the first segment and "tts_segment" (index , completed / segments so far) as each one is ready.
+    '''
+
+    def __init__(self , language : str , on_event : EventCallback | None = None) :
+        self.language = language
+        self.on_event = on_event
+        self.segmenter = SpeechSegmenter(settings.TTS_SEGMENT_MIN_CHARS , settings.TTS_SEGMENT_MAX_CHARS)
+        self.futures = []
+        self.completed = 0
+        self._lock = threading.Lock()
+
+
+    def _synthesize(self , segment : str) -> bytes :
+        return call_with_retry(
+            lambda : TextToSpeech.cached_text_to_speech(segment , language = self.language) ,
+            max_retries = settings.LLM_MAX_RETRIES ,
+            base_delay = settings.LLM_RETRY_BASE_DELAY ,
+            max_delay = settings.LLM_RETRY_MAX_DELAY ,
+            retry_on = is_transient_error
+        )
+
+
+    def _on_segment_done(self , index : int , future) -> None :
+        if future.cancelled() or future.exception() is not None :
+            return
+
+        with self._lock :
+            self.completed += 1
+            completed = self.completed
+
+        emit(self.on_event , "tts_segment" , index = index , completed = completed , segments = len(self.futures))
+
+
+    def _submit(self , segment : str) -> None :
+        if not self.futures :
+            emit(self.on_event , "tts_started")
+
+        index = len(self.futures)
+        future = get_tts_pool().submit(self._synthesize , segment)
+        self.futures.append(future)
+        future.add_done_callback(lambda f : self._on_segment_done(index , f))
+
+
+    def feed(self , text : str) -> None :
+        for segment in self.segmenter.feed(text) :
+            self._submit(segment)
+
+
+    def finish(self , full_text : str | None = None) -> bytes :
+        '''Synthesizes the rest of the text and returns the whole audio (WAV).
+        full_text is spoken entirely when nothing was fed (e.g. summary served from the cache).'''
+
+        if not self.futures and not self.segmenter.buffer and full_text :
+            self.feed(full_text)
+
+        for segment in self.segmenter.flush() :
+            self._submit(segment)
+
+        try :
+            segments = [future.result() for future in self.futures]
+        except Exception :
+            for future in self.futures :
+                future.cancel()
+            raise
 
+        return concat_wav(segments , pause_ms = settings.TTS_SEGMENT_PAUSE_MS)
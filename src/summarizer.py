@@ -1,8 +1,15 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Iterable, Iterator
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain.chains.summarize import load_summarize_chain
 from langchain.schema import Document
+from langchain_core.output_parsers import StrOutputParser
 from abc import ABC , abstractmethod
 from prompt_templates.prompts import PromptManager
+from core.config import get_settings
+from core.rate_limit import get_llm_rate_limiter, call_with_retry
+from core.llm_router import route_model
+from core.streaming import EventCallback, emit
 
 
 
@@ -26,6 +33,12 @@ class DocumentAnalyser :
         return estimated_tokens
     
 
+    @staticmethod
+    def estimate_tokens(text : str) -> int :
+        """Estimates token count of a single text (used as the splitter length function)"""
+        return len(text) // DocumentAnalyser.CHARS_PER_TOKEN
+
+
     @staticmethod
     def suggest_chain_type(documents : list[Document]) -> str :
         """Determines which summarization approach to use based on token count"""
@@ -42,10 +55,34 @@ class BaseSummarizer(ABC) :
     '''It provides common methods like document validation and splitting, 
     while enforcing that every child class implements its own `summarize()` method.
     '''
-    def __init__(self , llm , chunk_size : int = 400 , chunk_overlap : int = 80) :
+
+    '''Completion size assumed when reserving tokens from the rate limiter'''
+    EXPECTED_OUTPUT_TOKENS = 512
+
+    '''Tokens of the system / user prompt templates wrapped around the text'''
+    PROMPT_OVERHEAD_TOKENS = 100
+
+    '''
+    Split points, from the most to the least preferred : section / article headings,
+    paragraphs, numbered clauses ("7.1", "(a)"), lines, sentences, words.
+    '''
+    SEPARATORS = [
+        r"\n(?=(?:ARTICLE|Article|SECTION|Section|SCHEDULE|Schedule|CLAUSE|Clause)\s|\d+\.\s+[A-Z]{3,})" ,
+        r"\n\s*\n" ,
+        r"\n(?=\s*(?:\d+(?:\.\d+)+|\([a-zA-Z0-9]{1,4}\))\s)" ,
+        r"\n" ,
+        r"(?<=[.;:])\s+" ,
+        r"\s+" ,
+        ""
+    ]
+
+    def __init__(self , llm , chunk_size : int | None = None , chunk_overlap : int | None = None , rate_limiter = None) :
+        '''chunk_size and chunk_overlap are measured in (estimated) tokens, defaults come from the settings.'''
         self.llm = llm
-        self.chunk_size = chunk_size
-        self.chunk_overlap = chunk_overlap
+        self.settings = get_settings()
+        self.chunk_size = chunk_size or self.settings.SUMMARY_CHUNK_TOKENS
+        self.chunk_overlap = self.settings.SUMMARY_CHUNK_OVERLAP_TOKENS if chunk_overlap is None else chunk_overlap
+        self.rate_limiter = rate_limiter or get_llm_rate_limiter()
 
     def validate_docs(self , documents : list[Document]) -> None :
         '''Checks if the incoming documents are valid.'''
@@ -53,22 +90,104 @@ class BaseSummarizer(ABC) :
             raise ValueError("No documents provided for summarization.")
         
         
-    def split_docs(self , documents : list[Document]) -> list[Document] :
-        """Splits the incoming documents into smaller chunks."""
-        self.validate_docs(documents)
+    def get_splitter(self) -> RecursiveCharacterTextSplitter :
+        '''Token-budget splitter preferring section / clause boundaries.'''
+
+        return RecursiveCharacterTextSplitter(
+            chunk_size = self.chunk_size ,
+            chunk_overlap = self.chunk_overlap ,
+            length_function = DocumentAnalyser.estimate_tokens ,
+            separators = self.SEPARATORS ,
+            is_separator_regex = True ,
+            keep_separator = "start"
+        )
+
+
+    def iter_chunks(self , pages : Iterable[Document]) -> Iterator[Document] :
+        """
+        Splits the pages into chunks packed close to the token budget (chunk_size), yielded while the pages are still being extracted.
+        Boundaries prefer section / clause breaks (SEPARATORS).
+        Text is buffered until it holds at least two chunks ; every complete chunk is yielded and the last
+        (possibly incomplete) one is kept as the start of the buffer, so chunks are still packed across page breaks.
+        """
+
+        splitter = self.get_splitter()
+        buffer = ""
+        metadata = None
+
+        for page in pages :
+            if metadata is None :
+                metadata = {"source" : page.metadata.get("source")} if page.metadata.get("source") else {}
+
+            buffer = f"{buffer}\n\n{page.page_content}" if buffer else page.page_content
+
+            if DocumentAnalyser.estimate_tokens(buffer) < 2 * self.chunk_size :
+                continue
+
+            texts = splitter.split_text(buffer)
+
+            for text in texts[:-1] :
+                yield Document(page_content = text , metadata = metadata)
+
+            buffer = texts[-1] if texts else ""
+
+        if buffer.strip() :
+            for text in splitter.split_text(buffer) :
+                yield Document(page_content = text , metadata = metadata)
+
+
+    def invoke_llm(self , chain , inputs : dict , text : str , on_token = None) :
+        '''
+        Invokes a chain under the shared rate limiter (request + estimated token budget)
+        and retries it with jittered backoff when the provider answers 429.
+        With on_token, the output is streamed and every token is passed to the callback as it is generated.
+        '''
+
+        estimated_tokens = (len(text) // DocumentAnalyser.CHARS_PER_TOKEN) + self.PROMPT_OVERHEAD_TOKENS + self.EXPECTED_OUTPUT_TOKENS
+
+        def call() :
+            self.rate_limiter.acquire(estimated_tokens)
+            return chain.invoke(inputs)
+
+        def call_streaming() :
+            self.rate_limiter.acquire(estimated_tokens)
+            parts = []
+
+            try :
+                for token in chain.stream(inputs) :
+                    parts.append(token)
+                    on_token(token)
+
+            except Exception as e :
+                '''Tokens were already sent to the client : a retry would duplicate them, so fail instead'''
+                if parts :
+                    raise RuntimeError(f"Stream interrupted after {len(parts)} tokens ({type(e).__name__})") from e
+                raise
+
+            return "".join(parts)
+
+        return call_with_retry(
+            call if on_token is None else call_streaming ,
+            max_retries = self.settings.LLM_MAX_RETRIES ,
+            base_delay = self.settings.LLM_RETRY_BASE_DELAY ,
+            max_delay = self.settings.LLM_RETRY_MAX_DELAY
+        )
+
+
+    @staticmethod
+    def token_callback(on_event : EventCallback | None) :
+        '''Turns the progress callback into a token callback (None when not streaming).'''
+
+        if on_event is None :
+            return None
+
+        return lambda token : on_event("token" , {"text" : token})
+
 
-        try : 
-            splitter = RecursiveCharacterTextSplitter(
-                chunk_size = self.chunk_size , 
-                chunk_overlap = self.chunk_overlap
-            )
-            return splitter.split_documents(documents)
-        except Exception as e:
-            raise RuntimeError(f"Error splitting documents: {e}")
-        
     @abstractmethod
-    def summarize(self , documents : list[Document]) :
-        """Each summarizer (MapReduce, Stuff) will implement this."""
+    def summarize(self , documents : list[Document] , language : str = "English" , on_event : EventCallback | None = None) :
+        """Each summarizer (MapReduce, Stuff) will implement this.
+        on_event (optional) receives the progress events and the tokens of the final summary."""
         pass
 
 
@@ -76,31 +195,31 @@ class BaseSummarizer(ABC) :
 
 class StuffSummariser(BaseSummarizer) :
     '''
-    Summarizer class for smaller documents using the 'stuff' chain type.
+    Summarizer class for smaller documents using the 'stuff' chain type
+    (the whole document is placed in a single prompt).
     '''
 
-    def summarize(self , documents : list[Document] , language : str = "English") -> str:
+    def __init__(self , llm , chunk_size : int | None = None , chunk_overlap : int | None = None , rate_limiter = None) :
+        super().__init__(llm , chunk_size , chunk_overlap , rate_limiter)
+        self.chain = PromptManager.get_stuff_prompt() | route_model(self.llm , "stuff") | StrOutputParser()
+
+
+    def summarize(self , documents : list[Document] , language : str = "English" , on_event : EventCallback | None = None) -> str:
         """Summarizes the given documents using the 'stuff' approach."""
         self.validate_docs(documents)
 
         try : 
 
-            chain = load_summarize_chain(
-                llm = self.llm ,
-                chain_type = "stuff" ,
-                prompt = PromptManager.get_stuff_prompt()
-            )
+            text = "\n\n".join(doc.page_content for doc in documents)
 
-            summary = chain.invoke({
-                    "input_documents" : documents ,
-                    "language" : language
-            })
+            emit(on_event , "reduce_started" , chain_type = "stuff")
 
-            if isinstance(summary , dict) and "output_text" in summary :
-                return summary["output_text"]
-            
-            else :
-                return str(summary)
+            return self.invoke_llm(
+                self.chain ,
+                {"text" : text , "language" : language} ,
+                text = text ,
+                on_token = self.token_callback(on_event)
+            )
             
         except Exception as e:
             raise RuntimeError(f"Error during summarization using stuff chain : {e}")
@@ -114,66 +233,215 @@ class MapReduceSummarizer(BaseSummarizer) :
     Document summarizer using MapReduce chain strategy. 
     How MapReduce Works:
     1. MAP Phase: Document is split into chunks, each chunk is summarized separately
-    2. REDUCE Phase: All chunk summaries are combined into one final summary
+       (up to max_concurrency calls in parallel, under the shared rate limiter)
+    2. REDUCE Phase: All chunk summaries are combined (in document order) into one final summary.
+       When they do not fit the reduce token budget, they are first collapsed level by level (tree reduce) :
+       grouped into batches that fit the budget and each batch condensed in parallel, until one final reduce fits.
     '''
 
-    def summarize(self, documents : list[Document] , language : str = "English") -> str :
+    def __init__(self , llm , chunk_size : int | None = None , chunk_overlap : int | None = None , rate_limiter = None , max_concurrency : int | None = None) :
+        super().__init__(llm , chunk_size , chunk_overlap , rate_limiter)
+        self.max_concurrency = max_concurrency or self.settings.SUMMARY_MAP_CONCURRENCY
+
+        '''with an LLMRouter , the map and reduce (collapse) calls are routed separately'''
+        self.map_chain = PromptManager.get_map_prompt() | route_model(self.llm , "map") | StrOutputParser()
+        self.reduce_chain = PromptManager.get_reduce_prompt() | route_model(self.llm , "reduce") | StrOutputParser()
+        self.collapse_chain = PromptManager.get_collapse_prompt() | route_model(self.llm , "reduce") | StrOutputParser()
+        self.reduce_token_budget = self.settings.SUMMARY_REDUCE_TOKENS
+
+
+    def map_stream(self , chunks : Iterable[Document] , language : str = "English" , on_event : EventCallback | None = None) -> list[str] :
+        '''
+        Summarizes every chunk concurrently, as soon as it is available (chunks can be produced while the document
+        is still being extracted). Partial summaries are returned in the order of the chunks.
+        The map events report the chunks known so far as total.
+        '''
+
+        lock = threading.Lock()
+        progress = {"completed" : 0}
+        futures = []
+
+        def summarize_chunk(chunk : Document) -> str :
+            summary = self.invoke_llm(
+                self.map_chain ,
+                {"text" : chunk.page_content , "language" : language} ,
+                text = chunk.page_content
+            )
 
-        chunks = self.split_docs(documents)
+            with lock :
+                progress["completed"] += 1
+                emit(on_event , "map" , completed = progress["completed"] , total = len(futures))
+
+            return summary
+
+        with ThreadPoolExecutor(max_workers = self.max_concurrency) as executor :
+            try :
+                for chunk in chunks :
+                    with lock :
+                        if not futures :
+                            emit(on_event , "map_started" , total = None)
+                        futures.append(executor.submit(summarize_chunk , chunk))
+
+            except BaseException :
+                for future in futures :
+                    future.cancel()
+                raise
+
+            return [future.result() for future in futures]
 
-        try : 
 
-            chain = load_summarize_chain(
-                llm = self.llm , 
-                chain_type = "map_reduce" , 
-                map_prompt = PromptManager.get_map_prompt() ,
-                combine_prompt = PromptManager.get_reduce_prompt()
+    def run_parallel(self , func , items : list , on_done = None) -> list :
+        '''Runs func over the items with at most max_concurrency calls in flight.
+        Results keep the order of the items, whatever order the calls finish in.
+        on_done(completed , total) is called every time a call finishes.'''
+
+        results = [None] * len(items)
+
+        with ThreadPoolExecutor(max_workers = max(1 , min(self.max_concurrency , len(items)))) as executor :
+            futures = {executor.submit(func , item) : i for i , item in enumerate(items)}
+
+            for completed , future in enumerate(as_completed(futures) , start = 1) :
+                results[futures[future]] = future.result()
+
+                if on_done is not None :
+                    on_done(completed , len(items))
+
+        return results
+
+
+    def fit_to_budget(self , text : str , max_tokens : int | None = None) -> str :
+        '''Safety net : a single partial summary larger than the reduce budget (or max_tokens) is truncated, so no call can overflow the context.'''
+
+        max_chars = (max_tokens or self.reduce_token_budget) * DocumentAnalyser.CHARS_PER_TOKEN
+
+        return text if len(text) <= max_chars else text[:max_chars]
+
+
+    def group_by_budget(self , summaries : list[str]) -> list[list[str]] :
+        '''Greedily packs consecutive summaries into batches whose total size fits the reduce budget (order is preserved).'''
+
+        batches , current , current_tokens = [] , [] , 0
+
+        for summary in summaries :
+            tokens = DocumentAnalyser.estimate_tokens(summary)
+
+            if current and current_tokens + tokens > self.reduce_token_budget :
+                batches.append(current)
+                current , current_tokens = [] , 0
+
+            current.append(summary)
+            current_tokens += tokens
+
+        if current :
+            batches.append(current)
+
+        '''Batches of 1 would not shrink the level and the tree would never converge -> fall back to pairs,
+        each summary cut to half the budget so that a pair still fits it'''
+        if len(batches) == len(summaries) :
+            half = [self.fit_to_budget(summary , max(1 , self.reduce_token_budget // 2)) for summary in summaries]
+            batches = [half[i : i + 2] for i in range(0 , len(half) , 2)]
+
+        return batches
+
+
+    def collapse(self , summaries : list[str] , language : str = "English") -> list[str] :
+        '''One level of the tree reduce : condenses every batch (in parallel) into a single partial summary.'''
+
+        def collapse_batch(batch : list[str]) -> str :
+            if len(batch) == 1 :
+                return batch[0]
+
+            text = "\n\n".join(batch)
+
+            return self.invoke_llm(
+                self.collapse_chain ,
+                {"text" : text , "language" : language} ,
+                text = text
             )
 
-            summary = chain.invoke({"text" : chunks , "language" : language})
+        return self.run_parallel(collapse_batch , self.group_by_budget(summaries))
 
-            if isinstance(summary , dict) and "output_text" in summary :
-                return summary["output_text"]
-            else :
-                return str(summary)
-            
-        except Exception as e:
-            raise RuntimeError(f"Error during summarization using map_reduce chain : {e}")
 
+    def reduce(self , partial_summaries : list[str] , language : str = "English" , on_event : EventCallback | None = None) -> str :
+        '''Combines the partial summaries into the final summary, collapsing them level by level until they fit the reduce budget.'''
 
-        
+        summaries = [self.fit_to_budget(summary) for summary in partial_summaries]
+        level = 0
 
-class SummarizerFactory :
-    
-    @staticmethod
-    def create_summarizer(llm , documents : list[Document]) -> BaseSummarizer :
-        chain_type = DocumentAnalyser.suggest_chain_type(documents)
-        if chain_type == "stuff" :
-            return StuffSummariser(llm)
-        elif chain_type == "map_reduce" :
-            return MapReduceSummarizer(llm)
-        else :
-            raise ValueError(f"Unknown chain type: {chain_type}")
-        
-    
+        while len(summaries) > 1 and DocumentAnalyser.estimate_tokens("\n\n".join(summaries)) > self.reduce_token_budget :
+            level += 1
+            emit(on_event , "collapse" , level = level , summaries = len(summaries))
+            summaries = [self.fit_to_budget(summary) for summary in self.collapse(summaries , language)]
 
+        emit(on_event , "reduce_started" , chain_type = "map_reduce" , summaries = len(summaries))
 
-def summarize_document(llm , documents : list[Document] , language : str = "English") -> str :
-    '''
-    A convenience function that Summarizes a list of documents using the appropriate summarization strategy.
-    '''
+        text = "\n\n".join(summaries)
 
-    summarizer = SummarizerFactory.create_summarizer(llm , documents) # Returns the summarizer (Mapreduce or Stuff)
-    return summarizer.summarize(documents , language) 
+        return self.invoke_llm(
+            self.reduce_chain ,
+            {"text" : text , "language" : language} ,
+            text = text ,
+            on_token = self.token_callback(on_event)
+        )
 
 
+    def summarize(self , documents : list[Document] , language : str = "English" , on_event : EventCallback | None = None) -> str :
+        '''Summarizes documents that are already extracted (same path as summarize_stream).'''
+        self.validate_docs(documents)
+        return self.summarize_stream(documents , language , on_event)
 
 
+    def summarize_stream(self , pages : Iterable[Document] , language : str = "English" , on_event : EventCallback | None = None) -> str :
+        '''Summarizes pages that are still being extracted : chunks are mapped while the next pages are parsed.'''
 
+        try :
+            partial_summaries = self.map_stream(self.iter_chunks(pages) , language , on_event)
 
+            if not partial_summaries :
+                raise ValueError("No documents provided for summarization.")
 
+            return self.reduce(partial_summaries , language , on_event)
 
+        except Exception as e:
+            raise RuntimeError(f"Error during summarization using map_reduce chain : {e}")
 
 
         
 
+def summarize_pages(llm , pages : Iterable[Document] , language : str = "English" , on_event : EventCallback | None = None) -> tuple[str , str] :
+    '''
+    Summarizes pages yielded while the document is being extracted (DocumentProcessorFactory.lazy_process) with the appropriate strategy.
+    Pages are buffered until the document is known to exceed TOKEN_THRESHOLD : from then on the map phase
+    runs while the remaining pages are extracted. Short documents are summarized with the stuff chain once fully read.
+    Emits "extracted" when the extraction finishes. Returns (summary , chain_type).
+    '''
+
+    pages = iter(pages)
+    head = []
+    tokens = 0
+
+    for page in pages :
+        head.append(page)
+        tokens += DocumentAnalyser.estimate_tokens(page.page_content)
+
+        if tokens > DocumentAnalyser.TOKEN_THRESHOLD :
+            break
+
+    else :
+        emit(on_event , "extracted" , pages = len(head) , tokens = tokens , chain_type = "stuff")
+        return StuffSummariser(llm).summarize(head , language , on_event) , "stuff"
+
+
+    def track_extraction(stream : Iterator[Document]) -> Iterator[Document] :
+        count , total_tokens = len(head) , tokens
+
+        yield from head
+
+        for page in stream :
+            count += 1
+            total_tokens += DocumentAnalyser.estimate_tokens(page.page_content)
+            yield page
+
+        emit(on_event , "extracted" , pages = count , tokens = total_tokens , chain_type = "map_reduce")
+
+    return MapReduceSummarizer(llm).summarize_stream(track_extraction(pages) , language , on_event) , "map_reduce"
@@ -0,0 +1,92 @@
+import os
+from functools import lru_cache
+
+from core.cache import LRUCache, SQLiteCache, TieredCache
+from core.config import get_settings
+from core.hashing import make_key
+from src.summarizer import DocumentAnalyser
+
+
+def get_model_id(llm) -> str :
+    """Returns a stable identifier of the chat model (ChatGroq -> model_name, Gemini -> model)."""
+
+    for attr in ("model_name" , "model") :
+        value = getattr(llm , attr , None)
+        if isinstance(value , str) and value :
+            return value
+
+    return type(llm).__name__
+
+
+
+
+class SummaryCache :
+    '''
+    Content-addressed cache of final summaries.
+    A summary is identified by the hash of the uploaded file bytes, the output language,
+    the model id and the chain type chosen by DocumentAnalyser.suggest_chain_type,
+    so a change of any of them produces a new entry instead of a stale hit.
+    '''
+
+    def __init__(self , cache : TieredCache) :
+        self.cache = cache
+
+
+    @staticmethod
+    def build_key(doc_hash : str , language : str , model_id : str , chain_type : str) -> str :
+        return make_key("summary" , doc_hash , language , model_id , chain_type)
+
+
+    def get_chain_type(self , doc_hash : str) :
+        '''Chain type previously chosen for this document, so a repeat upload can be served without re-extracting it.'''
+        return self.cache.get(make_key("chain_type" , doc_hash , DocumentAnalyser.TOKEN_THRESHOLD) , count = False)
+
+
+    def set_chain_type(self , doc_hash : str , chain_type : str) -> None :
+        self.cache.set(make_key("chain_type" , doc_hash , DocumentAnalyser.TOKEN_THRESHOLD) , chain_type)
+
+
+    def get(self , doc_hash : str , language : str , model_id : str , chain_type : str | None) :
+        '''Cached summary , None on a miss (always a miss when no chain type is known : the document was never summarized).'''
+
+        if chain_type is None :
+            self.cache.record_miss()
+            return None
+
+        return self.cache.get(SummaryCache.build_key(doc_hash , language , model_id , chain_type))
+
+
+    def set(self , doc_hash : str , language : str , model_id : str , chain_type : str , summary : str) -> None :
+        self.cache.set(SummaryCache.build_key(doc_hash , language , model_id , chain_type) , summary)
+
+
+    def stats(self) -> dict :
+        return self.cache.stats()
+
+
+
+
+"""
+Single shared SummaryCache (memory LRU + optional SQLite tier under CACHE_DIR).
+"""
+
+@lru_cache
+def get_summary_cache() -> SummaryCache :
+    settings = get_settings()
+    ttl = settings.SUMMARY_CACHE_TTL_SECONDS
+
+    disk = None
+    if settings.SUMMARY_CACHE_DISK_ENABLED :
+        disk = SQLiteCache(
+            path = os.path.join(settings.CACHE_DIR , "summaries.sqlite3") ,
+            max_bytes = settings.SUMMARY_CACHE_DISK_MAX_MB * 1024 * 1024 ,
+            ttl = ttl ,
+            compress = True
+        )
+
+    return SummaryCache(
+        TieredCache(
+            memory = LRUCache(max_entries = settings.SUMMARY_CACHE_MAX_ENTRIES , ttl = ttl) ,
+            disk = disk
+        )
+    )
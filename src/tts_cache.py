@@ -0,0 +1,71 @@
+import os
+import unicodedata
+from functools import lru_cache
+from typing import Optional
+
+from core.cache import LRUCache, SQLiteCache, TieredCache
+from core.config import get_settings
+from core.hashing import hash_text, make_key
+
+
+def normalize_tts_text(text : str) -> str :
+    """Unicode NFC , whitespace collapsed : texts that are spoken the same way share an entry (case and punctuation are kept, they change the prosody)."""
+    return " ".join(unicodedata.normalize("NFC" , text).split())
+
+
+
+
+class TTSCache :
+    '''
+    Cache of synthesized audio (one entry per TTS segment).
+    An entry is identified by the hash of the normalized text, the language and the voice / TTS model,
+    so the same summary spoken again (cached summary , repeated document , replay) makes no TTS call.
+    '''
+
+    def __init__(self , cache : TieredCache) :
+        self.cache = cache
+
+
+    @staticmethod
+    def build_key(text : str , language : str , voice : str) -> str :
+        return make_key("tts" , hash_text(normalize_tts_text(text)) , language , voice)
+
+
+    def get(self , text : str , language : str , voice : str) -> Optional[bytes] :
+        return self.cache.get(TTSCache.build_key(text , language , voice))
+
+
+    def set(self , text : str , language : str , voice : str , audio : bytes) -> None :
+        self.cache.set(TTSCache.build_key(text , language , voice) , audio)
+
+
+    def stats(self) -> dict :
+        return self.cache.stats()
+
+
+
+
+"""
+Single shared TTSCache (small memory LRU + size bounded SQLite tier under CACHE_DIR).
+"""
+
+@lru_cache
+def get_tts_cache() -> TTSCache :
+    settings = get_settings()
+    ttl = settings.TTS_CACHE_TTL_SECONDS
+
+    disk = None
+    if settings.TTS_CACHE_DISK_ENABLED :
+        disk = SQLiteCache(
+            path = os.path.join(settings.CACHE_DIR , "tts.sqlite3") ,
+            max_bytes = settings.TTS_CACHE_DISK_MAX_MB * 1024 * 1024 ,
+            ttl = ttl ,
+            compress = settings.TTS_CACHE_COMPRESS
+        )
+
+    return TTSCache(
+        TieredCache(
+            memory = LRUCache(max_entries = settings.TTS_CACHE_MAX_ENTRIES , ttl = ttl) ,
+            disk = disk
+        )
+    )
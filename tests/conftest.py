@@ -0,0 +1,51 @@
+"""
+Shared test setup : every on-disk store points to a temporary directory, the provider keys are dummies
+and the LLM / embedding providers are replaced by local fakes (no network call is made).
+"""
+
+import os
+import tempfile
+
+TEST_DIR = tempfile.mkdtemp(prefix = "lawlens-tests-")
+
+'''set before the app modules are imported : get_settings() is cached on first use'''
+os.environ.update({
+    "GROQ_API_KEY" : "test" ,
+    "GOOGLE_API_KEY" : "test" ,
+    "LANGCHAIN_TRACING_V2" : "false" ,
+    "PROVIDERS_WARMUP" : "false" ,
+    "LLM_TOKENS_PER_MINUTE" : "10000000" ,
+    "CACHE_DIR" : os.path.join(TEST_DIR , "cache") ,
+    "CHROMA_PERSIST_DIR" : os.path.join(TEST_DIR , "chroma_db") ,
+    "AUDIO_DIR" : os.path.join(TEST_DIR , "audio") ,
+    "JOBS_DIR" : os.path.join(TEST_DIR , "jobs")
+})
+
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from core.cache import LRUCache, TieredCache
+from core.providers import get_provider_registry
+from rag.embedder import CachedEmbeddings, Embedder
+
+
+def fake_embedder() -> CachedEmbeddings :
+    return CachedEmbeddings(DeterministicFakeEmbedding(size = 64) , Embedder.get_model_tag() , TieredCache(memory = LRUCache(max_entries = 1024)))
+
+
+@pytest.fixture
+def register_provider() :
+    '''Registers a fake under a provider name for the test , the real factory is restored afterwards.'''
+
+    registry = get_provider_registry()
+    replaced = {}
+
+    def register(name : str , factory) -> None :
+        replaced.setdefault(name , registry._factories.get(name))
+        registry.register(name , factory)
+
+    yield register
+
+    for name , factory in replaced.items() :
+        if factory is not None :
+            registry.register(name , factory)
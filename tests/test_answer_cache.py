@@ -0,0 +1,36 @@
+import random
+
+from rag.answer_cache import AnswerCache
+
+
+def vector(seed : int , dim : int = 64) -> list[float] :
+    rng = random.Random(seed)
+    return [rng.uniform(-1 , 1) for _ in range(dim)]
+
+
+def test_exact_and_semantic_hits_stay_in_their_scope() :
+    cache = AnswerCache(max_entries = 16 , ttl = 60 , similarity_threshold = 0.9)
+    cache.set("scope-a" , "What is the notice period?" , "three months" , [] , vector(1))
+
+    assert cache.get("scope-a" , "what is the NOTICE period") == ("three months" , [])
+
+    near = [x + 0.01 for x in vector(1)]
+    assert cache.get("scope-a" , "How long is the notice?" , near) == ("three months" , [])
+    assert cache.get("scope-b" , "How long is the notice?" , near) is None
+    assert cache.get("scope-a" , "Who pays the deposit?" , vector(2)) is None
+
+
+def test_vectors_are_bounded_per_scope_and_overall() :
+    cache = AnswerCache(max_entries = 4 , ttl = 60 , similarity_threshold = 0.99 , max_per_scope = 2)
+
+    for i in range(3) :
+        cache.set("scope-a" , f"question {i}" , f"answer {i}" , [] , vector(i))
+
+    assert cache.get("scope-a" , "rephrased 0" , vector(0)) is None
+    assert cache.get("scope-a" , "rephrased 2" , vector(2)) == ("answer 2" , [])
+
+    for i in range(3 , 6) :
+        cache.set("scope-b" , f"question {i}" , f"answer {i}" , [] , vector(i))
+
+    assert cache._vector_count <= 4
+    assert cache.get("scope-b" , "rephrased 5" , vector(5)) == ("answer 5" , [])
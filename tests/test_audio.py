@@ -0,0 +1,41 @@
+import io
+import wave
+from array import array
+
+import pytest
+
+from src.audio import concat_wav
+
+
+def wav_bytes(frames : bytes , sample_rate : int , channels : int = 1) -> bytes :
+    buffer = io.BytesIO()
+    with wave.open(buffer , "wb") as wav :
+        wav.setnchannels(channels)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(frames)
+    return buffer.getvalue()
+
+
+def ramp(count : int) -> bytes :
+    return array("h" , range(count)).tobytes()
+
+
+def test_concat_wav_keeps_the_first_format_and_adds_the_pauses() :
+    '''0.1 s of raw 24 kHz PCM + 0.1 s of 48 kHz WAV (resampled) , 0.1 s pause in between'''
+
+    audio = concat_wav([ramp(2400) , wav_bytes(ramp(4800) , 48000)] , pause_ms = 100)
+
+    with wave.open(io.BytesIO(audio) , "rb") as wav :
+        assert (wav.getframerate() , wav.getsampwidth() , wav.getnchannels()) == (24000 , 2 , 1)
+        assert wav.getnframes() == 2400 + 2400 + 2400
+        samples = array("h" , wav.readframes(wav.getnframes()))
+
+    assert samples[:2400] == array("h" , range(2400))
+    assert not any(samples[2400:4800])
+    assert samples[4800] == 0 and samples[-1] == 4799
+
+
+def test_concat_wav_rejects_a_different_channel_count() :
+    with pytest.raises(ValueError) :
+        concat_wav([wav_bytes(ramp(200) , 24000) , wav_bytes(ramp(200) , 24000 , channels = 2)])
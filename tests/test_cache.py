@@ -0,0 +1,26 @@
+import time
+
+from core.cache import LRUCache, SQLiteCache, TieredCache
+
+
+def test_get_many_reads_memory_then_disk_and_promotes_disk_hits(tmp_path) :
+    disk = SQLiteCache(str(tmp_path / "cache.sqlite3"))
+    cache = TieredCache(memory = LRUCache(max_entries = 10) , disk = disk)
+
+    cache.set("a" , 1)
+    disk.set("b" , 2)
+
+    assert cache.get_many(["a" , "b" , "c" , "a"]) == {"a" : 1 , "b" : 2}
+    assert cache.memory.get("b") == 2
+    assert cache.stats()["memory_hits"] == 1 and cache.stats()["disk_hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_get_many_skips_expired_entries(tmp_path) :
+    disk = SQLiteCache(str(tmp_path / "cache.sqlite3") , ttl = 0.05)
+    disk.set_many({f"k{i}" : i for i in range(600)})
+
+    assert len(disk.get_many([f"k{i}" for i in range(600)])) == 600
+
+    time.sleep(0.1)
+    assert disk.get_many(["k1"]) == {}
+    assert len(disk) == 599
@@ -0,0 +1,37 @@
+import io
+
+import pytest
+from pypdf import PdfWriter
+
+from src.document_processor import DocumentProcessorFactory, PDFProcessor, extract_pdf_pages
+
+
+@pytest.mark.parametrize("head , expected" , [
+    (b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n" , "pdf") ,
+    (b"\xef\xbb\xbf  \n%PDF-1.4\n" , "pdf") ,
+    (b"\x00\x00junk\x01%PDF-1.4\n" , "pdf") ,
+    (b"This contract was exported to the %PDF- format by the clerk." , "txt") ,
+    ("Résumé : see the %PDF-1.4 attachment".encode("utf-8") , "txt")
+])
+def test_pdf_is_detected_only_from_a_leading_header(head , expected) :
+    assert DocumentProcessorFactory.detect_type(head) == expected
+
+
+@pytest.fixture
+def pdf_bytes() :
+    writer = PdfWriter()
+    for _ in range(5) :
+        writer.add_blank_page(width = 200 , height = 200)
+    writer.set_page_label(0 , 1 , style = "/r")
+    writer.set_page_label(2 , 4 , style = "/D" , start = 1)
+
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def test_pdf_pages_keep_their_page_labels(pdf_bytes) :
+    labels = ["i" , "ii" , "1" , "2" , "3"]
+
+    assert [doc.metadata["page_label"] for doc in PDFProcessor(pdf_bytes).lazy_extract()] == labels
+    assert [doc.metadata["page_label"] for doc in extract_pdf_pages(pdf_bytes , "upload" , 1 , 4)] == labels[1:4]
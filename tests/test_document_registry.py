@@ -0,0 +1,34 @@
+import sqlite3
+
+from rag.document_registry import DocumentRegistry
+
+
+def test_collections_keep_their_own_documents(tmp_path) :
+    path = str(tmp_path / "registry.sqlite3")
+    gemini = DocumentRegistry(path , "gemini-embedding-001" , "lawlens_documents")
+    local = DocumentRegistry(path , "all-MiniLM-L6-v2" , "lawlens_documents_minilm")
+
+    gemini.add("doc-1" , "lease.pdf" , 12)
+    local.add("doc-1" , "lease.pdf" , 15)
+
+    assert gemini.get("doc-1")["chunks"] == 12
+    assert local.get("doc-1")["chunks"] == 15
+    assert gemini.count() == local.count() == 1
+
+
+def test_unscoped_registry_is_migrated_to_the_configured_collection(tmp_path) :
+    path = str(tmp_path / "registry.sqlite3")
+
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE documents (doc_id TEXT PRIMARY KEY , filename TEXT , chunks INTEGER NOT NULL , ingested_at REAL NOT NULL , embedding_model TEXT)")
+    conn.execute("INSERT INTO documents VALUES ('doc-1' , 'lease.pdf' , 12 , 1.0 , 'gemini-embedding-001')")
+    conn.execute("CREATE TABLE ingests (doc_id TEXT NOT NULL , embedding_model TEXT NOT NULL , filename TEXT , committed_batches INTEGER NOT NULL , total_batches INTEGER NOT NULL , updated_at REAL NOT NULL)")
+    conn.commit()
+    conn.close()
+
+    registry = DocumentRegistry(path , "gemini-embedding-001" , "lawlens_documents")
+
+    assert registry.get("doc-1")["chunks"] == 12
+    assert DocumentRegistry(path , "gemini-embedding-001" , "other").get("doc-1") is None
+    registry.set_progress("doc-2" , "nda.pdf" , 1 , 3)
+    assert [row["doc_id"] for row in registry.list_ingests()] == ["doc-2"]
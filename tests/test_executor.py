@@ -0,0 +1,43 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from core.executor import WorkerPool
+
+
+@pytest.fixture
+def pool() :
+    pool = WorkerPool(max_workers = 2 , max_queue = 1 , limits = {"summarize" : 2 , "rag_ask" : 2})
+    yield pool
+    pool.shutdown()
+
+
+def test_saturated_endpoint_and_full_pool_are_rejected_until_a_slot_is_released(pool) :
+    release = threading.Event()
+
+    async def scenario() :
+        summaries = [pool.submit("summarize" , release.wait , 5) for _ in range(2)]
+
+        with pytest.raises(HTTPException) as rejected :
+            pool.submit("summarize" , release.wait , 5)
+        assert rejected.value.status_code == 429
+        assert rejected.value.headers["Retry-After"]
+
+        question = pool.submit("rag_ask" , release.wait , 5)
+
+        with pytest.raises(HTTPException) as rejected :
+            pool.submit("rag_ask" , release.wait , 5)
+        assert rejected.value.status_code == 503
+        assert rejected.value.headers["Retry-After"]
+
+        assert pool.stats()["rejected"] == {"summarize" : 1 , "rag_ask" : 1}
+
+        release.set()
+        await asyncio.gather(*summaries , question)
+
+        assert pool.stats()["pending"] == 0
+        assert await pool.run("rag_ask" , lambda : "answered") == "answered"
+
+    asyncio.run(scenario())
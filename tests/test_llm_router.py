@@ -0,0 +1,147 @@
+import time
+from typing import Any, Iterator, Optional
+
+import pytest
+from langchain_core.language_models import BaseChatModel, FakeListChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from core.llm_router import LLMRouter
+
+
+class ScriptedChatModel(BaseChatModel) :
+    '''Local fake : answers reply after delay seconds , or raises error (a stream raises it after fail_after tokens).'''
+
+    reply : str = "ok"
+    delay : float = 0.0
+    error : Optional[Exception] = None
+    fail_after : int = 0
+    calls : int = 0
+
+    @property
+    def _llm_type(self) -> str :
+        return "scripted"
+
+
+    def _generate(self , messages , stop = None , run_manager = None , **kwargs : Any) -> ChatResult :
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.error is not None :
+            raise self.error
+        return ChatResult(generations = [ChatGeneration(message = AIMessage(content = self.reply))])
+
+
+    def _stream(self , messages , stop = None , run_manager = None , **kwargs : Any) -> Iterator[ChatGenerationChunk] :
+        self.calls += 1
+        for i , token in enumerate(self.reply.split(" ")) :
+            if self.error is not None and i >= self.fail_after :
+                raise self.error
+            yield ChatGenerationChunk(message = AIMessageChunk(content = token + " "))
+        if self.error is not None :
+            raise self.error
+
+
+MESSAGES = [HumanMessage(content = "Summarize the lease.")]
+
+
+def make_router(models : dict[str , BaseChatModel] , **options) -> LLMRouter :
+    return LLMRouter(routes = {"default" : [(name , lambda model = model : model) for name , model in models.items()]} , **options)
+
+
+def test_falls_back_to_the_next_model_when_a_call_fails() :
+    primary = ScriptedChatModel(error = ConnectionError("provider down"))
+    router = make_router({"groq:a" : primary , "gemini:b" : FakeListChatModel(responses = ["from b"])})
+
+    assert router.invoke("map" , MESSAGES).content == "from b"
+    assert primary.calls == 1
+    assert router.stats()["fallbacks"] == 1
+    assert router.stats()["models"]["groq:a"]["error_rate"] == 1.0
+
+
+def test_rate_limited_model_cools_down_and_is_tried_last() :
+    router = make_router({"groq:a" : ScriptedChatModel(error = RuntimeError("429 rate limit")) , "gemini:b" : ScriptedChatModel(reply = "b")})
+
+    router.invoke("map" , MESSAGES)
+
+    assert [c.name for c in router.order("map")] == ["gemini:b" , "groq:a"]
+
+
+def test_latency_strategy_prefers_the_fastest_model() :
+    slow , fast = ScriptedChatModel(reply = "slow" , delay = 0.03) , ScriptedChatModel(reply = "fast")
+    router = make_router({"groq:slow" : slow , "gemini:fast" : fast} , strategy = "latency" , min_samples = 2)
+
+    '''until min_samples calls are known , the configured order is kept'''
+    for candidate in router.route("map") :
+        for _ in range(2) :
+            router._call(candidate , MESSAGES)
+
+    assert [c.name for c in router.order("map")] == ["gemini:fast" , "groq:slow"]
+    assert router.invoke("map" , MESSAGES).content == "fast"
+
+
+def test_stream_falls_back_before_the_first_token() :
+    router = make_router({"groq:a" : ScriptedChatModel(error = ConnectionError("down")) , "gemini:b" : ScriptedChatModel(reply = "from b")})
+
+    assert "".join(chunk.content for chunk in router.stream("rag_answer" , MESSAGES)).strip() == "from b"
+
+
+def test_stream_does_not_switch_models_after_the_first_token() :
+    fallback = ScriptedChatModel(reply = "from b")
+    router = make_router({"groq:a" : ScriptedChatModel(reply = "one two three" , error = ConnectionError("dropped") , fail_after = 1) , "gemini:b" : fallback})
+
+    tokens = []
+    with pytest.raises(ConnectionError) :
+        for chunk in router.stream("rag_answer" , MESSAGES) :
+            tokens.append(chunk.content)
+
+    assert tokens == ["one "]
+    assert fallback.calls == 0
+
+
+def test_routed_chat_model_works_in_chains() :
+    router = make_router({"groq:a" : FakeListChatModel(responses = ["routed"])})
+
+    assert router.for_task("stuff").invoke("hello").content == "routed"
+    assert router.model_name == "a"
+
+
+def test_hedge_returns_the_first_answer() :
+    router = make_router(
+        {"groq:slow" : ScriptedChatModel(reply = "slow" , delay = 0.5) , "gemini:fast" : ScriptedChatModel(reply = "fast")} ,
+        hedge = True , hedge_delay = 0.05
+    )
+
+    started = time.perf_counter()
+    assert router.invoke("map" , MESSAGES).content == "fast"
+    assert time.perf_counter() - started < 0.4
+    assert router.stats()["hedges"] == 1
+
+
+class CountingLimiter :
+    def __init__(self) :
+        self.acquired = []
+
+    def acquire(self , tokens : int = 0) -> None :
+        self.acquired.append(tokens)
+
+
+def test_hedge_timer_starts_when_the_call_starts_and_hedges_take_a_limiter_slot() :
+    limiter = CountingLimiter()
+    router = make_router(
+        {"groq:a" : ScriptedChatModel(reply = "a" , delay = 0.05) , "gemini:b" : ScriptedChatModel(reply = "b" , delay = 0.3)} ,
+        hedge = True , hedge_delay = 0.15 , max_hedge_workers = 1 , rate_limiter = limiter
+    )
+
+    '''the only pool worker is busy : the call queues for longer than hedge_delay but is fast once started'''
+    router._pool.submit(time.sleep , 0.25)
+    assert router.invoke("map" , MESSAGES).content == "a"
+    assert router.stats()["hedges"] == 0
+    assert limiter.acquired == []
+
+    router = make_router(
+        {"groq:a" : ScriptedChatModel(reply = "a" , delay = 0.5) , "gemini:b" : ScriptedChatModel(reply = "b")} ,
+        hedge = True , hedge_delay = 0.05 , rate_limiter = limiter
+    )
+    assert router.invoke("map" , MESSAGES).content == "b"
+    assert router.stats()["hedges"] == 1
+    assert len(limiter.acquired) == 1
@@ -0,0 +1,110 @@
+import pytest
+from fastapi.testclient import TestClient
+from langchain_core.language_models import FakeListChatModel
+
+import main
+from conftest import fake_embedder
+from pipelines.rag_pipeline import get_rag_pipeline
+from rag.retriever import RetrieverBuilder
+
+
+CONTRACT = b"""Lease agreement between the landlord and the tenant.
+The tenant pays a monthly rent of 1200 euros before the fifth day of each month.
+Either party may terminate the lease with three months written notice.
+The deposit is returned within thirty days after the keys are handed back."""
+
+
+@pytest.fixture
+def client(register_provider) :
+    register_provider("llm" , lambda : FakeListChatModel(responses = ["The notice period is three months."]))
+    register_provider("embeddings" , fake_embedder)
+    get_rag_pipeline.cache_clear()
+
+    '''no lifespan : it would shut the shared worker pool down after the first test'''
+    yield TestClient(main.app)
+
+    get_rag_pipeline.cache_clear()
+
+
+@pytest.fixture
+def retrievals(monkeypatch) :
+    '''Counts the calls of the hybrid search behind every RAG retrieval.'''
+
+    calls = []
+    hybrid_search = RetrieverBuilder.hybrid_search
+
+    def counting_hybrid_search(*args , **kwargs) :
+        calls.append(args[2] if len(args) > 2 else kwargs.get("query"))
+        return hybrid_search(*args , **kwargs)
+
+    monkeypatch.setattr(RetrieverBuilder , "hybrid_search" , staticmethod(counting_hybrid_search))
+    return calls
+
+
+def test_ask_retrieves_once_per_question(client , retrievals) :
+    response = client.post("/rag/index" , files = {"file" : ("lease.txt" , CONTRACT , "text/plain")})
+    assert response.status_code == 200 , response.text
+    document_id = response.json()["document_id"]
+
+    response = client.post("/rag/ask" , json = {"query" : "What is the notice period to terminate the lease?" , "document_ids" : [document_id]})
+
+    assert response.status_code == 200 , response.text
+    assert response.json()["answer"] == "The notice period is three months."
+    assert response.json()["sources"]
+    assert retrievals == ["What is the notice period to terminate the lease?"]
+
+
+def test_ask_goes_to_keyword_search_when_the_query_embedding_fails(client , retrievals , monkeypatch) :
+    response = client.post("/rag/index" , files = {"file" : ("lease.txt" , CONTRACT , "text/plain")})
+    assert response.status_code == 200 , response.text
+
+    embedder = main.Embedder.get_embedder()
+    calls = []
+
+    def failing_embed_query(text) :
+        calls.append(text)
+        raise TimeoutError("embedding API timed out")
+
+    monkeypatch.setattr(embedder , "embed_query" , failing_embed_query)
+
+    response = client.post("/rag/ask" , json = {"query" : "When is the deposit returned?"})
+
+    assert response.status_code == 200 , response.text
+    assert response.json()["sources"]
+    assert len(calls) == 1
+    assert len(retrievals) == 1
+
+
+def test_ask_does_not_embed_a_repeated_question(client , retrievals , monkeypatch) :
+    response = client.post("/rag/index" , files = {"file" : ("lease.txt" , CONTRACT , "text/plain")})
+    assert response.status_code == 200 , response.text
+
+    question = {"query" : "How much is the monthly rent?"}
+    first = client.post("/rag/ask" , json = question)
+    assert first.status_code == 200 , first.text
+
+    embedder = main.Embedder.get_embedder()
+    calls = []
+    embed_query = embedder.embed_query
+
+    def counting_embed_query(text) :
+        calls.append(text)
+        return embed_query(text)
+
+    monkeypatch.setattr(embedder , "embed_query" , counting_embed_query)
+
+    second = client.post("/rag/ask" , json = {"query" : "  how much is the MONTHLY rent? "})
+
+    assert second.status_code == 200 , second.text
+    assert second.json()["answer"] == first.json()["answer"]
+    assert calls == []
+    assert len(retrievals) == 1
+
+
+def test_health_with_a_plain_chat_model(client) :
+    main.get_llm()
+
+    response = client.get("/health")
+
+    assert response.status_code == 200 , response.text
+    assert response.json()["llm_router"] is None
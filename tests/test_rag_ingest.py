@@ -0,0 +1,34 @@
+import threading
+
+import pytest
+from langchain_core.documents import Document
+from langchain_core.language_models import FakeListChatModel
+
+from conftest import fake_embedder
+from core.config import get_settings
+from pipelines.rag_pipeline import RagPipeline
+from rag.vector_store import VectorStore
+
+
+def test_failed_ingest_reports_the_real_error_not_the_cancelled_batches(register_provider , monkeypatch) :
+    register_provider("embeddings" , fake_embedder)
+    monkeypatch.setattr(get_settings() , "INGEST_BATCH_SIZE" , 1)
+    monkeypatch.setattr(get_settings() , "INGEST_MAX_CONCURRENCY" , 2)
+
+    release = threading.Event()
+
+    def add_document(vectorstore , batch , doc_id , start) :
+        if start == 0 :
+            raise ValueError("chunk 0 rejected by the embedding API")
+        release.wait(1)
+
+    monkeypatch.setattr(VectorStore , "add_document" , staticmethod(add_document))
+
+    pipeline = RagPipeline(FakeListChatModel(responses = ["ok"]))
+    chunks = [Document(page_content = f"clause {i}") for i in range(10)]
+
+    with pytest.raises(RuntimeError) as error :
+        pipeline.index_chunks(chunks , "doc-failing")
+
+    release.set()
+    assert "chunk 0 rejected by the embedding API" in str(error.value)
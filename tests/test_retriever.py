@@ -0,0 +1,49 @@
+import time
+
+import pytest
+from langchain_core.documents import Document
+
+from rag.keyword_index import KeywordIndex
+from rag.retriever import RetrieverBuilder
+
+
+class SlowVectorStore :
+    '''Vector store whose query embedding hangs (slow embedding API).'''
+
+    def similarity_search(self , query , **kwargs) :
+        time.sleep(1)
+        return [Document(page_content = "late" , metadata = {"doc_id" : "doc-1"})]
+
+
+@pytest.fixture
+def keyword_index(tmp_path) :
+    index = KeywordIndex(str(tmp_path / "keyword_index.sqlite3"))
+    index.add("doc-1" , [
+        Document(page_content = "Section 7.1 : either party may terminate with three months notice.") ,
+        Document(page_content = "The deposit is returned within thirty days.")
+    ])
+    return index
+
+
+def test_slow_vector_search_degrades_to_keyword_results(keyword_index) :
+    started = time.perf_counter()
+
+    documents = RetrieverBuilder.hybrid_search(SlowVectorStore() , keyword_index , "terminate section 7.1" , k = 1 , vector_timeout = 0.1)
+
+    assert time.perf_counter() - started < 0.5
+    assert documents[0].page_content.startswith("Section 7.1")
+
+
+def test_slow_vector_only_search_raises(keyword_index) :
+    with pytest.raises(TimeoutError) :
+        RetrieverBuilder.hybrid_search(SlowVectorStore() , keyword_index , "terminate" , mode = "vector" , vector_timeout = 0.1)
+
+
+def test_vector_only_search_ignores_a_zero_vector_weight(keyword_index) :
+    class FastVectorStore :
+        def similarity_search(self , query , **kwargs) :
+            return [Document(page_content = "dense hit" , metadata = {"doc_id" : "doc-1"})]
+
+    documents = RetrieverBuilder.hybrid_search(FastVectorStore() , keyword_index , "terminate" , mode = "vector" , vector_weight = 0)
+
+    assert [doc.page_content for doc in documents] == ["dense hit"]
@@ -0,0 +1,17 @@
+from langchain_core.language_models import FakeListChatModel
+
+from src.summarizer import DocumentAnalyser, MapReduceSummarizer
+
+
+def test_pairs_of_large_summaries_still_fit_the_reduce_budget() :
+    summarizer = MapReduceSummarizer(FakeListChatModel(responses = ["ok"]))
+    summarizer.reduce_token_budget = 100
+
+    '''every summary is over half the budget : greedy packing gives batches of one'''
+    summaries = [str(i) * 300 for i in range(5)]
+
+    batches = summarizer.group_by_budget(summaries)
+
+    assert len(batches) == 3
+    for batch in batches :
+        assert DocumentAnalyser.estimate_tokens("\n\n".join(batch)) <= summarizer.reduce_token_budget
@@ -0,0 +1,16 @@
+from langchain_core.language_models import FakeListChatModel
+
+from pipelines.summarizer_pipeline import SummarizerPipeline
+
+
+def test_new_documents_count_as_summary_cache_misses() :
+    pipeline = SummarizerPipeline(FakeListChatModel(responses = ["Summary."]))
+    before = pipeline.cache.stats()
+
+    pipeline.run(b"First lease : the tenant pays 900 euros per month.")
+    pipeline.run(b"Second lease : the tenant pays 1100 euros per month.")
+    assert pipeline.run(b"First lease : the tenant pays 900 euros per month.") == "Summary."
+
+    after = pipeline.cache.stats()
+    assert after["misses"] - before["misses"] == 2
+    assert after["hits"] - before["hits"] == 1
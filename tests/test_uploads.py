@@ -0,0 +1,67 @@
+import asyncio
+import io
+import tempfile
+
+import pytest
+from fastapi import HTTPException, UploadFile
+
+from core.config import get_settings
+from core.uploads import save_upload
+
+
+def upload(data : bytes , declared_size : int | None = None) -> UploadFile :
+    return UploadFile(io.BytesIO(data) , filename = "contract.pdf" , size = declared_size)
+
+
+@pytest.fixture
+def spooled_buffers(monkeypatch) :
+    '''Records the spool buffers of save_upload (spilled to disk after the first 4 KB).'''
+
+    monkeypatch.setattr(get_settings() , "UPLOAD_SPOOL_MAX_MEMORY" , 4096)
+    buffers = []
+    spooled_temporary_file = tempfile.SpooledTemporaryFile
+
+    def recording_spooled_temporary_file(*args , **kwargs) :
+        buffers.append(spooled_temporary_file(*args , **kwargs))
+        return buffers[-1]
+
+    monkeypatch.setattr(tempfile , "SpooledTemporaryFile" , recording_spooled_temporary_file)
+    return buffers
+
+
+def test_oversized_upload_leaves_no_spooled_buffer(spooled_buffers) :
+    with pytest.raises(HTTPException) as rejected :
+        asyncio.run(save_upload(upload(b"x" * 20000) , max_size = 10000 , chunk_size = 4096))
+
+    assert rejected.value.status_code == 413
+    assert len(spooled_buffers) == 1
+    assert spooled_buffers[0]._rolled and spooled_buffers[0].closed
+
+
+def test_oversized_upload_leaves_no_partial_file(tmp_path) :
+    path = tmp_path / "job-input.pdf"
+
+    with pytest.raises(HTTPException) as rejected :
+        asyncio.run(save_upload(upload(b"x" * 20000) , path = str(path) , max_size = 10000 , chunk_size = 4096))
+
+    assert rejected.value.status_code == 413
+    assert not path.exists()
+
+
+def test_declared_oversized_upload_is_rejected_before_writing(tmp_path) :
+    path = tmp_path / "job-input.pdf"
+
+    with pytest.raises(HTTPException) as rejected :
+        asyncio.run(save_upload(upload(b"x" * 100 , declared_size = 20000) , path = str(path) , max_size = 10000))
+
+    assert rejected.value.status_code == 413
+    assert not path.exists()
+
+
+def test_upload_within_the_limit_is_kept(tmp_path) :
+    path = tmp_path / "job-input.pdf"
+
+    stored = asyncio.run(save_upload(upload(b"x" * 10000) , path = str(path) , max_size = 10000 , chunk_size = 4096))
+
+    assert stored.size == 10000
+    assert path.read_bytes() == b"x" * 10000
@@ -0,0 +1,183 @@
+"""
+Background worker processing the durable job queue (core/jobs.py), separately from the API process.
+
+Run one or more of these next to the API (they only need access to the same JOBS_DIR) :
+    python worker.py
+"""
+
+import logging
+import os
+import socket
+import threading
+import time
+
+from core.config import get_settings
+from core.providers import get_llm
+from core.jobs import JobStore, get_job_store
+from pipelines.summarizer_pipeline import SummarizerPipeline
+from src.audio_store import get_audio_store
+
+
+settings = get_settings()
+
+logging.basicConfig(level = logging.INFO , format = "%(asctime)s %(threadName)s %(levelname)s %(message)s")
+logger = logging.getLogger("lawlens.worker")
+
+
+
+
+class JobProgress :
+    '''
+    Turns the pipeline progress events into (phase , progress) updates of the job.
+    Token events are not persisted (too frequent). The lease itself is renewed by LeaseHeartbeat.
+    '''
+
+    def __init__(self , store : JobStore , job_id : str , worker_id : str) :
+        self.store = store
+        self.job_id = job_id
+        self.worker_id = worker_id
+
+
+    def __call__(self , event : str , data : dict) -> None :
+        if event == "extracted" :
+            self.store.update_progress(self.job_id , self.worker_id , "extracted" , 0.1)
+
+        elif event == "cache_hit" :
+            self.store.update_progress(self.job_id , self.worker_id , "cache_hit" , 0.9)
+
+        elif event == "map" :
+            self.store.update_progress(self.job_id , self.worker_id , f"map {data['completed']}/{data['total']}" , 0.1 + 0.7 * data["completed"] / data["total"])
+
+        elif event == "collapse" :
+            self.store.update_progress(self.job_id , self.worker_id , f"collapse level {data['level']}" , 0.8)
+
+        elif event == "reduce_started" :
+            self.store.update_progress(self.job_id , self.worker_id , "reduce" , 0.85)
+
+        elif event == "tts_started" :
+            self.store.update_progress(self.job_id , self.worker_id , "tts" , 0.9)
+
+        elif event == "tts_segment" :
+            self.store.update_progress(self.job_id , self.worker_id , f"tts {data['completed']}/{data['segments']}" , 0.9)
+
+
+
+
+class LeaseHeartbeat :
+    '''
+    Renews the lease of a running job every lease_seconds / 3 while its handler runs, whatever the handler is doing
+    (waiting on the rate limiter , TTS , ...) : only a dead worker lets its lease expire.
+    Stops by itself when the job was taken over by another worker.
+    '''
+
+    def __init__(self , store : JobStore , job_id : str , worker_id : str) :
+        self.store = store
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target = self._run , name = f"lease-{job_id[:8]}" , daemon = True)
+
+
+    def _run(self) -> None :
+        while not self.stopped.wait(self.store.lease_seconds / 3) :
+            try :
+                if not self.store.renew(self.job_id , self.worker_id) :
+                    logger.warning("job %s is no longer held by %s , lease not renewed" , self.job_id , self.worker_id)
+                    return
+            except Exception :
+                logger.exception("could not renew the lease of job %s" , self.job_id)
+
+
+    def __enter__(self) -> "LeaseHeartbeat" :
+        self.thread.start()
+        return self
+
+
+    def __exit__(self , *exc_info) -> None :
+        self.stopped.set()
+        self.thread.join()
+
+
+
+
+def run_summarize_job(store : JobStore , job : dict) -> dict :
+    params = job["params"]
+
+    pipeline = SummarizerPipeline(get_llm() , params.get("language" , "English"))
+    on_event = JobProgress(store , job["id"] , job["worker_id"])
+    result = pipeline.run(job["input_path"] , params.get("tts" , False) , on_event = on_event , doc_hash = params.get("doc_hash"))
+
+    if params.get("tts") :
+        summary_text , audio_bytes = result
+        audio_id = get_audio_store().put(audio_bytes)
+        return {"summary" : summary_text , "audio_id" : audio_id , "audio_url" : f"/audio/{audio_id}"}
+
+    return {"summary" : result}
+
+
+'''job kind -> handler(store , job) returning the JSON result'''
+JOB_HANDLERS = {
+    "summarize" : run_summarize_job
+}
+
+
+
+
+def work(store : JobStore , worker_id : str , stop : threading.Event) -> None :
+    '''Claims and runs jobs until stopped, sleeping JOB_POLL_INTERVAL seconds when the queue is empty.'''
+
+    while not stop.is_set() :
+        job = store.claim(worker_id)
+
+        if job is None :
+            stop.wait(settings.JOB_POLL_INTERVAL)
+            continue
+
+        logger.info("job %s (%s) started , attempt %s" , job["id"] , job["kind"] , job["attempts"])
+
+        try :
+            handler = JOB_HANDLERS.get(job["kind"])
+            if handler is None :
+                raise ValueError(f"Unknown job kind: {job['kind']}")
+
+            with LeaseHeartbeat(store , job["id"] , worker_id) :
+                result = handler(store , job)
+
+            if store.complete(job["id"] , worker_id , result) :
+                logger.info("job %s succeeded" , job["id"])
+            else :
+                logger.warning("job %s finished after another worker took it over , result dropped" , job["id"])
+
+        except Exception as e :
+            logger.exception("job %s failed" , job["id"])
+            store.fail(job["id"] , worker_id , str(e))
+
+
+
+
+def main() -> None :
+    store = get_job_store()
+    stop = threading.Event()
+    prefix = f"{socket.gethostname()}-{os.getpid()}"
+
+    threads = [
+        threading.Thread(target = work , args = (store , f"{prefix}-{i}" , stop) , name = f"job-worker-{i}" , daemon = True)
+        for i in range(settings.JOB_WORKERS)
+    ]
+
+    for thread in threads :
+        thread.start()
+
+    logger.info("%s job workers polling %s" , len(threads) , store.path)
+
+    try :
+        while any(thread.is_alive() for thread in threads) :
+            time.sleep(1)
+
+    except KeyboardInterrupt :
+        '''running jobs are abandoned : their lease expires and another worker picks them up again'''
+        stop.set()
+
+
+if __name__ == "__main__" :
+    main()